@@ -0,0 +1,702 @@
+"""Continuous batching engine: generation, scoring and speculative decoding"""
+
+import asyncio
+import logging
+import math
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import torch
+from transformers import DynamicCache
+
+from grammar import JsonConstraint
+from protocol import ChatMessage
+from settings import DEVICE, DRAFT_MODEL_NAME, DRAFT_TOKENS, SCORE_BATCH_TOKENS
+
+if TYPE_CHECKING:
+    from model_manager import ResidentModel
+
+logger = logging.getLogger("bolt_xl_transformers")
+
+
+def _model_device(model) -> torch.device:
+    if hasattr(model, "device"):
+        return model.device
+    try:
+        return next(model.parameters()).device
+    except StopIteration:
+        return torch.device(DEVICE)
+
+
+class GenerationRequest:
+    """One sequence in the continuous batch, plus its output channel"""
+
+    def __init__(
+        self,
+        input_ids: List[int],
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float,
+        stop: Optional[List[str]] = None,
+        messages: Optional[List[ChatMessage]] = None,
+        cache_prompt: bool = False,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        constraint: Optional[JsonConstraint] = None,
+    ):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.stop = [s for s in (stop or []) if s]
+        self.messages = messages
+        self.cache_prompt = cache_prompt
+        self.constraint = constraint  # Restricts sampling to tokens that keep the output schema-valid
+
+        self.generated: List[int] = []
+        self.text = ""
+        self.emitted = 0  # Characters of text already pushed to events
+        self.length = 0  # Tokens held in the KV cache (= position of next token)
+        self.next_token: Optional[int] = None
+        # Draft model KV cache (speculative decoding) and how many tokens it covers
+        self.draft_past: Optional[List[Tuple[torch.Tensor, torch.Tensor]]] = None
+        self.draft_length = 0
+        self.finish_reason: Optional[str] = None
+        self.error: Optional[str] = None
+        self.cancelled = False
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        # Text deltas, None when finished. Async handlers get an asyncio.Queue fed from the engine thread.
+        self.loop = loop
+        self.events = asyncio.Queue() if loop else queue.Queue()
+        self.done = threading.Event()
+
+    def put(self, item: Optional[str]) -> None:
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.events.put_nowait, item)
+        else:
+            self.events.put(item)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class ScoreRequest:
+    """
+    Teacher-forced scoring of several token sequences (no decoding).
+
+    Produces the logprob of every token given the ones before it, plus
+    optionally one token sampled from the distribution after the last
+    position. Shares the waiting queue with GenerationRequest, so the
+    engine thread runs it between decode steps like a prefill.
+    """
+
+    def __init__(
+        self,
+        sequences: List[List[int]],
+        top_logprobs: int = 0,
+        sample_next: bool = False,
+        temperature: float = 0.0,
+        top_p: float = 1.0,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        self.sequences = sequences
+        self.top_logprobs = top_logprobs
+        self.sample_next = sample_next
+        self.temperature = temperature
+        self.top_p = top_p
+        # Per sequence: token_logprobs ([None] + one per later token), top (ids, logprobs)
+        # per position, and next_token / next_logprob / next_top when sample_next is set
+        self.results: List[Optional[dict]] = [None] * len(sequences)
+
+        self.text = ""
+        self.emitted = 0
+        self.finish_reason: Optional[str] = None
+        self.error: Optional[str] = None
+        self.cancelled = False
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.loop = loop
+        self.events = asyncio.Queue() if loop else queue.Queue()
+        self.done = threading.Event()
+
+    def put(self, item: Optional[str]) -> None:
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.events.put_nowait, item)
+        else:
+            self.events.put(item)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class QueueFullError(Exception):
+    """Raised when the generation queue is full"""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Generation queue is full. Retry after {retry_after}s.")
+
+
+class BatchEngine:
+    """
+    Continuous batching decode loop.
+
+    A single worker thread owns the model. New requests are prefilled on
+    their own (reusing the persona prefix cache), then their KV cache is
+    left-padded and concatenated into the running batch. Every step decodes
+    one token for all active sequences; finished or cancelled sequences
+    leave between steps and their rows are dropped from the cache.
+    Streaming and non-streaming requests share the same batch.
+
+    The waiting queue is bounded: submit() raises QueueFullError when it is
+    full, and requests queued longer than queue_timeout are failed instead
+    of being prefilled.
+
+    When a draft model is loaded and only one sequence is active, decoding
+    switches to speculative sampling: the draft proposes DRAFT_TOKENS
+    tokens and the main model verifies them in a single forward pass.
+    """
+
+    CALIBRATE_EVERY = 32  # Plain single-sequence steps interleaved to measure speedup
+
+    def __init__(
+        self,
+        resident: "ResidentModel",
+        max_batch_size: int,
+        max_queue: int = 0,
+        queue_timeout: float = 0.0,
+    ):
+        self.resident = resident
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self.active: List[GenerationRequest] = []
+        self.past: Optional[List[Tuple[torch.Tensor, torch.Tensor]]] = None  # Per layer (key, value)
+        self.attention_mask: Optional[torch.Tensor] = None
+        self.thread: Optional[threading.Thread] = None
+        self.start_lock = threading.Lock()
+        self.eos_token_ids: set = set()
+
+        self.steps = 0
+        self.decode_tokens = 0
+        self.completed = 0
+        self.busy_seconds = 0.0
+        self.peak_batch_size = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.served = 0
+        self.total_service = 0.0
+        self.batch_rows = 0
+        # Single-sequence decode timings, plain vs speculative
+        self.plain_tokens = 0
+        self.plain_seconds = 0.0
+        self.single_steps = 0
+        self.spec_steps = 0
+        self.spec_proposed = 0
+        self.spec_accepted = 0
+        self.spec_tokens = 0
+        self.spec_seconds = 0.0
+        self.score_passes = 0
+        self.scored_sequences = 0
+        self.scored_tokens = 0
+
+    def start(self) -> None:
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.eos_token_ids = self._resolve_eos_ids()
+                self.thread = threading.Thread(target=self._run, name="bolt-batch-engine", daemon=True)
+                self.thread.start()
+
+    def stop(self) -> None:
+        """Shut the worker thread down; only call when idle (no active or waiting requests)"""
+        with self.start_lock:
+            if self.thread is not None and self.thread.is_alive():
+                self.waiting.put(None)
+                self.thread.join(timeout=5)
+            self.thread = None
+        self.past = None
+        self.attention_mask = None
+
+    def idle(self) -> bool:
+        return not self.active and self.waiting.empty()
+
+    def submit(self, request: GenerationRequest) -> GenerationRequest:
+        """Queue a request for the next free batch slot"""
+        self.start()
+        if self.max_queue and self.waiting.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self._retry_after())
+        self.waiting.put(request)
+        return request
+
+    def _retry_after(self) -> int:
+        """Estimate seconds until a newly queued request would be admitted"""
+        avg_service = self.total_service / self.served if self.served else 1.0
+        backlog = self.waiting.qsize() + len(self.active) + 1
+        return max(1, math.ceil(avg_service * backlog / self.max_batch_size))
+
+    def _resolve_eos_ids(self) -> set:
+        ids = {self.resident.tokenizer.eos_token_id}
+        config_eos = getattr(getattr(self.resident.model, "generation_config", None), "eos_token_id", None)
+        if isinstance(config_eos, (list, tuple)):
+            ids.update(config_eos)
+        elif config_eos is not None:
+            ids.add(config_eos)
+        ids.discard(None)
+        return ids
+
+    def _run(self) -> None:
+        while True:
+            if not self.active:
+                request = self.waiting.get()
+                if request is None:  # stop()
+                    return
+                self._admit(request)
+            while len(self.active) < self.max_batch_size:
+                try:
+                    self._admit(self.waiting.get_nowait())
+                except queue.Empty:
+                    break
+            if not self.active:
+                continue
+
+            started = time.perf_counter()
+            try:
+                self._step()
+            except Exception as exc:
+                logger.exception("Batch decode step failed")
+                for request in self.active:
+                    self._finish(request, "error", error=str(exc))
+                self.active = []
+                self.past = None
+                self.attention_mask = None
+            self.busy_seconds += time.perf_counter() - started
+
+    def _admit(self, request: GenerationRequest) -> None:
+        """Prefill a new request and join it to the running batch"""
+        if request.cancelled:
+            self._finish(request, "cancelled")
+            return
+
+        started = time.perf_counter()
+        waited = started - request.submitted_at
+        if self.queue_timeout and waited > self.queue_timeout:
+            self._finish(request, "timeout", error=f"Request waited {waited:.1f}s in the generation queue")
+            return
+        request.started_at = started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+        try:
+            if isinstance(request, ScoreRequest):
+                self._score(request)
+                return
+            device = _model_device(self.resident.model)
+            ids = torch.tensor([request.input_ids], dtype=torch.long, device=device)
+            cache = None
+            if request.cache_prompt and request.messages:
+                cache = self.resident.prefix_cache.get(request.messages, ids)
+            cache = cache if cache is not None else DynamicCache()
+            cached = cache.get_seq_length()
+
+            with torch.inference_mode():
+                out = self.resident.model(input_ids=ids[:, cached:], past_key_values=cache, use_cache=True)
+            request.length = ids.shape[-1]
+            token = self._sample(out.logits[:, -1, :], [request])[0]
+            self._accept(request, token)
+            if request.finish_reason is None:
+                # Growing the batch KV cache is the likeliest OOM under load;
+                # _join leaves the running batch untouched if it fails
+                self._join(out.past_key_values.to_legacy_cache(), request)
+        except Exception as exc:
+            logger.exception("Prefill failed")
+            if request.finish_reason is None:
+                self._finish(request, "error", error=str(exc))
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+
+    def _score(self, request: ScoreRequest) -> None:
+        """Score all sequences in as few padded forward passes as SCORE_BATCH_TOKENS allows"""
+        sequences = request.sequences
+        group: List[int] = []
+        # Similar lengths share a pass, which keeps padding low
+        for index in sorted(range(len(sequences)), key=lambda i: len(sequences[i])):
+            width = len(sequences[index])
+            if group and width * (len(group) + 1) > SCORE_BATCH_TOKENS:
+                self._score_pass(request, group)
+                group = []
+            group.append(index)
+        if group:
+            self._score_pass(request, group)
+        self._finish(request, "stop")
+
+    def _score_pass(self, request: ScoreRequest, group: List[int]) -> None:
+        model, tokenizer = self.resident.model, self.resident.tokenizer
+        device = _model_device(model)
+        lengths = [len(request.sequences[i]) for i in group]
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        ids = torch.full((len(group), max(lengths)), pad_id, dtype=torch.long, device=device)
+        mask = torch.zeros_like(ids)
+        for row, (index, length) in enumerate(zip(group, lengths)):
+            ids[row, :length] = torch.tensor(request.sequences[index], dtype=torch.long, device=device)
+            mask[row, :length] = 1
+
+        with torch.inference_mode():
+            # Right padding: real tokens keep positions 0..n-1 and never attend to the padding
+            logits = model(input_ids=ids, attention_mask=mask, use_cache=False).logits
+
+            for row, (index, length) in enumerate(zip(group, lengths)):
+                logprobs = torch.log_softmax(logits[row, :length].float(), dim=-1)
+                targets = ids[row, 1:length].unsqueeze(-1)
+                result = {"token_logprobs": [None] + logprobs[:-1].gather(-1, targets).squeeze(-1).tolist()}
+                if request.top_logprobs:
+                    values, top_ids = logprobs[:-1].topk(request.top_logprobs, dim=-1)
+                    result["top"] = [None] + list(zip(top_ids.tolist(), values.tolist()))
+                if request.sample_next:
+                    token = self._pick(self._distributions(logits[row, length - 1:length], request)[0], request)
+                    result["next_token"] = token
+                    result["next_logprob"] = float(logprobs[-1, token])
+                    if request.top_logprobs:
+                        values, top_ids = logprobs[-1].topk(request.top_logprobs)
+                        result["next_top"] = (top_ids.tolist(), values.tolist())
+                request.results[index] = result
+
+        self.score_passes += 1
+        self.scored_sequences += len(group)
+        self.scored_tokens += sum(lengths)
+
+    def _join(self, past: tuple, request: GenerationRequest) -> None:
+        new_mask = torch.ones((1, request.length), dtype=torch.long, device=past[0][0].device)
+        if self.past is None:
+            self.past = [(k, v) for k, v in past]
+            self.attention_mask = new_mask
+        else:
+            # Build the new cache and mask before swapping either in, so a
+            # failure here leaves the running batch consistent
+            current = self.attention_mask.shape[-1]
+            width = max(current, request.length)
+            joined = [
+                (
+                    torch.cat([_left_pad(k, width), _left_pad(nk, width)], dim=0),
+                    torch.cat([_left_pad(v, width), _left_pad(nv, width)], dim=0),
+                )
+                for (k, v), (nk, nv) in zip(self.past, past)
+            ]
+            mask = torch.cat(
+                [_left_pad(self.attention_mask, width, dim=1), _left_pad(new_mask, width, dim=1)], dim=0
+            )
+            self.past, self.attention_mask = joined, mask
+        self.active.append(request)
+        self.peak_batch_size = max(self.peak_batch_size, len(self.active))
+
+    def _step(self) -> None:
+        """Decode one token for every active sequence"""
+        keep = [i for i, r in enumerate(self.active) if not r.cancelled]
+        if len(keep) < len(self.active):
+            for request in self.active:
+                if request.cancelled:
+                    self._finish(request, "cancelled")
+            self._retain(keep)
+            if not self.active:
+                return
+
+        if (
+            len(self.active) == 1
+            and self.active[0].constraint is None
+            and self.resident.draft_model is not None
+            and DRAFT_TOKENS > 0
+        ):
+            # Alone in the batch: trade idle compute for latency. Every
+            # CALIBRATE_EVERY-th step runs plain to keep the speedup baseline honest.
+            self.single_steps += 1
+            if self.single_steps % self.CALIBRATE_EVERY:
+                self._speculative_step(self.active[0])
+                return
+
+        started = time.perf_counter()
+        device = self.attention_mask.device
+        input_ids = torch.tensor([[r.next_token] for r in self.active], dtype=torch.long, device=device)
+        position_ids = torch.tensor([[r.length] for r in self.active], dtype=torch.long, device=device)
+        self.attention_mask = torch.cat(
+            [self.attention_mask, torch.ones((len(self.active), 1), dtype=torch.long, device=device)], dim=1
+        )
+
+        with torch.inference_mode():
+            out = self.resident.model(
+                input_ids=input_ids,
+                attention_mask=self.attention_mask,
+                position_ids=position_ids,
+                past_key_values=DynamicCache.from_legacy_cache(tuple(self.past)),
+                use_cache=True,
+            )
+        self.past = list(out.past_key_values.to_legacy_cache())
+        tokens = self._sample(out.logits[:, -1, :], self.active)
+
+        self.steps += 1
+        self.batch_rows += len(self.active)
+        self.decode_tokens += len(self.active)
+        if len(self.active) == 1:
+            self.plain_tokens += 1
+            self.plain_seconds += time.perf_counter() - started
+        keep = []
+        for i, (request, token) in enumerate(zip(self.active, tokens)):
+            request.length += 1
+            self._accept(request, token)
+            if request.finish_reason is None:
+                keep.append(i)
+        if len(keep) < len(self.active):
+            self._retain(keep)
+
+    def _draft_propose(
+        self, request: GenerationRequest, tokens: List[int], count: int
+    ) -> Tuple[List[int], List[torch.Tensor]]:
+        """Sample count tokens from the draft model, catching its cache up on new tokens first"""
+        device = self.attention_mask.device
+        cache = DynamicCache.from_legacy_cache(tuple(request.draft_past)) if request.draft_past else DynamicCache()
+        if not request.draft_past:
+            request.draft_length = 0
+        ids = torch.tensor([tokens[request.draft_length:]], dtype=torch.long, device=device)
+
+        proposals: List[int] = []
+        distributions: List[torch.Tensor] = []
+        with torch.inference_mode():
+            for _ in range(count):
+                out = self.resident.draft_model(input_ids=ids, past_key_values=cache, use_cache=True)
+                cache = out.past_key_values
+                request.draft_length += ids.shape[-1]
+                dist = self._distributions(out.logits[0, -1:], request)[0]
+                token = self._pick(dist, request)
+                proposals.append(token)
+                distributions.append(dist)
+                ids = torch.tensor([[token]], dtype=torch.long, device=device)
+        request.draft_past = list(cache.to_legacy_cache())
+        return proposals, distributions
+
+    def _speculative_step(self, request: GenerationRequest) -> None:
+        """
+        Draft proposes up to DRAFT_TOKENS tokens, the main model scores them in
+        one forward pass, and standard speculative sampling accepts a prefix.
+        The output distribution is the main model's; greedy output is unchanged.
+        """
+        started = time.perf_counter()
+        device = self.attention_mask.device
+        tokens = request.input_ids + request.generated  # Last one (next_token) is not in the KV cache yet
+        count = min(DRAFT_TOKENS, request.max_new_tokens - len(request.generated))
+        proposals, draft_dists = self._draft_propose(request, tokens, count)
+
+        verify_ids = torch.tensor([[request.next_token] + proposals], dtype=torch.long, device=device)
+        width = verify_ids.shape[-1]
+        cached = self.attention_mask.shape[-1]
+        attention_mask = torch.cat(
+            [self.attention_mask, torch.ones((1, width), dtype=torch.long, device=device)], dim=1
+        )
+        with torch.inference_mode():
+            out = self.resident.model(
+                input_ids=verify_ids,
+                attention_mask=attention_mask,
+                position_ids=torch.arange(request.length, request.length + width, device=device).unsqueeze(0),
+                past_key_values=DynamicCache.from_legacy_cache(tuple(self.past)),
+                use_cache=True,
+            )
+        target = self._distributions(out.logits[0], request)
+
+        accepted: List[int] = []
+        correction = None
+        for i, (token, draft_dist) in enumerate(zip(proposals, draft_dists)):
+            q = float(draft_dist[token])
+            if q > 0 and float(torch.rand(())) < float(target[i, token]) / q:
+                accepted.append(token)
+                continue
+            residual = torch.clamp(target[i] - draft_dist, min=0)
+            correction = self._pick(residual / residual.sum() if residual.sum() > 0 else target[i], request)
+            break
+        if correction is None:
+            correction = self._pick(target[len(proposals)], request)
+
+        # Keep KV for next_token + accepted drafts; the correction becomes the new next_token
+        keep = cached + 1 + len(accepted)
+        self.past = [(k[:, :, :keep], v[:, :, :keep]) for k, v in list(out.past_key_values.to_legacy_cache())]
+        self.attention_mask = attention_mask[:, :keep]
+        request.length += 1 + len(accepted)
+        valid_draft = len(tokens) + len(accepted)
+        if request.draft_length > valid_draft:
+            request.draft_past = [(k[:, :, :valid_draft], v[:, :, :valid_draft]) for k, v in request.draft_past]
+            request.draft_length = valid_draft
+
+        emitted = 0
+        for token in accepted + [correction]:
+            self._accept(request, token)
+            emitted += 1
+            if request.finish_reason is not None:
+                break
+
+        self.steps += 1
+        self.batch_rows += 1
+        self.decode_tokens += emitted
+        self.spec_steps += 1
+        self.spec_proposed += len(proposals)
+        self.spec_accepted += len(accepted)
+        self.spec_tokens += emitted
+        self.spec_seconds += time.perf_counter() - started
+        if request.finish_reason is not None:
+            self._retain([])
+
+    def _retain(self, keep: List[int]) -> None:
+        """Drop finished rows from the batch and trim shared left padding"""
+        if not keep:
+            self.active = []
+            self.past = None
+            self.attention_mask = None
+            return
+
+        index = torch.tensor(keep, dtype=torch.long, device=self.attention_mask.device)
+        mask = self.attention_mask.index_select(0, index)
+        offset = int((mask.sum(dim=0) > 0).nonzero()[0])
+        self.attention_mask = mask[:, offset:]
+        self.past = [
+            (k.index_select(0, index)[:, :, offset:], v.index_select(0, index)[:, :, offset:])
+            for k, v in self.past
+        ]
+        self.active = [self.active[i] for i in keep]
+
+    @staticmethod
+    def _greedy(request: GenerationRequest) -> bool:
+        return not request.temperature or request.temperature <= 0
+
+    def _distributions(self, logits: torch.Tensor, request: GenerationRequest) -> torch.Tensor:
+        """Next-token distributions (rows) after temperature and top-p; one-hot when greedy"""
+        logits = logits.float()
+        if self._greedy(request):
+            return torch.nn.functional.one_hot(logits.argmax(dim=-1), logits.shape[-1]).float()
+        probs = torch.softmax(logits / request.temperature, dim=-1)
+        if request.top_p and request.top_p < 1.0:
+            sorted_probs, sorted_idx = probs.sort(dim=-1, descending=True)
+            outside = sorted_probs.cumsum(-1) - sorted_probs > request.top_p
+            sorted_probs[outside] = 0
+            probs = torch.zeros_like(probs).scatter(-1, sorted_idx, sorted_probs)
+            probs = probs / probs.sum(dim=-1, keepdim=True)
+        return probs
+
+    def _pick(self, dist: torch.Tensor, request: GenerationRequest) -> int:
+        if self._greedy(request):
+            return int(dist.argmax())
+        return int(torch.multinomial(dist, 1))
+
+    def _sample(self, logits: torch.Tensor, requests: List[GenerationRequest]) -> List[int]:
+        tokens = []
+        for row, request in zip(logits, requests):
+            if request.constraint is not None:
+                allowed = request.constraint.mask(row.shape[-1], row.device, self.eos_token_ids)
+                row = row.masked_fill(~allowed, float("-inf"))
+            if self._greedy(request):
+                tokens.append(int(row.argmax()))
+                continue
+            tokens.append(self._pick(self._distributions(row.unsqueeze(0), request)[0], request))
+        return tokens
+
+    def _accept(self, request: GenerationRequest, token: int) -> None:
+        """Record a sampled token, stream new text and check stop conditions"""
+        if token in self.eos_token_ids:
+            self._finish(request, "stop")
+            return
+
+        if request.constraint is not None:
+            request.constraint.advance(token)
+        request.generated.append(token)
+        request.next_token = token
+        text = self.resident.tokenizer.decode(request.generated, skip_special_tokens=True)
+
+        for stop in request.stop:
+            idx = text.find(stop, max(0, request.emitted - len(stop)))
+            if idx != -1:
+                request.text = text[:idx]
+                self._finish(request, "stop")
+                return
+
+        request.text = text
+        if len(request.generated) >= request.max_new_tokens:
+            self._finish(request, "length")
+            return
+
+        # Hold back partial UTF-8 sequences and text that may begin a stop string
+        holdback = max((len(stop) - 1 for stop in request.stop), default=0)
+        safe = len(text) - holdback
+        if text.endswith("\ufffd"):
+            safe = min(safe, len(text) - 1)
+        if safe > request.emitted:
+            request.put(text[request.emitted:safe])
+            request.emitted = safe
+
+    def _finish(self, request: GenerationRequest, reason: str, error: Optional[str] = None) -> None:
+        request.finish_reason = reason
+        request.error = error
+        if len(request.text) > request.emitted:
+            request.put(request.text[request.emitted:])
+            request.emitted = len(request.text)
+        # done must be set before the final event wakes the consumer
+        request.done.set()
+        request.put(None)
+        self.completed += 1
+        if reason == "cancelled":
+            self.cancelled += 1
+        elif reason == "timeout":
+            self.timed_out += 1
+        elif request.started_at is not None and error is None:
+            self.served += 1
+            self.total_service += time.perf_counter() - request.started_at
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "active": len(self.active),
+            "waiting": self.waiting.qsize(),
+            "max_queue": self.max_queue,
+            "peak_batch_size": self.peak_batch_size,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "avg_queue_wait_ms": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "max_queue_wait_ms": round(self.max_wait * 1000, 2),
+            "decode_steps": self.steps,
+            "avg_batch_size": round(self.batch_rows / self.steps, 2) if self.steps else 0.0,
+            "tokens_per_sec": round(self.decode_tokens / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+            "speculative": self._speculative_stats(),
+            "scoring": {
+                "passes": self.score_passes,
+                "sequences": self.scored_sequences,
+                "tokens": self.scored_tokens,
+            },
+        }
+
+    def _speculative_stats(self) -> dict:
+        plain_ms = self.plain_seconds / self.plain_tokens * 1000 if self.plain_tokens else None
+        spec_ms = self.spec_seconds / self.spec_tokens * 1000 if self.spec_tokens else None
+        return {
+            "draft_model": DRAFT_MODEL_NAME if self.resident.draft_model is not None else None,
+            "draft_tokens": DRAFT_TOKENS,
+            "steps": self.spec_steps,
+            "acceptance_rate": round(self.spec_accepted / self.spec_proposed, 3) if self.spec_proposed else 0.0,
+            "tokens_per_step": round(self.spec_tokens / self.spec_steps, 2) if self.spec_steps else 0.0,
+            "ms_per_token": round(spec_ms, 2) if spec_ms else None,
+            "plain_ms_per_token": round(plain_ms, 2) if plain_ms else None,
+            "speedup": round(plain_ms / spec_ms, 2) if plain_ms and spec_ms else None,
+        }
+
+
+def _left_pad(tensor: torch.Tensor, width: int, dim: int = 2) -> torch.Tensor:
+    """Left-pad a KV tensor (dim=2) or attention mask (dim=1) with zeros to width"""
+    missing = width - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
@@ -0,0 +1,250 @@
+"""Per-model prompt caches: prefilled persona KV prefixes and tokenized message prefixes"""
+
+import bisect
+import copy
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import torch
+from transformers import DynamicCache
+
+from protocol import ChatMessage
+
+if TYPE_CHECKING:
+    from model_manager import ResidentModel
+
+logger = logging.getLogger("bolt_xl_transformers")
+
+
+class PrefixKVCache:
+    """
+    LRU of prefilled KV caches for system-prompt (persona) prefixes.
+
+    Keyed by the leading system message text. Each entry holds the prefix
+    token ids and a DynamicCache covering them; requests whose prompt starts
+    with those ids get a copy of the cache and skip re-prefilling the prefix.
+    """
+
+    def __init__(self, resident: "ResidentModel", max_entries: int, min_tokens: int):
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens
+        self.resident = resident
+        self.entries: "OrderedDict[str, Tuple[torch.Tensor, DynamicCache]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+
+    def _prefix_length(self, messages: List[ChatMessage], input_ids: torch.Tensor) -> int:
+        """Tokens shared by this prompt and the system message followed by an empty user turn"""
+        placeholder = [messages[0], ChatMessage(role="user", content="")]
+        tokenizer = self.resident.tokenizer
+        placeholder_ids = tokenizer(_build_prompt(placeholder, tokenizer), return_tensors="pt")["input_ids"][0]
+        full_ids = input_ids[0].cpu()
+        limit = min(placeholder_ids.shape[-1], full_ids.shape[-1] - 1)
+        mismatch = (placeholder_ids[:limit] != full_ids[:limit]).nonzero()
+        return int(mismatch[0]) if mismatch.numel() else limit
+
+    def get(self, messages: List[ChatMessage], input_ids: torch.Tensor) -> Optional[DynamicCache]:
+        """Return a private copy of the prefix cache for this prompt, building it on a miss"""
+        # Only the persona prompt is stable; history and memories follow it
+        key = messages[0].content if messages and messages[0].role == "system" else ""
+        if not key or self.max_entries <= 0:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+        if entry is None:
+            self.misses += 1
+            prefix_len = self._prefix_length(messages, input_ids)
+            if prefix_len < self.min_tokens:
+                return None
+            prefix_ids = input_ids[:, :prefix_len]
+            with torch.inference_mode():
+                cache = self.resident.model(
+                    input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True
+                ).past_key_values
+            entry = (prefix_ids, cache)
+            with self.lock:
+                self.entries[key] = entry
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        else:
+            self.hits += 1
+
+        prefix_ids, cache = entry
+        prefix_len = prefix_ids.shape[-1]
+        if prefix_len >= input_ids.shape[-1] or not torch.equal(input_ids[:, :prefix_len], prefix_ids):
+            return None
+
+        self.reused_tokens += prefix_len
+        # generate() appends to the cache, so each request needs its own copy
+        return copy.deepcopy(cache)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reused_tokens": self.reused_tokens,
+        }
+
+
+def _normalize_messages(messages: List[ChatMessage]) -> List[dict]:
+    system_texts = [m.content for m in messages if m.role == "system"]
+    payload = [{"role": m.role, "content": m.content} for m in messages if m.role != "system"]
+    if system_texts:
+        system_blob = "\n".join(text for text in system_texts if text).strip()
+        if system_blob:
+            if payload and payload[0]["role"] == "user":
+                payload[0]["content"] = f"{system_blob}\n\n{payload[0]['content']}"
+            else:
+                payload.insert(0, {"role": "user", "content": system_blob})
+    return payload
+
+
+def _build_prompt(messages: List[ChatMessage], tokenizer) -> str:
+    payload_all = [{"role": m.role, "content": m.content} for m in messages]
+    payload = _normalize_messages(messages)
+    if hasattr(tokenizer, "apply_chat_template"):
+        try:
+            return tokenizer.apply_chat_template(payload_all, tokenize=False, add_generation_prompt=True)
+        except Exception as exc:
+            logger.warning("Chat template failed; retrying without system messages: %s", exc)
+            try:
+                return tokenizer.apply_chat_template(payload, tokenize=False, add_generation_prompt=True)
+            except Exception as exc2:
+                logger.warning("Chat template fallback failed; using raw prompt: %s", exc2)
+    prompt = ""
+    for msg in payload:
+        prompt += f"<|im_start|>{msg['role']}\n{msg['content']}<|im_end|>\n"
+    prompt += "<|im_start|>assistant\n"
+    return prompt
+
+
+class PromptCache:
+    """
+    Chat-template rendering + tokenization cache keyed by message prefix.
+
+    A miss tokenizes the full prompt once (with offsets) and remembers the
+    token ids of every message prefix that ends on a special token such as a
+    turn marker. Later prompts sharing a cached prefix (same persona prompt,
+    same conversation so far) only tokenize the text after it. Special tokens
+    are split out before BPE, so ids on either side of such a boundary do
+    not depend on each other.
+    """
+
+    def __init__(self, resident: "ResidentModel", max_entries: int):
+        self.max_entries = max_entries
+        self.resident = resident
+        self.entries: "OrderedDict[tuple, Tuple[str, List[int]]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.boundary_re: Optional["re.Pattern"] = None
+        self.boundary_tokenizer = None
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+
+    def _boundaries(self, prompt: str) -> List[int]:
+        """End offsets of special tokens in the prompt"""
+        tokenizer = self.resident.tokenizer
+        if self.boundary_tokenizer is not tokenizer:
+            markers = [
+                token.content
+                for token in getattr(tokenizer, "added_tokens_decoder", {}).values()
+                if token.special and not token.lstrip and not token.rstrip and token.content
+            ]
+            markers.sort(key=len, reverse=True)
+            self.boundary_re = re.compile("|".join(re.escape(m) for m in markers)) if markers else None
+            self.boundary_tokenizer = tokenizer
+        if self.boundary_re is None:
+            return []
+        return [m.end() for m in self.boundary_re.finditer(prompt)]
+
+    def _remember(
+        self, key: tuple, prompt: str, ids: List[int], offsets: List[Tuple[int, int]], min_cut: int = 0
+    ) -> None:
+        boundaries = self._boundaries(prompt)
+        if not boundaries:
+            return
+        token_ends = [end for _, end in offsets]
+        position = 0
+        new_entries = []
+        for k in range(1, len(key) + 1):
+            if k < len(key):
+                content = key[k][1]
+                position = prompt.find(content, position) if content else -1
+                if position == -1:
+                    break
+            else:
+                position = len(prompt)
+            b = bisect.bisect_right(boundaries, position) - 1
+            if b < 0:
+                continue
+            cut = boundaries[b]
+            if cut < min_cut:
+                # Inside the reused prefix, whose per-token offsets are unknown
+                continue
+            n_tokens = bisect.bisect_right(token_ends, cut)
+            new_entries.append((key[:k], (prompt[:cut], ids[:n_tokens])))
+
+        with self.lock:
+            for prefix_key, entry in new_entries:
+                self.entries[prefix_key] = entry
+                self.entries.move_to_end(prefix_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def encode(self, messages: List[ChatMessage]) -> Tuple[str, List[int]]:
+        """Render the chat prompt and return it with its token ids"""
+        tokenizer = self.resident.tokenizer
+        prompt = _build_prompt(messages, tokenizer)
+        if self.max_entries <= 0 or not getattr(tokenizer, "is_fast", False):
+            return prompt, tokenizer(prompt)["input_ids"]
+
+        key = tuple((m.role, m.content) for m in messages)
+        cached = None
+        with self.lock:
+            for k in range(len(key), 0, -1):
+                entry = self.entries.get(key[:k])
+                if entry is not None and prompt.startswith(entry[0]):
+                    self.entries.move_to_end(key[:k])
+                    cached = entry
+                    break
+
+        shift = 0
+        if cached is None:
+            with self.lock:
+                self.misses += 1
+            encoded = tokenizer(prompt, return_offsets_mapping=True)
+            ids, offsets = encoded["input_ids"], encoded["offset_mapping"]
+        else:
+            cut_text, cut_ids = cached
+            with self.lock:  # encode() runs in worker threads
+                self.hits += 1
+                self.reused_tokens += len(cut_ids)
+            encoded = tokenizer(prompt[len(cut_text):], add_special_tokens=False, return_offsets_mapping=True)
+            shift = len(cut_text)
+            ids = cut_ids + encoded["input_ids"]
+            offsets = [(shift, shift)] * len(cut_ids) + [(s + shift, e + shift) for s, e in encoded["offset_mapping"]]
+
+        self._remember(key, prompt, ids, offsets, min_cut=shift)
+        return prompt, ids
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reused_tokens": self.reused_tokens,
+        }
@@ -0,0 +1,189 @@
+"""JSON-schema constrained decoding for response_format"""
+
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+logger = logging.getLogger("bolt_xl_transformers")
+
+
+class SchemaError(ValueError):
+    """response_format schema that constrained decoding cannot enforce"""
+
+
+class TokenTable:
+    """Decoded text of every vocabulary token, indexed for grammar checks"""
+
+    def __init__(self, tokenizer):
+        started = time.perf_counter()
+        self.tokenizer = tokenizer
+        special = set(tokenizer.all_special_ids)
+        pieces = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+        self.texts: List[str] = []
+        self.plain: List[int] = []  # Safe anywhere inside a JSON string
+        self.quoted: List[int] = []  # Contain '"' or '\\': may close or escape inside a string
+        self.by_first: Dict[str, List[int]] = {}
+        for token_id, piece in enumerate(pieces):
+            text = ""
+            if token_id not in special and piece is not None:
+                text = tokenizer.convert_tokens_to_string([piece])
+                if piece.startswith("\u2581") and not text.startswith(" "):
+                    text = " " + text  # SentencePiece drops the leading space of a lone token
+            self.texts.append(text)
+            if not text or any(ord(ch) < 0x20 for ch in text):
+                continue
+            if '"' in text or "\\" in text:
+                self.quoted.append(token_id)
+            else:
+                self.plain.append(token_id)
+            self.by_first.setdefault(text[0], []).append(token_id)
+        logger.info(f"Token table built: {len(self.texts)} tokens in {time.perf_counter() - started:.2f}s")
+
+
+class JsonGrammar:
+    """
+    Character automaton for a flat JSON schema, compiled to per-state token masks.
+
+    Supported schemas are objects whose properties are strings, optionally
+    restricted by enum. Properties are emitted in declaration order, all
+    present, with fixed separators, so the automaton stays a short chain of
+    literal / string / enum segments and its token masks can be cached per
+    state and shared by every request using the schema.
+    """
+
+    HEX = set("0123456789abcdefABCDEF")
+
+    def __init__(self, schema: dict, table: TokenTable):
+        self.table = table
+        self.segments = self._compile(schema)
+        self.masks: Dict[tuple, torch.Tensor] = {}
+
+    @staticmethod
+    def _compile(schema: dict) -> list:
+        properties = schema.get("properties")
+        if schema.get("type", "object") != "object" or not isinstance(properties, dict) or not properties:
+            raise SchemaError("response_format schema must be an object with properties")
+        segments = []
+        literal = "{"
+        for i, (name, prop) in enumerate(properties.items()):
+            if not isinstance(prop, dict) or prop.get("type", "string") != "string":
+                raise SchemaError(f"Property '{name}': only string properties are supported")
+            enum = prop.get("enum")
+            if enum is not None and (
+                not enum or not all(isinstance(v, str) and v and '"' not in v and "\\" not in v for v in enum)
+            ):
+                raise SchemaError(f"Property '{name}': enum must be non-empty strings without quotes or backslashes")
+            literal += (", " if i else "") + json.dumps(name) + ': "'
+            segments.append(("literal", literal))
+            segments.append(("enum", list(enum)) if enum else ("string", None))
+            literal = '"'
+        segments.append(("literal", literal + "}"))
+        return segments
+
+    def start(self) -> tuple:
+        return self._enter(0)
+
+    def _enter(self, index: int, pos: int = 0) -> tuple:
+        """State at the start of segment index (pos chars into it for literals)"""
+        if index < len(self.segments) and self.segments[index][0] == "enum":
+            return (index, "", 0)
+        return (index, pos, 0)
+
+    def done(self, state: tuple) -> bool:
+        return state[0] >= len(self.segments)
+
+    def advance(self, state: Optional[tuple], text: str) -> Optional[tuple]:
+        """State after consuming text, or None if text leaves the grammar"""
+        for ch in text:
+            if state is None or self.done(state):
+                return None
+            index, pos, escape = state
+            kind, value = self.segments[index]
+            if kind == "literal":
+                if value[pos] != ch:
+                    return None
+                state = self._enter(index + 1) if pos + 1 == len(value) else (index, pos + 1, 0)
+            elif kind == "enum":
+                if ch == '"':
+                    state = self._enter(index + 1, 1) if pos in value else None
+                else:
+                    state = (index, pos + ch, 0) if any(v.startswith(pos + ch) for v in value) else None
+            elif escape == 1:  # After a backslash
+                if ch == "u":
+                    state = (index, pos, -4)
+                else:
+                    state = (index, pos, 0) if ch in '"\\/bfnrt' else None
+            elif escape < 0:  # Inside \uXXXX
+                state = (index, pos, escape + 1) if ch in self.HEX else None
+            elif ch == "\\":
+                state = (index, pos, 1)
+            elif ch == '"':
+                state = self._enter(index + 1, 1)  # The closing quote opens the next literal
+            elif ord(ch) < 0x20:
+                state = None
+        return state
+
+    def _candidates(self, state: tuple) -> Tuple[List[int], List[int]]:
+        """(tokens allowed without checking, tokens to check) from state"""
+        index, pos, escape = state
+        kind, value = self.segments[index]
+        if kind == "string" and escape == 0:
+            return self.table.plain, self.table.quoted
+        if kind == "literal":
+            first = {value[pos]}
+        elif kind == "enum":
+            first = {v[len(pos)] for v in value if v.startswith(pos) and len(v) > len(pos)}
+            if pos in value:
+                first.add('"')
+        elif escape == 1:
+            first = set('"\\/bfnrtu')
+        else:
+            first = self.HEX
+        return [], [t for ch in first for t in self.table.by_first.get(ch, [])]
+
+    def mask(self, state: tuple, size: int, device: torch.device, eos_ids: set) -> torch.Tensor:
+        """Boolean mask of tokens allowed next (cached per state)"""
+        key = (state, size, str(device))
+        cached = self.masks.get(key)
+        if cached is not None:
+            return cached
+        if self.done(state):
+            allowed = list(eos_ids)
+        else:
+            free, check = self._candidates(state)
+            allowed = free + [t for t in check if self.advance(state, self.table.texts[t]) is not None]
+        mask = torch.zeros(size, dtype=torch.bool, device=device)
+        allowed = [t for t in allowed if t < size] or [t for t in eos_ids if t < size]
+        mask[torch.tensor(allowed, dtype=torch.long, device=device)] = True
+        self.masks[key] = mask
+        return mask
+
+
+class JsonConstraint:
+    """Per-request position in a JsonGrammar"""
+
+    def __init__(self, grammar: JsonGrammar):
+        self.grammar = grammar
+        self.state: Optional[tuple] = grammar.start()
+
+    def mask(self, size: int, device: torch.device, eos_ids: set) -> torch.Tensor:
+        return self.grammar.mask(self.state, size, device, eos_ids)
+
+    def advance(self, token: int) -> None:
+        text = self.grammar.table.texts[token] if token < len(self.grammar.table.texts) else ""
+        self.state = self.grammar.advance(self.state, text) or self.state
+
+
+def response_schema(response_format: Optional[dict]) -> Optional[dict]:
+    """JSON schema from an OpenAI-style response_format (None for plain text)"""
+    if not response_format or response_format.get("type", "text") == "text":
+        return None
+    if response_format.get("type") != "json_schema":
+        raise SchemaError("response_format type must be 'text' or 'json_schema'")
+    schema = (response_format.get("json_schema") or {}).get("schema")
+    if not isinstance(schema, dict):
+        raise SchemaError("response_format.json_schema.schema is required")
+    return schema
@@ -0,0 +1,341 @@
+"""Resident models: loading, startup progress and LRU swapping between models"""
+
+import asyncio
+import gc
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import torch
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer
+
+from batch_engine import BatchEngine
+from caches import PrefixKVCache, PromptCache
+from grammar import JsonConstraint, JsonGrammar, TokenTable, response_schema
+from settings import (
+    DEVICE, DTYPE_MAP, DTYPE_NAME, GRAMMAR_CACHE_SIZE, HF_TOKEN, MAX_BATCH_SIZE, MAX_QUEUE,
+    PREFIX_CACHE_MIN_TOKENS, PREFIX_CACHE_SIZE, PROMPT_CACHE_SIZE, QUEUE_TIMEOUT,
+)
+
+logger = logging.getLogger("bolt_xl_transformers")
+
+
+def resolve_dtype() -> torch.dtype:
+    return DTYPE_MAP.get(DTYPE_NAME, torch.float16)
+
+
+def _auth_kwargs() -> dict:
+    return {"token": HF_TOKEN} if HF_TOKEN else {}
+
+
+class ResidentModel:
+    """A loaded model with its tokenizer, prompt/prefix caches and batching engine"""
+
+    pinned = False
+
+    def __init__(self, name: str, model=None, tokenizer=None):
+        self.name = name
+        self._model = model
+        self._tokenizer = tokenizer
+        self.size_bytes = 0
+        self.leases = 0  # Requests holding this model (routed, not yet finished)
+        self.loaded_at = time.time()
+        self.last_used = time.time()
+        self.prefix_cache = PrefixKVCache(self, PREFIX_CACHE_SIZE, PREFIX_CACHE_MIN_TOKENS)
+        self.prompt_cache = PromptCache(self, PROMPT_CACHE_SIZE)
+        self.engine = BatchEngine(self, MAX_BATCH_SIZE, MAX_QUEUE, QUEUE_TIMEOUT)
+        self.token_table: Optional[TokenTable] = None
+        self.grammars: "OrderedDict[str, JsonGrammar]" = OrderedDict()
+        self.grammar_lock = threading.Lock()
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def tokenizer(self):
+        return self._tokenizer
+
+    @property
+    def draft_model(self):
+        return None
+
+    def idle(self) -> bool:
+        return self.leases == 0 and self.engine.idle()
+
+    def json_constraint(self, response_format: Optional[dict]) -> Optional[JsonConstraint]:
+        """
+        Constraint for a response_format, compiling and caching its grammar on first use.
+
+        The first call after a (re)load decodes the whole vocabulary, which
+        takes seconds; handlers call this through asyncio.to_thread.
+        """
+        schema = response_schema(response_format)
+        if schema is None:
+            return None
+        key = json.dumps(schema, sort_keys=True)
+        with self.grammar_lock:
+            if self.token_table is None or self.token_table.tokenizer is not self.tokenizer:
+                self.token_table = TokenTable(self.tokenizer)
+                self.grammars.clear()
+            grammar = self.grammars.get(key)
+            if grammar is None:
+                grammar = JsonGrammar(schema, self.token_table)
+                self.grammars[key] = grammar
+                while len(self.grammars) > GRAMMAR_CACHE_SIZE:
+                    self.grammars.popitem(last=False)
+            else:
+                self.grammars.move_to_end(key)
+        return JsonConstraint(grammar)
+
+    def release(self) -> None:
+        self.leases -= 1
+        self.last_used = time.time()
+
+    def unload(self) -> None:
+        self.engine.stop()
+        self.prefix_cache.clear()
+        self.grammars.clear()
+        self._model = None
+
+    def stats(self) -> dict:
+        return {
+            "pinned": self.pinned,
+            "size_gb": round(self.size_bytes / 1e9, 2),
+            "leases": self.leases,
+            "idle_seconds": round(time.time() - self.last_used, 1),
+            "batching": self.engine.stats(),
+        }
+
+
+class LoadProgress:
+    """
+    Staged startup readiness.
+
+    Each stage (tokenizer, model, draft model, warm-up) reports its own
+    state and timing; progress is the weighted share of finished stages.
+    """
+
+    WEIGHTS = {"tokenizer": 5, "model": 80, "draft_model": 10, "warmup": 5}
+    FINISHED = ("ready", "failed", "skipped")
+
+    def __init__(self):
+        self.stages: "OrderedDict[str, dict]" = OrderedDict()
+        self.started_at: Optional[float] = None
+
+    def add(self, name: str) -> None:
+        self.stages[name] = {"state": "pending", "seconds": None, "error": None}
+
+    @contextmanager
+    def stage(self, name: str):
+        entry = self.stages[name]
+        entry["state"] = "loading"
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as exc:
+            entry["state"] = "failed"
+            entry["error"] = str(exc)
+            raise
+        else:
+            entry["state"] = "ready"
+        finally:
+            entry["seconds"] = round(time.perf_counter() - started, 2)
+
+    def percent(self) -> int:
+        total = sum(self.WEIGHTS[name] for name in self.stages)
+        finished = sum(
+            self.WEIGHTS[name] for name, entry in self.stages.items() if entry["state"] in self.FINISHED
+        )
+        return round(100 * finished / total) if total else 0
+
+    def finished(self) -> bool:
+        return all(entry["state"] in self.FINISHED for entry in self.stages.values())
+
+    def skip_pending(self) -> None:
+        for entry in self.stages.values():
+            if entry["state"] == "pending":
+                entry["state"] = "skipped"
+
+    def stats(self) -> dict:
+        return {
+            "ready": bool(self.stages) and self.finished(),
+            "progress": self.percent(),
+            "elapsed_seconds": round(time.perf_counter() - self.started_at, 2) if self.started_at else None,
+            "stages": {name: dict(entry) for name, entry in self.stages.items()},
+        }
+
+
+def _from_pretrained(loader, name: str, **kwargs):
+    """Load from the local HF cache without hub round-trips, falling back to the hub on a miss"""
+    try:
+        return loader.from_pretrained(name, local_files_only=True, **kwargs)
+    except OSError:
+        return loader.from_pretrained(name, **kwargs)
+
+
+def read_tokenizer(name: str):
+    tokenizer_local = _from_pretrained(AutoTokenizer, name, trust_remote_code=True, **_auth_kwargs())
+    if tokenizer_local.pad_token_id is None:
+        tokenizer_local.pad_token = tokenizer_local.eos_token
+    return tokenizer_local
+
+
+def read_causal_lm(name: str, dtype: torch.dtype):
+    # safetensors checkpoints are memory-mapped and copied tensor by tensor
+    # straight to DEVICE (low_cpu_mem_usage + device_map), no full CPU copy
+    model_local = _from_pretrained(
+        AutoModelForCausalLM,
+        name,
+        torch_dtype=dtype,
+        device_map={"": DEVICE},
+        low_cpu_mem_usage=True,
+        trust_remote_code=True,
+        **_auth_kwargs(),
+    )
+    model_local.eval()
+    return model_local
+
+
+def _estimate_weight_bytes(name: str, dtype: torch.dtype) -> int:
+    """Weight size of name at dtype, from its config only (nothing is downloaded or allocated)"""
+    from accelerate import init_empty_weights
+
+    config = _from_pretrained(AutoConfig, name, trust_remote_code=True, **_auth_kwargs())
+    with init_empty_weights():
+        skeleton = AutoModelForCausalLM.from_config(config, trust_remote_code=True)
+    return sum(p.numel() for p in skeleton.parameters()) * torch.finfo(dtype).bits // 8
+
+
+class ModelUnavailableError(Exception):
+    """Raised when a requested model cannot be loaded"""
+
+
+class ModelManager:
+    """
+    Resident models keyed by name.
+
+    BOLT_MODEL is loaded at startup and pinned. Models listed in BOLT_MODELS
+    are loaded on first use (or ahead of time via /v1/models/load) on a
+    background thread while the resident ones keep serving. Before a load,
+    least recently used idle models are evicted until the new weights fit in
+    BOLT_MODEL_MEMORY_GB and BOLT_MAX_MODELS. Requests naming any other model
+    are routed to BOLT_MODEL.
+    """
+
+    def __init__(self, primary: ResidentModel, extra: List[str], max_models: int, memory_gb: float):
+        self.primary = primary
+        self.extra = [name for name in extra if name != primary.name]
+        self.max_models = max(1, max_models)
+        self.budget_bytes = int(memory_gb * 1e9)
+        self.resident: "OrderedDict[str, ResidentModel]" = OrderedDict([(primary.name, primary)])
+        self.loading: Dict[str, Future] = {}
+        self.errors: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bolt-swap")
+        self.loads = 0
+        self.evictions = 0
+
+    def resolve(self, name: Optional[str]) -> str:
+        return name if name in self.extra else self.primary.name
+
+    async def acquire(self, name: Optional[str]) -> ResidentModel:
+        """Resident model for a request (loading it if needed); call release() when done"""
+        name = self.resolve(name)
+        while True:
+            with self.lock:
+                resident = self.resident.get(name)
+                if resident is not None:
+                    resident.leases += 1
+                    resident.last_used = time.time()
+                    self.resident.move_to_end(name)
+                    return resident
+            await asyncio.wrap_future(self.load(name))
+
+    def load(self, name: str) -> Future:
+        """Start loading name in the background (no-op if resident or already loading)"""
+        with self.lock:
+            if name in self.resident:
+                future: Future = Future()
+                future.set_result(self.resident[name])
+                return future
+            future = self.loading.get(name)
+            if future is None:
+                future = self.pool.submit(self._load, name)
+                self.loading[name] = future
+            return future
+
+    def _load(self, name: str) -> ResidentModel:
+        started = time.perf_counter()
+        try:
+            dtype = resolve_dtype()
+            self._make_room(name, _estimate_weight_bytes(name, dtype))
+            logger.info("Loading model %s (%s)", name, dtype)
+            resident = ResidentModel(name, read_causal_lm(name, dtype), read_tokenizer(name))
+            resident.size_bytes = resident.model.get_memory_footprint()
+        except Exception as exc:
+            self.errors[name] = str(exc)
+            logger.error("Failed to load model %s: %s", name, exc)
+            raise ModelUnavailableError(f"Model {name} could not be loaded: {exc}") from exc
+        finally:
+            with self.lock:
+                self.loading.pop(name, None)
+
+        with self.lock:
+            self.resident[name] = resident
+            self.errors.pop(name, None)
+            self.loads += 1
+        logger.info("Model %s resident in %.1fs (%.2f GB)", name, time.perf_counter() - started, resident.size_bytes / 1e9)
+        return resident
+
+    def _make_room(self, name: str, needed: int) -> None:
+        """Evict least recently used idle models until needed bytes and one more slot fit"""
+        while True:
+            with self.lock:
+                used = sum(r.size_bytes for r in self.resident.values())
+                fits_memory = not self.budget_bytes or used + needed <= self.budget_bytes
+                if fits_memory and len(self.resident) < self.max_models:
+                    return
+                victim = next((r for r in self.resident.values() if not r.pinned and r.idle()), None)
+                if victim is None:
+                    raise ModelUnavailableError(f"No room for {name}: other resident models are pinned or busy")
+                del self.resident[victim.name]
+            self.unload(victim)
+
+    def unload(self, resident: ResidentModel) -> None:
+        logger.info("Evicting model %s", resident.name)
+        resident.unload()
+        self.evictions += 1
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def evict(self, name: str) -> bool:
+        """Unload an idle, unpinned resident model"""
+        with self.lock:
+            resident = self.resident.get(name)
+            if resident is None or resident.pinned or not resident.idle():
+                return False
+            del self.resident[name]
+        self.unload(resident)
+        return True
+
+    def stats(self) -> dict:
+        with self.lock:
+            resident = {name: r.stats() for name, r in self.resident.items()}
+        return {
+            "resident": resident,
+            "loading": list(self.loading),
+            "available": [self.primary.name] + self.extra,
+            "errors": dict(self.errors),
+            "max_models": self.max_models,
+            "memory_budget_gb": self.budget_bytes / 1e9 if self.budget_bytes else None,
+            "used_gb": round(sum(r["size_gb"] for r in resident.values()), 2),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
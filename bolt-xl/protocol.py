@@ -0,0 +1,38 @@
+"""OpenAI-compatible request bodies"""
+
+from typing import List, Optional, Union
+
+from pydantic import BaseModel
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+
+class ChatCompletionRequest(BaseModel):
+    messages: List[ChatMessage]
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = 0.7
+    top_p: Optional[float] = 0.9
+    stream: Optional[bool] = False
+    stop: Optional[List[str]] = None
+    cache_prompt: Optional[bool] = True
+    response_format: Optional[dict] = None
+
+
+class CompletionRequest(BaseModel):
+    prompt: Union[str, List[str]]
+    model: Optional[str] = None
+    max_tokens: Optional[int] = 16
+    temperature: Optional[float] = 0.7
+    top_p: Optional[float] = 1.0
+    stream: Optional[bool] = False
+    stop: Optional[Union[str, List[str]]] = None
+    logprobs: Optional[int] = None
+    echo: Optional[bool] = False
+
+
+class ModelActionRequest(BaseModel):
+    model: str
@@ -1,15 +1,21 @@
+import asyncio
+import bisect
+import copy
 import json
 import logging
+import math
 import os
+import re
 import threading
 import time
-from typing import List, Optional
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 
 import torch
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from transformers import AutoTokenizer, TextIteratorStreamer
+from transformers import AutoTokenizer, DynamicCache, StoppingCriteria, StoppingCriteriaList, TextStreamer
 from awq import AutoAWQForCausalLM
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
@@ -19,6 +25,13 @@ MODEL_NAME = os.getenv("BOLT_MODEL", "casperhansen/gemma-7b-it-awq")
 HF_TOKEN = os.getenv("HF_TOKEN")
 MAX_NEW_TOKENS_CAP = int(os.getenv("BOLT_MAX_NEW_TOKENS", "1024"))
 FUSE_LAYERS_ENV = os.getenv("BOLT_FUSE_LAYERS", "auto").strip().lower()
+PREFIX_CACHE_SIZE = int(os.getenv("BOLT_PREFIX_CACHE_SIZE", "4"))  # 0 disables prefix KV reuse
+PREFIX_CACHE_MIN_TOKENS = int(os.getenv("BOLT_PREFIX_CACHE_MIN_TOKENS", "32"))
+PROMPT_CACHE_SIZE = int(os.getenv("BOLT_PROMPT_CACHE_SIZE", "64"))  # Tokenized message prefixes (0 disables)
+MAX_CONCURRENCY = int(os.getenv("BOLT_MAX_CONCURRENCY", "1"))  # Concurrent model.generate calls
+MAX_QUEUE = int(os.getenv("BOLT_MAX_QUEUE", "32"))  # Waiting requests before 429 (0 = unbounded)
+QUEUE_TIMEOUT = float(os.getenv("BOLT_QUEUE_TIMEOUT", "60"))  # Seconds queued before 503 (0 = no limit)
+DISCONNECT_POLL_SECONDS = 0.5
 
 
 def _kernels_available() -> bool:
@@ -51,6 +64,7 @@ app = FastAPI(title="Bolt-XL AutoAWQ", version="0.2.0")
 model = None
 tokenizer = None
 load_error = None
+fused_layers = False
 
 
 class ChatMessage(BaseModel):
@@ -65,6 +79,87 @@ class ChatCompletionRequest(BaseModel):
     temperature: Optional[float] = 0.7
     top_p: Optional[float] = 0.9
     stream: Optional[bool] = False
+    cache_prompt: Optional[bool] = True
+
+
+class PrefixKVCache:
+    """
+    LRU of prefilled KV caches for system-prompt (persona) prefixes.
+
+    Keyed by the leading system message text. Each entry holds the prefix
+    token ids and a DynamicCache covering them; requests whose prompt starts
+    with those ids get a copy of the cache and skip re-prefilling the prefix.
+    """
+
+    def __init__(self, max_entries: int, min_tokens: int):
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens
+        self.entries: "OrderedDict[str, Tuple[torch.Tensor, DynamicCache]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+
+    def _prefix_length(self, messages: List[ChatMessage], input_ids: torch.Tensor) -> int:
+        """Tokens shared by this prompt and the system message followed by an empty user turn"""
+        placeholder = [messages[0], ChatMessage(role="user", content="")]
+        placeholder_ids = tokenizer(_build_prompt(placeholder), return_tensors="pt")["input_ids"][0]
+        full_ids = input_ids[0].cpu()
+        limit = min(placeholder_ids.shape[-1], full_ids.shape[-1] - 1)
+        mismatch = (placeholder_ids[:limit] != full_ids[:limit]).nonzero()
+        return int(mismatch[0]) if mismatch.numel() else limit
+
+    def get(self, messages: List[ChatMessage], input_ids: torch.Tensor) -> Optional[DynamicCache]:
+        """Return a private copy of the prefix cache for this prompt, building it on a miss"""
+        # Only the persona prompt is stable; history and memories follow it
+        key = messages[0].content if messages and messages[0].role == "system" else ""
+        if not key or self.max_entries <= 0:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+        if entry is None:
+            self.misses += 1
+            prefix_len = self._prefix_length(messages, input_ids)
+            if prefix_len < self.min_tokens:
+                return None
+            prefix_ids = input_ids[:, :prefix_len]
+            with torch.inference_mode():
+                cache = model(input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+            entry = (prefix_ids, cache)
+            with self.lock:
+                self.entries[key] = entry
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        else:
+            self.hits += 1
+
+        prefix_ids, cache = entry
+        prefix_len = prefix_ids.shape[-1]
+        if prefix_len >= input_ids.shape[-1] or not torch.equal(input_ids[:, :prefix_len], prefix_ids):
+            return None
+
+        self.reused_tokens += prefix_len
+        # generate() appends to the cache, so each request needs its own copy
+        return copy.deepcopy(cache)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reused_tokens": self.reused_tokens,
+        }
+
+
+prefix_cache = PrefixKVCache(PREFIX_CACHE_SIZE, PREFIX_CACHE_MIN_TOKENS)
 
 
 def _auth_kwargs() -> dict:
@@ -83,6 +178,124 @@ def _build_prompt(messages: List[ChatMessage]) -> str:
     return prompt
 
 
+class PromptCache:
+    """
+    Chat-template rendering + tokenization cache keyed by message prefix.
+
+    A miss tokenizes the full prompt once (with offsets) and remembers the
+    token ids of every message prefix that ends on a special token such as a
+    turn marker. Later prompts sharing a cached prefix (same persona prompt,
+    same conversation so far) only tokenize the text after it. Special tokens
+    are split out before BPE, so ids on either side of such a boundary do
+    not depend on each other.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, Tuple[str, List[int]]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.boundary_re: Optional["re.Pattern"] = None
+        self.boundary_tokenizer = None
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+
+    def _boundaries(self, prompt: str) -> List[int]:
+        """End offsets of special tokens in the prompt"""
+        if self.boundary_tokenizer is not tokenizer:
+            markers = [
+                token.content
+                for token in getattr(tokenizer, "added_tokens_decoder", {}).values()
+                if token.special and not token.lstrip and not token.rstrip and token.content
+            ]
+            markers.sort(key=len, reverse=True)
+            self.boundary_re = re.compile("|".join(re.escape(m) for m in markers)) if markers else None
+            self.boundary_tokenizer = tokenizer
+        if self.boundary_re is None:
+            return []
+        return [m.end() for m in self.boundary_re.finditer(prompt)]
+
+    def _remember(
+        self, key: tuple, prompt: str, ids: List[int], offsets: List[Tuple[int, int]], min_cut: int = 0
+    ) -> None:
+        boundaries = self._boundaries(prompt)
+        if not boundaries:
+            return
+        token_ends = [end for _, end in offsets]
+        position = 0
+        new_entries = []
+        for k in range(1, len(key) + 1):
+            if k < len(key):
+                content = key[k][1]
+                position = prompt.find(content, position) if content else -1
+                if position == -1:
+                    break
+            else:
+                position = len(prompt)
+            b = bisect.bisect_right(boundaries, position) - 1
+            if b < 0:
+                continue
+            cut = boundaries[b]
+            if cut < min_cut:
+                # Inside the reused prefix, whose per-token offsets are unknown
+                continue
+            n_tokens = bisect.bisect_right(token_ends, cut)
+            new_entries.append((key[:k], (prompt[:cut], ids[:n_tokens])))
+
+        with self.lock:
+            for prefix_key, entry in new_entries:
+                self.entries[prefix_key] = entry
+                self.entries.move_to_end(prefix_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def encode(self, messages: List[ChatMessage]) -> Tuple[str, List[int]]:
+        """Render the chat prompt and return it with its token ids"""
+        prompt = _build_prompt(messages)
+        if self.max_entries <= 0 or not getattr(tokenizer, "is_fast", False):
+            return prompt, tokenizer(prompt)["input_ids"]
+
+        key = tuple((m.role, m.content) for m in messages)
+        cached = None
+        with self.lock:
+            for k in range(len(key), 0, -1):
+                entry = self.entries.get(key[:k])
+                if entry is not None and prompt.startswith(entry[0]):
+                    self.entries.move_to_end(key[:k])
+                    cached = entry
+                    break
+
+        shift = 0
+        if cached is None:
+            with self.lock:
+                self.misses += 1
+            encoded = tokenizer(prompt, return_offsets_mapping=True)
+            ids, offsets = encoded["input_ids"], encoded["offset_mapping"]
+        else:
+            cut_text, cut_ids = cached
+            with self.lock:  # encode() runs in worker threads
+                self.hits += 1
+                self.reused_tokens += len(cut_ids)
+            encoded = tokenizer(prompt[len(cut_text):], add_special_tokens=False, return_offsets_mapping=True)
+            shift = len(cut_text)
+            ids = cut_ids + encoded["input_ids"]
+            offsets = [(shift, shift)] * len(cut_ids) + [(s + shift, e + shift) for s, e in encoded["offset_mapping"]]
+
+        self._remember(key, prompt, ids, offsets, min_cut=shift)
+        return prompt, ids
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reused_tokens": self.reused_tokens,
+        }
+
+
+prompt_cache = PromptCache(PROMPT_CACHE_SIZE)
+
+
 def _resolve_max_new_tokens(requested: Optional[int]) -> int:
     if requested is None:
         requested = 256
@@ -100,34 +313,237 @@ def _model_device() -> torch.device:
         return torch.device("cuda:0")
 
 
-def _generate_response(prompt: str, max_new_tokens: int, temperature: float, top_p: float) -> str:
-    inputs = tokenizer(prompt, return_tensors="pt")
-    device = _model_device()
-    input_ids = inputs["input_ids"].to(device)
-    attention_mask = inputs.get("attention_mask")
-    if attention_mask is not None:
-        attention_mask = attention_mask.to(device)
+class QueueFullError(Exception):
+    """Raised when the generation queue is full"""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Generation queue is full. Retry after {retry_after}s.")
+
+
+class GenerationSlots:
+    """
+    Bounded admission for model.generate calls.
+
+    At most max_concurrency generations run at once and at most max_queue
+    requests wait; beyond that reserve() rejects immediately. Waiting happens
+    on the generation thread, never on the event loop.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.served = 0
+        self.total_service = 0.0
+
+    def _retry_after(self) -> int:
+        avg_service = self.total_service / self.served if self.served else 1.0
+        backlog = self.waiting + self.active + 1
+        return max(1, math.ceil(avg_service * backlog / self.max_concurrency))
+
+    def reserve(self) -> None:
+        """Claim a queue position or raise QueueFullError"""
+        with self.cond:
+            if self.active >= self.max_concurrency and self.max_queue and self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(self._retry_after())
+            self.waiting += 1
+
+    def acquire(self, cancel_event: threading.Event) -> bool:
+        """Wait for a free slot. Returns False if cancelled or timed out while queued."""
+        started = time.perf_counter()
+        with self.cond:
+            try:
+                while self.active >= self.max_concurrency:
+                    if cancel_event.is_set():
+                        self.cancelled += 1
+                        return False
+                    remaining = DISCONNECT_POLL_SECONDS
+                    if self.queue_timeout:
+                        remaining = min(remaining, started + self.queue_timeout - time.perf_counter())
+                        if remaining <= 0:
+                            self.timed_out += 1
+                            return False
+                    self.cond.wait(timeout=remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+
+            waited = time.perf_counter() - started
+            self.admitted += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return True
 
-    do_sample = temperature is not None and temperature > 0
+    def release(self, service_time: float) -> None:
+        with self.cond:
+            self.active -= 1
+            self.served += 1
+            self.total_service += service_time
+            self.cond.notify()
 
-    with torch.inference_mode():
-        output = model.generate(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
-            max_new_tokens=max_new_tokens,
-            do_sample=do_sample,
-            temperature=temperature if do_sample else None,
-            top_p=top_p if do_sample else None,
-            eos_token_id=tokenizer.eos_token_id,
-            pad_token_id=tokenizer.pad_token_id,
-        )
-    generated = output[0][input_ids.shape[-1]:]
-    return tokenizer.decode(generated, skip_special_tokens=True)
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "avg_queue_wait_ms": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "max_queue_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+slots = GenerationSlots(MAX_CONCURRENCY, MAX_QUEUE, QUEUE_TIMEOUT)
+
+
+class GenerationJob:
+    """State shared between a request handler and its generation thread"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.cancel_event = threading.Event()
+        self.events: "asyncio.Queue[Optional[str]]" = asyncio.Queue()  # Text deltas, None when finished
+        self.done = threading.Event()
+        self.text = ""
+        self.finish_reason: Optional[str] = None
+        self.error: Optional[str] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def put(self, item: Optional[str]) -> None:
+        self.loop.call_soon_threadsafe(self.events.put_nowait, item)
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def usage(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+        }
+
+
+class CancelCriteria(StoppingCriteria):
+    """Stops model.generate once the client has gone away"""
+
+    def __init__(self, cancel_event: threading.Event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        return self.cancel_event.is_set()
+
+
+class JobStreamer(TextStreamer):
+    """TextStreamer that forwards decoded text to a GenerationJob"""
+
+    def __init__(self, job: GenerationJob, **kwargs):
+        super().__init__(tokenizer, skip_prompt=True, **kwargs)
+        self.job = job
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.job.put(text)
+
+
+def _run_generation(
+    job: GenerationJob,
+    gen_kwargs: dict,
+    stream: bool,
+    cache_messages: Optional[List[ChatMessage]] = None,
+) -> None:
+    """Generation thread: wait for a slot, generate, publish the result"""
+    try:
+        if not slots.acquire(job.cancel_event):
+            if job.cancelled:
+                job.finish_reason = "cancelled"
+            else:
+                job.finish_reason = "timeout"
+                job.error = "Request timed out in the generation queue"
+            return
+
+        started = time.perf_counter()
+        try:
+            if cache_messages:
+                past_key_values = prefix_cache.get(cache_messages, gen_kwargs["input_ids"])
+                if past_key_values is not None:
+                    gen_kwargs["past_key_values"] = past_key_values
+            if stream:
+                gen_kwargs["streamer"] = JobStreamer(job, skip_special_tokens=True)
+            with torch.inference_mode():
+                output = model.generate(
+                    stopping_criteria=StoppingCriteriaList([CancelCriteria(job.cancel_event)]),
+                    **gen_kwargs,
+                )
+        finally:
+            slots.release(time.perf_counter() - started)
+
+        generated = output[0][gen_kwargs["input_ids"].shape[-1]:]
+        job.text = tokenizer.decode(generated, skip_special_tokens=True)
+        job.completion_tokens = int(generated.shape[-1])
+        if job.cancelled:
+            job.finish_reason = "cancelled"
+        elif job.completion_tokens >= gen_kwargs["max_new_tokens"]:
+            job.finish_reason = "length"
+        else:
+            job.finish_reason = "stop"
+            if job.completion_tokens and int(generated[-1]) in (tokenizer.eos_token_id, tokenizer.pad_token_id):
+                # The EOS that ended generation is not part of the completion
+                job.completion_tokens -= 1
+    except Exception as exc:
+        logger.exception("Generation failed")
+        job.error = str(exc)
+    finally:
+        job.done.set()
+        job.put(None)
+
+
+async def _iter_events(job: GenerationJob, http_request: Request):
+    """Yield text deltas until the job finishes; cancel it if the client goes away"""
+    try:
+        while True:
+            try:
+                delta = await asyncio.wait_for(job.events.get(), DISCONNECT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                if await http_request.is_disconnected():
+                    logger.info("Client disconnected; cancelling generation")
+                    job.cancel()
+                    return
+                continue
+            if delta is None:
+                return
+            yield delta
+    finally:
+        if not job.done.is_set():
+            job.cancel()
 
 
 @app.on_event("startup")
 def load_model():
-    global model, tokenizer, load_error
+    # Load in the background so /health answers (status: loading) during startup
+    threading.Thread(target=_load_model, name="bolt-load", daemon=True).start()
+
+
+def _load_model():
+    global model, tokenizer, load_error, fused_layers
+    started = time.perf_counter()
     try:
         logger.info("Loading AutoAWQ model: %s", MODEL_NAME)
         fuse_layers = _resolve_fuse_layers()
@@ -148,7 +564,11 @@ def load_model():
 
         tokenizer = tokenizer_local
         model = model_local
-        logger.info("AutoAWQ model loaded.")
+        fused_layers = fuse_layers
+        if fused_layers:
+            # Fused AWQ layers keep their own static KV cache; HF caches can't be injected
+            logger.info("Prefix KV reuse disabled with fused layers.")
+        logger.info("AutoAWQ model loaded in %.1fs.", time.perf_counter() - started)
     except Exception as exc:
         load_error = str(exc)
         logger.error("Failed to load model: %s", exc)
@@ -156,7 +576,14 @@ def load_model():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy" if model else "loading", "model": MODEL_NAME, "error": load_error}
+    return {
+        "status": "healthy" if model else "loading",
+        "model": MODEL_NAME,
+        "error": load_error,
+        "prefix_cache": prefix_cache.stats(),
+        "prompt_cache": prompt_cache.stats(),
+        "queue": slots.stats(),
+    }
 
 
 @app.get("/v1/models")
@@ -175,45 +602,19 @@ def list_models():
 
 
 @app.post("/v1/chat/completions")
-def chat_completions(request: ChatCompletionRequest):
+async def chat_completions(request: ChatCompletionRequest, http_request: Request):
     if model is None or tokenizer is None:
         raise HTTPException(status_code=503, detail=load_error or "Model is still loading")
 
-    prompt = _build_prompt(request.messages)
+    # Tokenizing a long prompt takes a while; keep it off the event loop
+    _, prompt_ids = await asyncio.to_thread(prompt_cache.encode, request.messages)
     max_new_tokens = _resolve_max_new_tokens(request.max_tokens)
     temperature = request.temperature or 0.7
     top_p = request.top_p or 0.9
 
-    if not request.stream:
-        content = _generate_response(prompt, max_new_tokens, temperature, top_p)
-        prompt_ids = tokenizer(prompt, return_tensors="pt")["input_ids"][0]
-        completion_ids = tokenizer(content, return_tensors="pt", add_special_tokens=False)["input_ids"][0]
-
-        return {
-            "id": f"chatcmpl-{int(time.time())}",
-            "object": "chat.completion",
-            "created": int(time.time()),
-            "model": MODEL_NAME,
-            "choices": [
-                {
-                    "index": 0,
-                    "message": {"role": "assistant", "content": content},
-                    "finish_reason": "stop",
-                }
-            ],
-            "usage": {
-                "prompt_tokens": int(prompt_ids.numel()),
-                "completion_tokens": int(completion_ids.numel()),
-                "total_tokens": int(prompt_ids.numel() + completion_ids.numel()),
-            },
-        }
-
-    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
-    inputs = tokenizer(prompt, return_tensors="pt")
-    input_ids = inputs["input_ids"].to(model.device)
-    attention_mask = inputs.get("attention_mask")
-    if attention_mask is not None:
-        attention_mask = attention_mask.to(model.device)
+    device = _model_device()
+    input_ids = torch.tensor([prompt_ids], dtype=torch.long, device=device)
+    attention_mask = torch.ones_like(input_ids)
 
     do_sample = temperature is not None and temperature > 0
     gen_kwargs = {
@@ -225,16 +626,63 @@ def chat_completions(request: ChatCompletionRequest):
         "top_p": top_p if do_sample else None,
         "eos_token_id": tokenizer.eos_token_id,
         "pad_token_id": tokenizer.pad_token_id,
-        "streamer": streamer,
     }
+    cache_messages = request.messages if request.cache_prompt and not fused_layers else None
 
-    thread = threading.Thread(target=model.generate, kwargs=gen_kwargs, daemon=True)
-    thread.start()
+    try:
+        slots.reserve()
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)})
+
+    job = GenerationJob(asyncio.get_running_loop())
+    job.prompt_tokens = len(prompt_ids)
+    threading.Thread(
+        target=_run_generation,
+        args=(job, gen_kwargs, bool(request.stream), cache_messages),
+        daemon=True,
+    ).start()
 
-    def event_stream():
-        for token in streamer:
+    if not request.stream:
+        async for _ in _iter_events(job, http_request):
+            pass
+        if job.finish_reason == "timeout":
+            raise HTTPException(status_code=503, detail=job.error, headers={"Retry-After": str(slots._retry_after())})
+        if job.error:
+            raise HTTPException(status_code=500, detail=job.error)
+        if job.cancelled:
+            raise HTTPException(status_code=499, detail="Client disconnected")
+
+        content = job.text
+        return {
+            "id": f"chatcmpl-{int(time.time())}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": MODEL_NAME,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": job.finish_reason,
+                }
+            ],
+            "usage": job.usage(),
+        }
+
+    async def event_stream():
+        async for token in _iter_events(job, http_request):
             payload = {"choices": [{"delta": {"content": token}}]}
             yield f"data: {json.dumps(payload)}\n\n"
-        yield "data: {\"choices\": [{\"finish_reason\": \"stop\"}]}\n\n"
+        if job.cancelled:
+            return
+        if job.error:
+            # Failed generation or queue timeout: don't let it pass for a normal (short) completion
+            final = {
+                "choices": [{"delta": {}, "finish_reason": "error"}],
+                "error": {"message": job.error, "type": "timeout" if job.finish_reason == "timeout" else "server_error"},
+                "usage": job.usage(),
+            }
+        else:
+            final = {"choices": [{"finish_reason": job.finish_reason or "stop"}], "usage": job.usage()}
+        yield f"data: {json.dumps(final)}\n\n"
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
@@ -1,253 +1,548 @@
+import asyncio
 import json
 import logging
-import os
 import threading
 import time
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 import torch
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
+from starlette.background import BackgroundTask
+
+from batch_engine import BatchEngine, GenerationRequest, QueueFullError, ScoreRequest
+from grammar import SchemaError
+from model_manager import (
+    LoadProgress, ModelManager, ModelUnavailableError, ResidentModel, read_causal_lm, read_tokenizer,
+    resolve_dtype,
+)
+from protocol import ChatCompletionRequest, ChatMessage, CompletionRequest, ModelActionRequest
+from settings import (
+    DISCONNECT_POLL_SECONDS, DRAFT_MODEL_NAME, DRAFT_TOKENS, EXTRA_MODELS, MAX_LOGPROBS, MAX_MODELS,
+    MAX_NEW_TOKENS_CAP, MODEL_MEMORY_GB, MODEL_NAME, WARMUP, WARMUP_TOKENS,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
 logger = logging.getLogger("bolt_xl_transformers")
 
-MODEL_NAME = os.getenv("BOLT_MODEL", "google/gemma-2b-it")
-HF_TOKEN = os.getenv("HF_TOKEN")
-MAX_NEW_TOKENS_CAP = int(os.getenv("BOLT_MAX_NEW_TOKENS", "1024"))
-DTYPE_NAME = os.getenv("BOLT_DTYPE", "float16").strip().lower()
-
-DTYPE_MAP = {
-    "float16": torch.float16,
-    "fp16": torch.float16,
-    "bfloat16": torch.bfloat16,
-    "bf16": torch.bfloat16,
-    "float32": torch.float32,
-    "fp32": torch.float32,
-}
 
 app = FastAPI(title="Bolt-XL Transformers", version="0.3.0")
 
 model = None
+draft_model = None
 tokenizer = None
 load_error = None
 
 
-class ChatMessage(BaseModel):
-    role: str
-    content: str
+def _resolve_max_new_tokens(requested: Optional[int]) -> int:
+    if requested is None:
+        requested = 256
+    if MAX_NEW_TOKENS_CAP > 0:
+        return min(requested, MAX_NEW_TOKENS_CAP)
+    return requested
+
+
+class PrimaryModel(ResidentModel):
+    """BOLT_MODEL: loaded at startup into the module globals, never evicted"""
+
+    pinned = True
+
+    @property
+    def model(self):
+        return model
+
+    @property
+    def tokenizer(self):
+        return tokenizer
 
+    @property
+    def draft_model(self):
+        return draft_model
 
-class ChatCompletionRequest(BaseModel):
-    messages: List[ChatMessage]
-    model: Optional[str] = None
-    max_tokens: Optional[int] = None
-    temperature: Optional[float] = 0.7
-    top_p: Optional[float] = 0.9
-    stream: Optional[bool] = False
 
+primary = PrimaryModel(MODEL_NAME)
+engine = primary.engine
+prefix_cache = primary.prefix_cache
+prompt_cache = primary.prompt_cache
 
-def _auth_kwargs() -> dict:
-    return {"token": HF_TOKEN} if HF_TOKEN else {}
 
+load_progress = LoadProgress()
 
-def _normalize_messages(messages: List[ChatMessage]) -> List[dict]:
-    system_texts = [m.content for m in messages if m.role == "system"]
-    payload = [{"role": m.role, "content": m.content} for m in messages if m.role != "system"]
-    if system_texts:
-        system_blob = "\n".join(text for text in system_texts if text).strip()
-        if system_blob:
-            if payload and payload[0]["role"] == "user":
-                payload[0]["content"] = f"{system_blob}\n\n{payload[0]['content']}"
-            else:
-                payload.insert(0, {"role": "user", "content": system_blob})
-    return payload
 
+def _load_tokenizer():
+    with load_progress.stage("tokenizer"):
+        return read_tokenizer(MODEL_NAME)
 
-def _build_prompt(messages: List[ChatMessage]) -> str:
-    payload_all = [{"role": m.role, "content": m.content} for m in messages]
-    payload = _normalize_messages(messages)
-    if hasattr(tokenizer, "apply_chat_template"):
+
+def _load_causal_lm(stage: str, name: str, dtype: torch.dtype):
+    with load_progress.stage(stage):
+        logger.info("Loading %s: %s (%s)", stage.replace("_", " "), name, dtype)
+        return read_causal_lm(name, dtype)
+
+
+def _load_all() -> None:
+    """Load tokenizer, model and draft model in parallel, then optionally warm up"""
+    global model, draft_model, tokenizer, load_error
+    dtype = resolve_dtype()
+    load_progress.started_at = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="bolt-load") as pool:
+        tokenizer_future = pool.submit(_load_tokenizer)
+        model_future = pool.submit(_load_causal_lm, "model", MODEL_NAME, dtype)
+        draft_future = pool.submit(_load_causal_lm, "draft_model", DRAFT_MODEL_NAME, dtype) if DRAFT_MODEL_NAME else None
         try:
-            return tokenizer.apply_chat_template(payload_all, tokenize=False, add_generation_prompt=True)
+            tokenizer_local = tokenizer_future.result()
+            model_local = model_future.result()
         except Exception as exc:
-            logger.warning("Chat template failed; retrying without system messages: %s", exc)
-            try:
-                return tokenizer.apply_chat_template(payload, tokenize=False, add_generation_prompt=True)
-            except Exception as exc2:
-                logger.warning("Chat template fallback failed; using raw prompt: %s", exc2)
-    prompt = ""
-    for msg in payload:
-        prompt += f"<|im_start|>{msg['role']}\n{msg['content']}<|im_end|>\n"
-    prompt += "<|im_start|>assistant\n"
-    return prompt
+            load_error = str(exc)
+            logger.error("Failed to load model: %s", exc)
+            load_progress.skip_pending()
+            return
 
+    tokenizer = tokenizer_local
+    model = model_local
+    primary.size_bytes = model.get_memory_footprint()
+    logger.info("Transformers model loaded in %.1fs.", time.perf_counter() - load_progress.started_at)
 
-def _resolve_max_new_tokens(requested: Optional[int]) -> int:
-    if requested is None:
-        requested = 256
-    if MAX_NEW_TOKENS_CAP > 0:
-        return min(requested, MAX_NEW_TOKENS_CAP)
-    return requested
+    if draft_future is not None:
+        try:
+            draft = draft_future.result()
+            if draft.get_output_embeddings().weight.shape[0] != model.get_output_embeddings().weight.shape[0]:
+                raise ValueError(f"Draft model vocabulary does not match {MODEL_NAME}")
+            draft_model = draft
+            logger.info("Draft model loaded; speculating %d tokens per step.", DRAFT_TOKENS)
+        except Exception as exc:
+            load_progress.stages["draft_model"].update(state="failed", error=str(exc))
+            logger.error("Speculative decoding disabled: %s", exc)
 
+    if WARMUP:
+        try:
+            with load_progress.stage("warmup"):
+                _warm_up()
+        except Exception as exc:
+            logger.warning("Warm-up generation failed: %s", exc)
 
-def _model_device() -> torch.device:
-    if hasattr(model, "device"):
-        return model.device
-    try:
-        return next(model.parameters()).device
-    except StopIteration:
-        return torch.device("cuda:0")
-
-
-def _resolve_dtype() -> torch.dtype:
-    return DTYPE_MAP.get(DTYPE_NAME, torch.float16)
-
-
-def _generate_response(prompt: str, max_new_tokens: int, temperature: float, top_p: float) -> str:
-    inputs = tokenizer(prompt, return_tensors="pt")
-    device = _model_device()
-    input_ids = inputs["input_ids"].to(device)
-    attention_mask = inputs.get("attention_mask")
-    if attention_mask is not None:
-        attention_mask = attention_mask.to(device)
-
-    do_sample = temperature is not None and temperature > 0
-
-    with torch.inference_mode():
-        output = model.generate(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
-            max_new_tokens=max_new_tokens,
-            do_sample=do_sample,
-            temperature=temperature if do_sample else None,
-            top_p=top_p if do_sample else None,
-            eos_token_id=tokenizer.eos_token_id,
-            pad_token_id=tokenizer.pad_token_id,
-        )
-    generated = output[0][input_ids.shape[-1]:]
-    return tokenizer.decode(generated, skip_special_tokens=True)
+
+def _warm_up() -> None:
+    """Short generation through the engine so kernels and allocator pools are ready for real traffic"""
+    _, input_ids = prompt_cache.encode([ChatMessage(role="user", content="Hello")])
+    request = engine.submit(GenerationRequest(input_ids, WARMUP_TOKENS, temperature=0, top_p=1.0))
+    if not request.done.wait(timeout=300):
+        request.cancel()
+        raise TimeoutError("Warm-up generation did not finish")
+    if request.error:
+        raise RuntimeError(request.error)
+
+
+models = ModelManager(primary, EXTRA_MODELS, MAX_MODELS, MODEL_MEMORY_GB)
 
 
 @app.on_event("startup")
 def load_model():
-    global model, tokenizer, load_error
-    try:
-        dtype = _resolve_dtype()
-        logger.info("Loading Transformers model: %s", MODEL_NAME)
-        logger.info("Requested dtype: %s", dtype)
-        tokenizer_local = AutoTokenizer.from_pretrained(MODEL_NAME, trust_remote_code=True, **_auth_kwargs())
-        if tokenizer_local.pad_token_id is None:
-            tokenizer_local.pad_token = tokenizer_local.eos_token
-
-        model_local = AutoModelForCausalLM.from_pretrained(
-            MODEL_NAME,
-            torch_dtype=dtype,
-            device_map={"": "cuda:0"},
-            low_cpu_mem_usage=True,
-            trust_remote_code=True,
-            **_auth_kwargs(),
-        )
-        model_local.eval()
-
-        tokenizer = tokenizer_local
-        model = model_local
-        logger.info("Transformers model loaded.")
-    except Exception as exc:
-        load_error = str(exc)
-        logger.error("Failed to load model: %s", exc)
+    # Serve /health (with progress) while weights load
+    load_progress.add("tokenizer")
+    load_progress.add("model")
+    if DRAFT_MODEL_NAME:
+        load_progress.add("draft_model")
+    if WARMUP:
+        load_progress.add("warmup")
+    threading.Thread(target=_load_all, name="bolt-load", daemon=True).start()
 
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy" if model else "loading", "model": MODEL_NAME, "error": load_error}
+    return {
+        "status": "healthy" if model else ("error" if load_error else "loading"),
+        "model": MODEL_NAME,
+        "error": load_error,
+        "loading": load_progress.stats(),
+        "prefix_cache": prefix_cache.stats(),
+        "prompt_cache": prompt_cache.stats(),
+        "batching": engine.stats(),
+        "models": models.stats(),
+    }
 
 
 @app.get("/v1/models")
 def list_models():
+    stats = models.stats()
     return {
         "object": "list",
         "data": [
             {
-                "id": MODEL_NAME,
+                "id": name,
                 "object": "model",
                 "created": 0,
                 "owned_by": "user",
+                "resident": name in stats["resident"],
             }
+            for name in stats["available"]
         ],
     }
 
 
-@app.post("/v1/chat/completions")
-def chat_completions(request: ChatCompletionRequest):
+@app.post("/v1/models/load", status_code=202)
+def load_extra_model(request: ModelActionRequest):
+    """Start loading a BOLT_MODELS entry in the background"""
+    if request.model not in models.extra:
+        raise HTTPException(status_code=404, detail=f"Model {request.model} is not listed in BOLT_MODELS")
+    models.load(request.model)
+    return {"model": request.model, "resident": request.model in models.resident}
+
+
+@app.post("/v1/models/unload")
+def unload_extra_model(request: ModelActionRequest):
+    if not models.evict(request.model):
+        raise HTTPException(status_code=409, detail=f"Model {request.model} is not resident, pinned or busy")
+    return {"model": request.model, "resident": False}
+
+
+def _require_model() -> None:
     if model is None or tokenizer is None:
-        raise HTTPException(status_code=503, detail=load_error or "Model is still loading")
+        if load_error:
+            raise HTTPException(status_code=503, detail=load_error)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model is still loading ({load_progress.percent()}%)",
+            headers={"Retry-After": "5"},
+        )
 
-    prompt = _build_prompt(request.messages)
-    max_new_tokens = _resolve_max_new_tokens(request.max_tokens)
-    temperature = request.temperature or 0.7
-    top_p = request.top_p or 0.9
 
-    if not request.stream:
-        content = _generate_response(prompt, max_new_tokens, temperature, top_p)
-        prompt_ids = tokenizer(prompt, return_tensors="pt")["input_ids"][0]
-        completion_ids = tokenizer(content, return_tensors="pt", add_special_tokens=False)["input_ids"][0]
+async def _acquire_model(name: Optional[str]) -> ResidentModel:
+    """Route a request to its resident model; the caller must release() it"""
+    _require_model()
+    try:
+        return await models.acquire(name)
+    except ModelUnavailableError as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "30"})
 
-        return {
-            "id": f"chatcmpl-{int(time.time())}",
-            "object": "chat.completion",
-            "created": int(time.time()),
-            "model": MODEL_NAME,
-            "choices": [
-                {
-                    "index": 0,
-                    "message": {"role": "assistant", "content": content},
-                    "finish_reason": "stop",
-                }
-            ],
-            "usage": {
-                "prompt_tokens": int(prompt_ids.numel()),
-                "completion_tokens": int(completion_ids.numel()),
-                "total_tokens": int(prompt_ids.numel() + completion_ids.numel()),
-            },
-        }
 
-    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
-    inputs = tokenizer(prompt, return_tensors="pt")
-    device = _model_device()
-    input_ids = inputs["input_ids"].to(device)
-    attention_mask = inputs.get("attention_mask")
-    if attention_mask is not None:
-        attention_mask = attention_mask.to(device)
-
-    do_sample = temperature is not None and temperature > 0
-    gen_kwargs = {
-        "input_ids": input_ids,
-        "attention_mask": attention_mask,
-        "max_new_tokens": max_new_tokens,
-        "do_sample": do_sample,
-        "temperature": temperature if do_sample else None,
-        "top_p": top_p if do_sample else None,
-        "eos_token_id": tokenizer.eos_token_id,
-        "pad_token_id": tokenizer.pad_token_id,
-        "streamer": streamer,
+def _completion_id(prefix: str = "chatcmpl") -> str:
+    return f"{prefix}-{int(time.time())}"
+
+
+async def _iter_events(generation: GenerationRequest, http_request: Request):
+    """Yield text deltas until the generation finishes; cancel it if the client goes away"""
+    try:
+        while True:
+            try:
+                delta = await asyncio.wait_for(generation.events.get(), DISCONNECT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                if await http_request.is_disconnected():
+                    logger.info("Client disconnected; cancelling generation")
+                    generation.cancel()
+                    return
+                continue
+            if delta is None:
+                return
+            yield delta
+    finally:
+        if not generation.done.is_set():
+            generation.cancel()
+
+
+def _usage(generation: GenerationRequest) -> dict:
+    """Token usage from the ids the engine actually consumed and produced"""
+    prompt_tokens = len(generation.input_ids)
+    completion_tokens = len(generation.generated)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
     }
 
-    thread = threading.Thread(target=model.generate, kwargs=gen_kwargs)
-    thread.start()
 
-    def stream_tokens():
-        for token in streamer:
+def _raise_for_failure(generation: GenerationRequest, engine: BatchEngine) -> None:
+    if generation.finish_reason == "timeout":
+        raise HTTPException(status_code=503, detail=generation.error, headers={"Retry-After": str(engine._retry_after())})
+    if generation.error:
+        raise HTTPException(status_code=500, detail=generation.error)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: ChatCompletionRequest, http_request: Request):
+    resident = await _acquire_model(request.model)
+    streaming = False
+    try:
+        try:
+            constraint = None
+            if request.response_format:
+                # Off the event loop: the first schema per model builds the token table
+                constraint = await asyncio.to_thread(resident.json_constraint, request.response_format)
+        except SchemaError as exc:
+            raise HTTPException(status_code=422, detail=str(exc))
+        # Tokenizing a long prompt takes a while; keep it off the event loop
+        _, input_ids = await asyncio.to_thread(resident.prompt_cache.encode, request.messages)
+        temperature = request.temperature or 0.7
+        top_p = request.top_p or 0.9
+
+        try:
+            generation = resident.engine.submit(
+                GenerationRequest(
+                    input_ids,
+                    max_new_tokens=_resolve_max_new_tokens(request.max_tokens),
+                    temperature=temperature,
+                    top_p=top_p,
+                    stop=request.stop,
+                    messages=request.messages,
+                    cache_prompt=bool(request.cache_prompt),
+                    loop=asyncio.get_running_loop(),
+                    constraint=constraint,
+                )
+            )
+        except QueueFullError as exc:
+            raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)})
+
+        if not request.stream:
+            async for _ in _iter_events(generation, http_request):
+                pass
+            _raise_for_failure(generation, resident.engine)
+            if generation.cancelled:
+                raise HTTPException(status_code=499, detail="Client disconnected")
+
+            return {
+                "id": _completion_id(),
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": resident.name,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": generation.text},
+                        "finish_reason": generation.finish_reason,
+                    }
+                ],
+                "usage": _usage(generation),
+            }
+
+        streaming = True
+        # The body's finally only runs if Starlette starts iterating it; the
+        # background task covers clients that disconnect before that
+        lease = _StreamLease(resident, generation)
+        return StreamingResponse(
+            _stream_chat(resident, generation, http_request, lease),
+            media_type="text/event-stream",
+            background=BackgroundTask(lease.close),
+        )
+    finally:
+        if not streaming:
+            resident.release()
+
+
+class _StreamLease:
+    """Releases a streaming request's model lease exactly once, cancelling an unfinished generation"""
+
+    def __init__(self, resident: ResidentModel, generation: GenerationRequest):
+        self.resident = resident
+        self.generation = generation
+        self.released = False
+
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        if not self.generation.done.is_set():
+            self.generation.cancel()
+        self.resident.release()
+
+    async def close(self) -> None:
+        self.release()
+
+
+async def _stream_chat(
+    resident: ResidentModel,
+    generation: GenerationRequest,
+    http_request: Request,
+    lease: _StreamLease
+):
+    try:
+        async for delta in _iter_events(generation, http_request):
             chunk = {
-                "id": f"chatcmpl-{int(time.time())}",
+                "id": _completion_id(),
                 "object": "chat.completion.chunk",
                 "created": int(time.time()),
-                "model": MODEL_NAME,
-                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                "model": resident.name,
+                "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
             }
             yield f"data: {json.dumps(chunk)}\n\n"
+        if generation.cancelled:
+            return
+        final = {
+            "id": _completion_id(),
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": resident.name,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": generation.finish_reason}],
+            "usage": _usage(generation),
+        }
+        yield f"data: {json.dumps(final)}\n\n"
         yield "data: [DONE]\n\n"
+    finally:
+        lease.release()
+
+
+def _logprobs_block(tokenizer, ids: List[int], token_logprobs: List[Optional[float]], top: Optional[list]) -> dict:
+    """OpenAI completions logprobs object for a run of token ids"""
+    tokens = [tokenizer.decode([token]) for token in ids]
+    offsets = []
+    position = 0
+    for token in tokens:
+        offsets.append(position)
+        position += len(token)
+    top_logprobs = None
+    if top is not None:
+        top_logprobs = [
+            {tokenizer.decode([token]): value for token, value in zip(*entry)} if entry else None
+            for entry in top
+        ]
+    return {
+        "tokens": tokens,
+        "token_logprobs": token_logprobs,
+        "top_logprobs": top_logprobs,
+        "text_offset": offsets,
+    }
+
+
+async def _wait(job, engine: BatchEngine, http_request: Request) -> None:
+    async for _ in _iter_events(job, http_request):
+        pass
+    _raise_for_failure(job, engine)
+    if job.cancelled:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+
+
+@app.post("/v1/completions")
+async def completions(request: CompletionRequest, http_request: Request):
+    """
+    OpenAI-compatible text completions.
+
+    With max_tokens <= 1 (e.g. echo + logprobs perplexity scoring) every
+    prompt is handled by a single teacher-forced forward pass, batched
+    across prompts. Longer completions go through the batching engine and,
+    if logprobs are requested, are scored in one extra pass afterwards.
+    """
+    if request.stream:
+        raise HTTPException(status_code=400, detail="Streaming is only supported on /v1/chat/completions")
+    if request.logprobs is not None and not 0 <= request.logprobs <= MAX_LOGPROBS:
+        raise HTTPException(status_code=400, detail=f"logprobs must be between 0 and {MAX_LOGPROBS}")
+
+    resident = await _acquire_model(request.model)
+    try:
+        return await _complete(request, resident, http_request)
+    finally:
+        resident.release()
+
+
+async def _complete(request: CompletionRequest, resident: ResidentModel, http_request: Request) -> dict:
+    engine, tokenizer = resident.engine, resident.tokenizer
+
+    prompts = [request.prompt] if isinstance(request.prompt, str) else request.prompt
+    prompt_ids = (await asyncio.to_thread(tokenizer, prompts))["input_ids"] if prompts else []
+    if not prompt_ids or not all(prompt_ids):
+        raise HTTPException(status_code=400, detail="Prompt must not be empty")
+
+    stop = [request.stop] if isinstance(request.stop, str) else [s for s in (request.stop or []) if s]
+    max_tokens = max(0, _resolve_max_new_tokens(request.max_tokens))
+    temperature = request.temperature if request.temperature is not None else 0.7
+    top_p = request.top_p or 1.0
+    top_logprobs = request.logprobs or 0
+    loop = asyncio.get_running_loop()
+
+    completion_ids: List[List[int]] = []
+    completion_texts: List[str] = []
+    finish_reasons: List[str] = []
+    completion_logprobs: List[Tuple[list, Optional[list]]] = []
+    prompt_scores: List[Optional[dict]] = [None] * len(prompts)
 
-    return StreamingResponse(stream_tokens(), media_type="text/event-stream")
+    try:
+        if max_tokens <= 1:
+            score = engine.submit(
+                ScoreRequest(prompt_ids, top_logprobs, max_tokens == 1, temperature, top_p, loop=loop)
+            )
+            await _wait(score, engine, http_request)
+            prompt_scores = score.results
+            eos_ids = engine.eos_token_ids
+            for result in score.results:
+                token = result.get("next_token")
+                if token is None or token in eos_ids:
+                    completion_ids.append([])
+                    completion_texts.append("")
+                    finish_reasons.append("stop" if token is not None else "length")
+                    completion_logprobs.append(([], [] if top_logprobs else None))
+                    continue
+                text = tokenizer.decode([token], skip_special_tokens=True)
+                hit = min((text.find(s) for s in stop if s in text), default=-1)
+                completion_ids.append([token])
+                completion_texts.append(text[:hit] if hit != -1 else text)
+                finish_reasons.append("stop" if hit != -1 else "length")
+                completion_logprobs.append(
+                    ([result["next_logprob"]], [result["next_top"]] if top_logprobs else None)
+                )
+        else:
+            generations = []
+            try:
+                for ids in prompt_ids:
+                    generations.append(
+                        engine.submit(GenerationRequest(ids, max_tokens, temperature, top_p, stop=stop, loop=loop))
+                    )
+            except QueueFullError:
+                for generation in generations:
+                    generation.cancel()
+                raise
+            await asyncio.gather(*(_wait(generation, engine, http_request) for generation in generations))
+            completion_ids = [generation.generated for generation in generations]
+            completion_texts = [generation.text for generation in generations]
+            finish_reasons = [generation.finish_reason for generation in generations]
+
+            if request.logprobs is not None:
+                score = engine.submit(
+                    ScoreRequest([p + c for p, c in zip(prompt_ids, completion_ids)], top_logprobs, loop=loop)
+                )
+                await _wait(score, engine, http_request)
+                prompt_scores = score.results
+                for ids, result in zip(completion_ids, score.results):
+                    start = len(result["token_logprobs"]) - len(ids)
+                    completion_logprobs.append(
+                        (result["token_logprobs"][start:], result["top"][start:] if top_logprobs else None)
+                    )
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)})
+
+    choices = []
+    for index, prompt in enumerate(prompts):
+        text = completion_texts[index]
+        choice = {
+            "index": index,
+            "text": prompt + text if request.echo else text,
+            "logprobs": None,
+            "finish_reason": finish_reasons[index],
+        }
+        if request.logprobs is not None:
+            ids = list(completion_ids[index])
+            token_logprobs, top = completion_logprobs[index]
+            if request.echo:
+                prompt_result = prompt_scores[index]
+                n_prompt = len(prompt_ids[index])
+                ids = prompt_ids[index] + ids
+                token_logprobs = prompt_result["token_logprobs"][:n_prompt] + token_logprobs
+                if top is not None:
+                    top = prompt_result["top"][:n_prompt] + top
+            # Decodes every token (the whole prompt when echoing), so off the event loop too
+            choice["logprobs"] = await asyncio.to_thread(_logprobs_block, tokenizer, ids, token_logprobs, top)
+        choices.append(choice)
+
+    prompt_tokens = sum(len(ids) for ids in prompt_ids)
+    completion_tokens = sum(len(ids) for ids in completion_ids)
+    return {
+        "id": _completion_id("cmpl"),
+        "object": "text_completion",
+        "created": int(time.time()),
+        "model": resident.name,
+        "choices": choices,
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
@@ -0,0 +1,38 @@
+"""Bolt-XL Transformers server settings (environment variables)"""
+
+import os
+
+import torch
+
+MODEL_NAME = os.getenv("BOLT_MODEL", "google/gemma-2b-it")
+DRAFT_MODEL_NAME = os.getenv("BOLT_DRAFT_MODEL", "").strip()  # Small model for speculative decoding (same tokenizer)
+DRAFT_TOKENS = int(os.getenv("BOLT_DRAFT_TOKENS", "4"))  # Tokens proposed per speculative step
+# Extra models that requests may select by name; loaded on demand, LRU-evicted
+EXTRA_MODELS = [name.strip() for name in os.getenv("BOLT_MODELS", "").split(",") if name.strip()]
+MAX_MODELS = int(os.getenv("BOLT_MAX_MODELS", "2"))  # Resident models, including BOLT_MODEL
+MODEL_MEMORY_GB = float(os.getenv("BOLT_MODEL_MEMORY_GB", "0"))  # Weight budget for resident models (0 = no limit)
+HF_TOKEN = os.getenv("HF_TOKEN")
+MAX_NEW_TOKENS_CAP = int(os.getenv("BOLT_MAX_NEW_TOKENS", "1024"))
+DTYPE_NAME = os.getenv("BOLT_DTYPE", "float16").strip().lower()
+DEVICE = os.getenv("BOLT_DEVICE", "cuda:0")
+MAX_BATCH_SIZE = int(os.getenv("BOLT_MAX_BATCH_SIZE", "8"))  # Sequences decoded together
+MAX_QUEUE = int(os.getenv("BOLT_MAX_QUEUE", "32"))  # Waiting requests before 429 (0 = unbounded)
+QUEUE_TIMEOUT = float(os.getenv("BOLT_QUEUE_TIMEOUT", "60"))  # Seconds queued before 503 (0 = no limit)
+DISCONNECT_POLL_SECONDS = 0.5
+PREFIX_CACHE_SIZE = int(os.getenv("BOLT_PREFIX_CACHE_SIZE", "4"))  # 0 disables prefix KV reuse
+PREFIX_CACHE_MIN_TOKENS = int(os.getenv("BOLT_PREFIX_CACHE_MIN_TOKENS", "32"))
+PROMPT_CACHE_SIZE = int(os.getenv("BOLT_PROMPT_CACHE_SIZE", "64"))  # Tokenized message prefixes (0 disables)
+WARMUP = os.getenv("BOLT_WARMUP", "true").strip().lower() in ("1", "true", "yes")
+WARMUP_TOKENS = 4
+SCORE_BATCH_TOKENS = int(os.getenv("BOLT_SCORE_BATCH_TOKENS", "4096"))  # Padded tokens per scoring forward pass
+MAX_LOGPROBS = 20
+GRAMMAR_CACHE_SIZE = 16  # Compiled response_format schemas kept per model
+
+DTYPE_MAP = {
+    "float16": torch.float16,
+    "fp16": torch.float16,
+    "bfloat16": torch.bfloat16,
+    "bf16": torch.bfloat16,
+    "float32": torch.float32,
+    "fp32": torch.float32,
+}
@@ -15,6 +15,7 @@ from dataclasses import dataclass, field
 
 from config import config
 from services.llm import llm
+from services.llm_scheduler import AGENT
 
 logger = logging.getLogger(__name__)
 
@@ -155,7 +156,7 @@ class SimpleLangGraphAgent:
         """Generate initial answer"""
         # Call LLM here
         prompt = f"Answer this question: {state['input']}"
-        response = await llm.chat([{"role": "user", "content": prompt}])
+        response = await llm.chat([{"role": "user", "content": prompt}], priority=AGENT)
         return {"output": response["content"]}
 
     async def _refine_answer(self, state: WorkflowState) -> Dict:
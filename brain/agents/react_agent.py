@@ -5,9 +5,11 @@ Replaces native ReAct implementation with OctoTools framework.
 
 import os
 import sys
+import json
 import asyncio
 import logging
-from typing import List, Dict, Optional, Any, Callable
+import httpx
+from typing import List, Dict, Optional, Any, Callable, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -89,6 +91,13 @@ class ReActAgent:
     ReAct agent wrapper around OctoTools.
     """
     MAX_STEPS = 10
+    FINAL_ANSWER = "Final Answer"
+    # Status Bolt-XL returns for a response_format it can't apply (FastAPI's own validation errors too)
+    RESPONSE_FORMAT_REJECTED = 422
+    STRUCTURED_INSTRUCTIONS = (
+        "\nRespond with a single JSON object with the keys \"thought\", \"action\" and \"action_input\". "
+        "\"action\" must be one of the tool names, or \"Final Answer\" with the answer as \"action_input\".\n"
+    )
 
     def __init__(
         self,
@@ -96,6 +105,8 @@ class ReActAgent:
         llm_client: Optional[Any] = None 
     ):
         self.tool_registry = tool_registry
+        # Ask the engine for schema-constrained {thought, action, action_input} steps
+        self.structured = config.AGENT_STRUCTURED_OUTPUT
         
         if construct_solver is None:
             logger.error("OctoTools not found or failed to import.")
@@ -223,6 +234,126 @@ class ReActAgent:
         prompt += "\nThought:"
         return prompt
 
+    def _step_format(self) -> Dict[str, Any]:
+        """OpenAI-style response_format constraining a step to {thought, action, action_input}"""
+        actions = list(self.tool_registry.tools.keys()) + [self.FINAL_ANSWER]
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "react_step",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "thought": {"type": "string"},
+                        "action": {"type": "string", "enum": actions},
+                        "action_input": {"type": "string"},
+                    },
+                    "required": ["thought", "action", "action_input"],
+                    "additionalProperties": False,
+                },
+            },
+        }
+
+    def _parse_structured(self, content: str) -> Optional[Tuple[str, str, str, str]]:
+        """(thought, action, action_input, final_answer) from a JSON step, None if it isn't one"""
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get("action"), str):
+            return None
+        thought = str(data.get("thought", "")).strip()
+        action = data["action"].strip()
+        action_input = data.get("action_input", "")
+        if not isinstance(action_input, str):
+            action_input = json.dumps(action_input)
+        if action.lower() in (self.FINAL_ANSWER.lower(), "final_answer", "finish"):
+            return thought, "", "", action_input.strip() or thought
+        return thought, action, action_input.strip(), ""
+
+    def _parse_text(self, content: str) -> Tuple[str, str, str, str]:
+        """(thought, action, action_input, final_answer) from free-form Thought/Action text"""
+        thought = ""
+        action = ""
+        action_input = ""
+        final_answer = ""
+
+        # The prompt ends with "Thought:", so the model output usually starts with the thought text.
+        # However, sometimes it might repeat "Thought:" or start with a newline.
+        if "Final Answer:" in content:
+            # If Final Answer is present, it might be the only thing or after Thought
+            if "Thought:" in content:
+                thought_part = content.split("Thought:")[-1]
+                thought = thought_part.split("Final Answer:")[0].strip()
+            else:
+                # no "Thought:" tag, assume everything before Final Answer is thought (or empty if it starts with FA)
+                thought = content.split("Final Answer:")[0].strip()
+
+            final_answer = content.split("Final Answer:")[-1].strip()
+            return thought, action, action_input, final_answer
+
+        if "Action:" in content:
+            if "Thought:" in content:
+                thought = content.split("Thought:")[-1].split("Action:")[0].strip()
+            else:
+                # Assume everything before Action is thought
+                thought = content.split("Action:")[0].strip()
+
+            if "Action Input:" in content:
+                action_part = content.split("Action:")[-1]
+                action = action_part.split("Action Input:")[0].strip()
+                action_input = action_part.split("Action Input:")[-1].strip()
+        else:
+            # No Action, maybe just thought?
+            if "Thought:" in content:
+                thought = content.split("Thought:")[-1].strip()
+            else:
+                thought = content.strip()
+        return thought, action, action_input, final_answer
+
+    def _read_step(self, content: str, structured: bool) -> Tuple[str, str, str, str]:
+        """(thought, action, action_input, final_answer) from a raw step reply"""
+        content = content.strip()
+        logger.debug(f"Raw LLM output:\n{content}")
+        parsed = self._parse_structured(content) if structured else None
+        # Engines without constrained decoding may still answer in text
+        return parsed if parsed is not None else self._parse_text(content)
+
+    async def _next_step(self, llm, priority: str, prompt: str) -> Tuple[str, str, str, str]:
+        """Ask the LLM for the next step, constrained to the JSON step schema when enabled"""
+        if self.structured:
+            if prompt.endswith("\nThought:"):
+                prompt = prompt[:-len("\nThought:")]
+            try:
+                response = await llm.chat(
+                    messages=[{"role": "user", "content": prompt + self.STRUCTURED_INSTRUCTIONS}],
+                    max_tokens=500,
+                    temperature=0.2,
+                    response_format=self._step_format(),
+                    priority=priority
+                )
+                return self._read_step(response["content"], structured=True)
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status not in (400, self.RESPONSE_FORMAT_REJECTED):
+                    raise
+                if status == self.RESPONSE_FORMAT_REJECTED:
+                    logger.warning(f"Engine rejected response_format ({status}); using text steps")
+                    self.structured = False
+                else:
+                    # e.g. prompt too long: retry this step as text, keep structured steps on
+                    logger.warning(f"Structured step failed ({status}); retrying as text")
+                prompt += "\nThought:"
+
+        response = await llm.chat(
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=500,
+            stop=["Observation:"],
+            priority=priority
+        )
+        return self._read_step(response["content"], structured=False)
+
     async def solve_native(self, question: str) -> AgentResult:
         """
         Solve using the native ReAct loop (bypassing OctoTools).
@@ -234,6 +365,7 @@ class ReActAgent:
             
         try:
             from services.llm import llm
+            from services.llm_scheduler import AGENT
         except ImportError as e:
             return AgentResult(
                 answer="",
@@ -250,49 +382,16 @@ class ReActAgent:
             # 1. Build prompt
             prompt = self._build_prompt(question, steps, tools_desc)
             
-            # 2. Call LLM
+            # 2. Call LLM and parse the step
             try:
-                response = await llm.chat(
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=500,
-                    stop=["Observation:"]
-                )
-                content = response["content"]
+                thought, action, action_input, final_answer = await self._next_step(llm, AGENT, prompt)
             except Exception as e:
                 return AgentResult(
                     answer="", steps=steps, total_steps=i, success=False,
                     error=f"LLM Error: {str(e)}"
                 )
 
-            # 3. Parse output
-            thought = ""
-            action = ""
-            action_input = ""
-            final_answer = ""
-            
-            # Extract Thought
-            # The prompt ends with "Thought:", so the model output usually starts with the thought text.
-            # However, sometimes it might repeat "Thought:" or start with a newline.
-            
-            clean_content = content.strip()
-            logger.info(f"DEBUG: Raw LLM Output:\n{clean_content}\n-------------------")
-            
-            # Helper to extract text before a keyword
-            def get_text_before(text, keyword):
-                if keyword in text:
-                    return text.split(keyword)[0].strip()
-                return text
-            
-            if "Final Answer:" in clean_content:
-                # If Final Answer is present, it might be the only thing or after Thought
-                if "Thought:" in clean_content:
-                    thought_part = clean_content.split("Thought:")[-1]
-                    thought = thought_part.split("Final Answer:")[0].strip()
-                else:
-                    # no "Thought:" tag, assume everything before Final Answer is thought (or empty if it starts with FA)
-                    thought = clean_content.split("Final Answer:")[0].strip()
-                
-                final_answer = clean_content.split("Final Answer:")[-1].strip()
+            if final_answer:
                 steps.append(AgentStep(thought=thought, step_number=i+1))
                 return AgentResult(
                     answer=final_answer,
@@ -300,26 +399,8 @@ class ReActAgent:
                     total_steps=len(steps),
                     success=True
                 )
-
-            if "Action:" in clean_content:
-                if "Thought:" in clean_content:
-                    thought = clean_content.split("Thought:")[-1].split("Action:")[0].strip()
-                else:
-                    # Assume everything before Action is thought
-                    thought = clean_content.split("Action:")[0].strip()
-                
-                if "Action Input:" in clean_content:
-                    action_part = clean_content.split("Action:")[-1]
-                    action = action_part.split("Action Input:")[0].strip()
-                    action_input = action_part.split("Action Input:")[-1].strip()
-            else:
-                # No Action, maybe just thought?
-                if "Thought:" in clean_content:
-                    thought = clean_content.split("Thought:")[-1].strip()
-                else:
-                    thought = clean_content.strip()
             
-            # 4. Execute Action
+            # 3. Execute Action
             if action and action_input:
                 tool = self.tool_registry.get_tool(action)
                 if tool:
@@ -342,8 +423,7 @@ class ReActAgent:
                 ))
             else:
                 # Model didn't produce an action - maybe just thinking or confused
-                if not final_answer:
-                    steps.append(AgentStep(thought=thought, step_number=i+1, observation="Error: No Action or Final Answer provided."))
+                steps.append(AgentStep(thought=thought, step_number=i+1, observation="Error: No Action or Final Answer provided."))
             
         return AgentResult(
             answer="Max steps reached without final answer.",
@@ -56,13 +56,12 @@ async def library_search_tool(query: str, top_k: int = 5) -> str:
         # Format results with citations
         output = f"Found {len(chunks)} relevant library sources:\n\n"
         for i, chunk in enumerate(chunks, 1):
-            filename = chunk.get("filename", "unknown")
             chunk_idx = chunk.get("chunk_index", 0)
             total_chunks = chunk.get("total_chunks", 1)
             text = chunk.get("text", "")[:200]  # Truncate for display
             similarity_pct = chunk.get("similarity_pct", 0)
 
-            output += f"{i}. [{similarity_pct:.1f}% match] {filename} (chunk {chunk_idx}/{total_chunks})\n"
+            output += f"{i}. [{similarity_pct:.1f}% match] {_cite(chunk)} (chunk {chunk_idx}/{total_chunks})\n"
             output += f"   {text}...\n\n"
 
         return output.strip()
@@ -105,6 +104,8 @@ async def research_query(
                     sources.append({
                         "type": "library",
                         "filename": chunk.get("filename"),
+                        "section": chunk.get("section", ""),
+                        "page": chunk.get("page", 0),
                         "text": chunk.get("text"),
                         "similarity": chunk.get("similarity_pct", 0)
                     })
@@ -185,6 +186,16 @@ async def research_query(
         )
 
 
+def _cite(chunk: Dict[str, Any]) -> str:
+    """Library citation: filename plus page and section when the chunker recorded them"""
+    citation = chunk.get("filename") or "unknown"
+    if chunk.get("page"):
+        citation += f", p. {chunk['page']}"
+    if chunk.get("section"):
+        citation += f" § {chunk['section']}"
+    return citation
+
+
 def _format_sources_for_llm(sources: List[Dict[str, Any]]) -> str:
     """Format sources for LLM context"""
     if not sources:
@@ -194,7 +205,7 @@ def _format_sources_for_llm(sources: List[Dict[str, Any]]) -> str:
     for i, source in enumerate(sources, 1):
         if source["type"] == "library":
             formatted.append(
-                f"[Source {i}] {source['filename']}: {source['text'][:300]}"
+                f"[Source {i}] {_cite(source)}: {source['text'][:300]}"
             )
         elif source["type"] == "memory":
             formatted.append(
@@ -15,6 +15,7 @@ class Config:
     BOLT_XL_URL = os.getenv("BOLT_XL_URL", "http://bolt-xl:3000")
     SANDBOX_URL = os.getenv("SANDBOX_URL", "http://sandbox:8000")
     VOICE_URL = os.getenv("VOICE_URL", "http://voice:8000")
+    LIBRARIAN_URL = os.getenv("LIBRARIAN_URL", "http://librarian:8090")
     BIFROST_URL = os.getenv("BIFROST_URL", "http://bifrost:8080")
     REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
 
@@ -32,6 +33,8 @@ class Config:
     # Feature flags
     ASYNC_MEMORY = os.getenv("ASYNC_MEMORY", "true").lower() == "true"
     ENABLE_VOICE = os.getenv("ENABLE_VOICE", "true").lower() == "true"
+    AGENT_STRUCTURED_OUTPUT = os.getenv("AGENT_STRUCTURED_OUTPUT", "true").lower() == "true"
+    VERIFY_EARLY_EXIT = os.getenv("VERIFY_EARLY_EXIT", "true").lower() == "true"
 
     # Brain settings
     DEFAULT_ENGINE = "vorpal"
@@ -47,6 +50,37 @@ class Config:
     AGENT_TIMEOUT = float(os.getenv("AGENT_TIMEOUT", "60.0"))
     ERROR_HANDLER_TIMEOUT = float(os.getenv("ERROR_HANDLER_TIMEOUT", "5.0"))
 
+    # LLM scheduler (priority classes and admission control)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "10"))
+    LLM_LIMIT_INTERACTIVE = int(os.getenv("LLM_LIMIT_INTERACTIVE", "8"))
+    LLM_LIMIT_VERIFICATION = int(os.getenv("LLM_LIMIT_VERIFICATION", "4"))
+    LLM_LIMIT_AGENT = int(os.getenv("LLM_LIMIT_AGENT", "4"))
+    LLM_LIMIT_BACKGROUND = int(os.getenv("LLM_LIMIT_BACKGROUND", "2"))
+    LLM_QUEUE_INTERACTIVE = int(os.getenv("LLM_QUEUE_INTERACTIVE", "32"))  # 0 = unbounded
+    LLM_QUEUE_VERIFICATION = int(os.getenv("LLM_QUEUE_VERIFICATION", "16"))
+    LLM_QUEUE_AGENT = int(os.getenv("LLM_QUEUE_AGENT", "16"))
+    LLM_QUEUE_BACKGROUND = int(os.getenv("LLM_QUEUE_BACKGROUND", "0"))  # Background waits, never shed
+
+    # Perplexity scoring (memory worker)
+    PERPLEXITY_BATCH_SIZE = int(os.getenv("PERPLEXITY_BATCH_SIZE", "16"))
+    PERPLEXITY_PROVIDER = os.getenv("PERPLEXITY_PROVIDER", "vorpal")  # vorpal | bolt | ngram | local
+    PERPLEXITY_FALLBACK_PROVIDER = os.getenv("PERPLEXITY_FALLBACK_PROVIDER", "ngram")  # or "none"
+    LOCAL_PERPLEXITY_MODEL = os.getenv("LOCAL_PERPLEXITY_MODEL", "distilgpt2")
+
+    # Token counting (conversation budgets)
+    TOKEN_COUNT_MODE = os.getenv("TOKEN_COUNT_MODE", "approx")  # approx | exact
+    TOKENIZER_MODEL = os.getenv("TOKENIZER_MODEL", "")  # HF tokenizer for exact mode
+    TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "4096"))
+
+    # Conversation history (ChatService)
+    CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "256"))
+    CONVERSATION_CONTEXT_TOKENS = int(os.getenv("CONVERSATION_CONTEXT_TOKENS", "3072"))  # History + summary + memories
+    CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "8"))  # Messages kept verbatim
+    CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "256"))
+    CONVERSATION_MEMORY_TOKENS = int(os.getenv("CONVERSATION_MEMORY_TOKENS", "512"))
+    CONVERSATION_MEMORY_TOP_K = int(os.getenv("CONVERSATION_MEMORY_TOP_K", "5"))  # 0 disables memory recall
+    CONVERSATION_MEMORY_MAX_DISTANCE = float(os.getenv("CONVERSATION_MEMORY_MAX_DISTANCE", "0.5"))
+
     # Model names
     VORPAL_MODEL = os.getenv("VORPAL_MODEL", "Llama-3.2-3B-Instruct")
     BOLT_XL_MODEL = os.getenv("BOLT_XL_MODEL", "casperhansen/gemma-7b-it-awq")
@@ -17,6 +17,7 @@ from stream_handler import stream_handler
 from workers.memory_worker import memory_worker
 from memory.vector_store import vector_store
 from services.metrics_service import metrics_collector_service
+from services.token_counter import token_counter
 
 # Import Routers
 from routes.health import router as health_router
@@ -104,6 +105,9 @@ async def startup():
 
     await stream_handler.connect()
 
+    # Exact token counting: fetch the tokenizer off the event loop
+    token_counter.start_loading()
+
     # Initialize vector store
     vector_store.redis_url = config.REDIS_URL
     vector_store.connect()
@@ -180,6 +180,35 @@ class VectorStore:
         logger.debug("Stored memory: %s", memory_key)
         return memory_key
 
+    def get_messages(self, limit: int = 5000) -> List[str]:
+        """
+        Load stored memory messages (e.g. to train local models).
+
+        Args:
+            limit: Maximum number of messages to return
+
+        Returns:
+            List of message texts
+        """
+        if not self.client:
+            raise RuntimeError("Vector store not connected. Call connect() first.")
+
+        keys = []
+        for key in self.client.scan_iter(match=f"{self.prefix}*", count=500):
+            keys.append(key)
+            if len(keys) >= limit:
+                break
+
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hget(key, "message")
+
+        messages = []
+        for message in pipe.execute():
+            if message:
+                messages.append(message.decode() if isinstance(message, bytes) else message)
+        return messages
+
     def search_similar(
         self,
         query_text: str,
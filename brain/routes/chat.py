@@ -1,7 +1,11 @@
+import json
+
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from schemas.chat import ChatRequest, ChatResponse, VerifyRequest, VerifyResponse, VerificationQA
 from services.chat_service import chat_service
 from services.rate_limiter import rate_limiter
+from services.llm_scheduler import LLMOverloadedError
 from verification import ChainOfVerification
 from stream_handler import stream_handler
 from config import config
@@ -25,12 +29,38 @@ async def chat(request: ChatRequest, http_request: Request) -> ChatResponse:
     if not request.message or not request.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-    return await chat_service.process_chat(request.message)
+    try:
+        return await chat_service.process_chat(request.message, request.session_id)
+    except LLMOverloadedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def _stream_verification(message: str):
+    """Server-sent events for a streamed verification chain"""
+    try:
+        async with ChainOfVerification() as cov:
+            async for event in cov.verify_stream(message):
+                if event["type"] == "result":
+                    event["engine"] = f"vorpal/{config.VORPAL_MODEL}"
+                yield f"data: {json.dumps(event)}\n\n"
+    except LLMOverloadedError as e:
+        yield f"data: {json.dumps({'type': 'error', 'status': 429, 'detail': str(e)})}\n\n"
+    except httpx.HTTPError as e:
+        yield f"data: {json.dumps({'type': 'error', 'status': 503, 'detail': f'Vorpal engine error: {e}'})}\n\n"
+    except Exception as e:
+        yield f"data: {json.dumps({'type': 'error', 'status': 500, 'detail': f'Verification error: {e}'})}\n\n"
+    yield "data: [DONE]\n\n"
 
 @router.post("/verify", response_model=VerifyResponse)
-async def verify(request: VerifyRequest, http_request: Request) -> VerifyResponse:
+async def verify(request: VerifyRequest, http_request: Request):
     """
     Chat with Chain of Verification
+
+    With stream=true, returns server-sent events (draft, question, answer,
+    result) instead of a single response.
     """
     # Rate limiting check
     client_ip = http_request.client.host if http_request.client else "unknown"
@@ -46,11 +76,13 @@ async def verify(request: VerifyRequest, http_request: Request) -> VerifyRespons
     # Capture input to Redis Stream (non-blocking)
     await stream_handler.capture_input(request.message)
 
+    if request.stream:
+        return StreamingResponse(_stream_verification(request.message), media_type="text/event-stream")
+
     try:
         # Run chain of verification
-        async with httpx.AsyncClient(timeout=config.REQUEST_TIMEOUT) as client:
-            async with ChainOfVerification(http_client=client) as cov:
-                result = await cov.verify(request.message)
+        async with ChainOfVerification() as cov:
+            result = await cov.verify(request.message)
 
         # Convert to response model
         verification_qa = [
@@ -67,9 +99,16 @@ async def verify(request: VerifyRequest, http_request: Request) -> VerifyRespons
             verification_qa=verification_qa,
             final_response=result["final_response"],
             revised=result["revised"],
+            revision_skipped=result["revision_skipped"],
             engine=f"vorpal/{config.VORPAL_MODEL}"
         )
 
+    except LLMOverloadedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except httpx.HTTPError as e:
         raise HTTPException(
             status_code=503,
@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from schemas.common import HealthResponse, DetailedHealthResponse
 from services.system_service import system_service
 from workers.memory_worker import memory_worker
+from services.llm_scheduler import llm_scheduler
 from config import config
 
 router = APIRouter(tags=["health"])
@@ -37,5 +38,6 @@ async def health():
         "status": "healthy",
         "vorpal_url": config.VORPAL_URL,
         "vorpal_model": config.VORPAL_MODEL,
-        "async_memory": memory_status
+        "async_memory": memory_status,
+        "llm_scheduler": llm_scheduler.stats()
     }
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
-from schemas.library import LibrarySearchResponse, LibrarySearchRequest, LibraryChunk, LibraryStats
+from fastapi import APIRouter, HTTPException, Query
+from schemas.library import LibrarySearchResponse, LibrarySearchRequest, LibraryChunk, LibraryStats, LibraryJobRequest
 from tools.library_search import get_library_search_tool
+from config import config
+import httpx
 
 router = APIRouter(prefix="/library", tags=["library"])
 
@@ -40,13 +42,16 @@ async def search_library(request: LibrarySearchRequest):
 
 
 @router.get("/stats", response_model=LibraryStats)
-async def get_library_stats():
+async def get_library_stats(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=0, le=1000)
+):
     """
-    Get library statistics
+    Get library statistics (files listed a page at a time)
     """
     try:
         library_tool = get_library_search_tool()
-        stats = library_tool.get_stats()
+        stats = library_tool.get_stats(offset=offset, limit=limit)
 
         return LibraryStats(**stats)
 
@@ -55,3 +60,60 @@ async def get_library_stats():
             status_code=500,
             detail=f"Error getting library stats: {str(e)}"
         )
+
+
+async def _librarian(method: str, path: str, **kwargs):
+    """Forward a request to the librarian job API"""
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.request(method, f"{config.LIBRARIAN_URL}{path}", **kwargs)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Librarian unavailable: {str(e)}")
+
+    if response.status_code != 200:
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise HTTPException(status_code=response.status_code, detail=detail)
+    return response.json()
+
+
+@router.post("/jobs")
+async def submit_library_job(request: LibraryJobRequest):
+    """
+    Queue files at the top of Library-Drop (or "." for all of them) for ingestion
+    """
+    return await _librarian("POST", "/jobs", json={"paths": request.paths})
+
+
+@router.get("/jobs")
+async def list_library_jobs(limit: int = 50):
+    """
+    Recent ingestion jobs, newest first
+    """
+    return await _librarian("GET", "/jobs", params={"limit": limit})
+
+
+@router.get("/jobs/{job_id}")
+async def get_library_job(job_id: str):
+    """
+    Ingestion job progress: pages, chunks, embeddings/sec, ETA
+    """
+    return await _librarian("GET", f"/jobs/{job_id}")
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_library_job(job_id: str):
+    """
+    Cancel an ingestion job
+    """
+    return await _librarian("POST", f"/jobs/{job_id}/cancel")
+
+
+@router.get("/ingestion")
+async def get_ingestion_stats():
+    """
+    Ingestion pipeline throughput per stage (extract, embed, load)
+    """
+    return await _librarian("GET", "/stats")
@@ -4,11 +4,13 @@ from typing import List, Optional
 class ChatRequest(BaseModel):
     """Chat request model"""
     message: str
+    session_id: Optional[str] = None  # Omit to start a new conversation
 
 class ChatResponse(BaseModel):
     """Chat response model"""
     response: str
     engine: str = "vorpal"
+    session_id: Optional[str] = None
 
 class VerificationQA(BaseModel):
     """Verification Q&A pair"""
@@ -19,6 +21,7 @@ class VerifyRequest(BaseModel):
     """Verification request model"""
     message: str
     use_verification: bool = True
+    stream: bool = False  # Server-sent events: draft, questions and answers as they arrive
 
 class VerifyResponse(BaseModel):
     """Verification response model"""
@@ -27,4 +30,5 @@ class VerifyResponse(BaseModel):
     verification_qa: List[VerificationQA]
     final_response: str
     revised: bool
+    revision_skipped: bool = False  # All answers agreed with the draft
     engine: str = "vorpal"
@@ -13,6 +13,7 @@ class DetailedHealthResponse(BaseModel):
     vorpal_url: str
     vorpal_model: str
     async_memory: Dict[str, Any]
+    llm_scheduler: Optional[Dict[str, Any]] = None
 
 class ServiceStatus(BaseModel):
     """Individual service status"""
@@ -12,6 +12,8 @@ class LibraryChunk(BaseModel):
     timestamp: int
     similarity_score: float
     similarity_pct: float
+    section: str = ""  # Heading path (structure chunk mode)
+    page: int = 0  # PDF page, 0 if unknown
 
 class LibrarySearchRequest(BaseModel):
     """Library search request model (Phase 5.2)"""
@@ -29,12 +31,20 @@ class LibraryStats(BaseModel):
     """Library statistics model"""
     total_chunks: int
     unique_files: int
-    files: List[str]
+    files: List[str]  # One page, alphabetical
+    offset: int = 0
+    limit: int = 100
+
+class LibraryJobRequest(BaseModel):
+    """Library ingestion job request (paths relative to the Library-Drop directory)"""
+    paths: List[str]
 
 class ResearchSource(BaseModel):
     """Research source model"""
     type: str  # "library" or "memory"
     filename: Optional[str] = None
+    section: Optional[str] = None
+    page: Optional[int] = None
     text: Optional[str] = None
     message: Optional[str] = None
     timestamp: Optional[int] = None
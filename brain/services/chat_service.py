@@ -1,32 +1,47 @@
 import httpx
 import logging
 from fastapi import HTTPException
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from config import config
 from stream_handler import stream_handler
 from services.persona_manager import personas_manager
+from services.llm_scheduler import llm_scheduler, INTERACTIVE
+from services.conversation import conversation_store
 from schemas.chat import ChatResponse
 
 logger = logging.getLogger("brain.chat")
 
 class ChatService:
-    async def process_chat(self, message: str) -> ChatResponse:
+    async def process_chat(self, message: str, session_id: Optional[str] = None) -> ChatResponse:
         # Capture input to Redis Stream (non-blocking, fire and forget)
         await stream_handler.capture_input(message)
 
         # Get active persona prompt
         active_persona = personas_manager.get_active_persona()
-        messages = []
+        system_content = None
 
         if active_persona:
-            system_content = active_persona.personality
-            if active_persona.history:
-                system_content += f"\n\nContext/History: {active_persona.history}"
-            messages.append({"role": "system", "content": system_content})
+            # Stable, byte-identical prefix so engines can reuse its KV cache
+            system_content = personas_manager.build_system_prompt(active_persona)
 
-        messages.append({"role": "user", "content": message})
+        # Persona prompt + summary/memories + recent turns + this message
+        conversation = conversation_store.get(session_id)
+        messages = await conversation_store.build_messages(
+            conversation.session_id, system_content, message
+        )
 
+        # Hold one interactive scheduler slot across primary + fallback attempts.
+        # Raises LLMOverloadedError (-> 429) when the interactive queue is full.
+        async with llm_scheduler.slot(INTERACTIVE):
+            result = await self._call_engines(messages)
+
+        conversation_store.record_exchange(conversation.session_id, message, result.response)
+        result.session_id = conversation.session_id
+        return result
+
+    async def _call_engines(self, messages: List[Dict[str, str]]) -> ChatResponse:
+        """Try Bolt-XL first, then fall back to Vorpal"""
         # 1. Try Primary Engine: Bolt-XL
         logger.info(f"Attempting primary engine: Bolt-XL ({config.BOLT_XL_URL})")
         try:
@@ -63,7 +78,9 @@ class ChatService:
                 "messages": messages,
                 "max_tokens": config.MAX_TOKENS,
                 "temperature": 0.1,
-                "top_p": 0.9
+                "top_p": 0.9,
+                # Reuse the cached persona prefix (llama.cpp / Bolt-XL)
+                "cache_prompt": True
             }
 
             response = await client.post(
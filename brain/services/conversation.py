@@ -0,0 +1,327 @@
+"""
+Conversation Store
+Session-aware chat history with token-budgeted context assembly.
+
+Each session keeps:
+- Recent turns verbatim (bounded by turn count and token budget)
+- Older turns folded into a rolling summary (summarized in the background)
+- Hashes of every turn seen, used to drop duplicate memories
+
+Token counts come from the shared token counter, are computed once per
+turn and kept as running totals, so assembling the context for a request
+costs O(new turn) instead of re-tokenizing the whole history.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from config import config
+from services.token_counter import token_counter
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role markers / separators added by chat templates
+
+
+def count_tokens(text: str) -> int:
+    """Token count of a message, including chat-template overhead"""
+    return token_counter.count(text) + MESSAGE_OVERHEAD_TOKENS if text else 0
+
+
+def _fingerprint(text: str) -> str:
+    normalized = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class Turn:
+    """A single chat message with its cached token count"""
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self.tokens = count_tokens(content)
+        self.timestamp = time.time()
+
+    def to_message(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+class Conversation:
+    """History for a single session"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.recent: deque = deque()
+        self.recent_tokens = 0
+        self.pending: List[Turn] = []  # Rolled out of the window, not yet summarized
+        self.summary = ""
+        self.summary_tokens = 0
+        self.fingerprints: set = set()
+        self.turn_count = 0
+        self.last_active = time.time()
+        self.summarizing = False
+
+    def add(self, turn: Turn) -> None:
+        self.recent.append(turn)
+        self.recent_tokens += turn.tokens
+        self.fingerprints.add(_fingerprint(turn.content))
+        self.turn_count += 1
+        self.last_active = time.time()
+
+    def roll(self, max_turns: int, max_tokens: int) -> bool:
+        """
+        Move the oldest exchanges out of the verbatim window. Returns True if any moved.
+
+        Turns leave in user/assistant pairs, so the window always starts with a
+        user turn (chat templates that enforce alternation reject anything else).
+        """
+        rolled = False
+        while len(self.recent) > 2 and (len(self.recent) > max_turns or self.recent_tokens > max_tokens):
+            for _ in range(2):
+                turn = self.recent.popleft()
+                self.recent_tokens -= turn.tokens
+                self.pending.append(turn)
+            rolled = True
+        return rolled
+
+    def set_summary(self, summary: str) -> None:
+        self.summary = summary.strip()
+        self.summary_tokens = count_tokens(self.summary)
+
+
+class ConversationStore:
+    """
+    In-memory conversation store (LRU over sessions).
+
+    Usage:
+        messages = await conversation_store.build_messages(session_id, system_prompt, message)
+        ...
+        conversation_store.record_exchange(session_id, message, response)
+    """
+
+    SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an AI assistant.
+Keep facts, names, decisions, preferences and open questions. Be concise; write at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+    def __init__(
+        self,
+        max_sessions: int = 256,
+        context_tokens: int = 3072,
+        recent_turns: int = 8,
+        summary_tokens: int = 256,
+        memory_tokens: int = 512,
+        memory_top_k: int = 5,
+        memory_max_distance: float = 0.5
+    ):
+        """
+        Initialize store.
+
+        Args:
+            max_sessions: Sessions kept in memory (least recently used are dropped)
+            context_tokens: Budget for history + summary + memories per request
+            recent_turns: Max messages kept verbatim
+            summary_tokens: Max size of the rolling summary
+            memory_tokens: Budget for recalled memories
+            memory_top_k: Memories fetched from the vector store per request
+            memory_max_distance: Cosine distance cutoff for recalled memories
+        """
+        self.max_sessions = max_sessions
+        self.context_tokens = context_tokens
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        self.memory_tokens = memory_tokens
+        self.memory_top_k = memory_top_k
+        self.memory_max_distance = memory_max_distance
+        self.sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._tasks: set = set()
+
+    @property
+    def recent_budget(self) -> int:
+        return max(self.context_tokens - self.summary_tokens - self.memory_tokens, 0)
+
+    def get(self, session_id: Optional[str] = None) -> Conversation:
+        """Return the conversation for session_id, creating it (and an id) if needed"""
+        session_id = session_id or uuid.uuid4().hex
+        conversation = self.sessions.get(session_id)
+        if conversation is None:
+            conversation = Conversation(session_id)
+            self.sessions[session_id] = conversation
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(session_id)
+        return conversation
+
+    async def _recall_memories(self, conversation: Conversation, message: str) -> List[str]:
+        """Relevant long-term memories not already present in this conversation"""
+        if self.memory_top_k <= 0 or self.memory_tokens <= 0:
+            return []
+
+        from memory.vector_store import vector_store
+
+        if not vector_store.client or not vector_store.model:
+            return []
+
+        try:
+            results = await asyncio.to_thread(
+                vector_store.search_similar, message, top_k=self.memory_top_k
+            )
+        except Exception as e:
+            logger.warning("Memory recall failed: %s", e)
+            return []
+
+        seen = set(conversation.fingerprints)
+        seen.add(_fingerprint(message))
+        candidates = [
+            m.get("message", "") for m in results
+            if m.get("message") and m.get("similarity_score", 1.0) <= self.memory_max_distance
+        ]
+        counts = token_counter.count_many(candidates)
+        memories = []
+        budget = self.memory_tokens
+        for text, count in zip(candidates, counts):
+            fingerprint = _fingerprint(text)
+            if fingerprint in seen:
+                continue
+            tokens = count + MESSAGE_OVERHEAD_TOKENS
+            if tokens > budget:
+                continue
+            seen.add(fingerprint)
+            memories.append(text)
+            budget -= tokens
+        return memories
+
+    async def build_messages(
+        self,
+        session_id: str,
+        system_prompt: Optional[str],
+        message: str
+    ) -> List[Dict[str, str]]:
+        """
+        Assemble the chat messages for the next request.
+
+        Order: persona system prompt (stable, cache-friendly), context
+        (summary + memories), recent turns verbatim, current user message.
+        """
+        conversation = self.get(session_id)
+        messages: List[Dict[str, str]] = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+
+        # Recent exchanges (user + assistant pairs), newest first, until the
+        # verbatim budget is spent
+        turns = list(conversation.recent)
+        recent: List[Turn] = []
+        budget = self.recent_budget
+        for start in range(len(turns) - 2, -1, -2):
+            exchange = turns[start:start + 2]
+            tokens = sum(turn.tokens for turn in exchange)
+            if tokens > budget:
+                break
+            recent[:0] = exchange
+            budget -= tokens
+
+        context = []
+        if conversation.summary:
+            context.append(f"Summary of the earlier conversation:\n{conversation.summary}")
+        if conversation.pending:
+            # Not summarized yet (summary in flight or failed); keep the latest bits
+            earlier = self._fold(conversation.pending, self.summary_tokens)
+            context.append(f"Earlier messages:\n{earlier}")
+
+        memories = await self._recall_memories(conversation, message)
+        if memories:
+            context.append("Relevant memories:\n" + "\n".join(f"- {m}" for m in memories))
+
+        if context:
+            messages.append({"role": "system", "content": "\n\n".join(context)})
+
+        messages.extend(turn.to_message() for turn in recent)
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def record_exchange(self, session_id: str, message: str, response: str) -> None:
+        """Append a user/assistant exchange and roll old turns into the summary"""
+        conversation = self.get(session_id)
+        conversation.add(Turn("user", message))
+        conversation.add(Turn("assistant", response))
+
+        if conversation.roll(self.recent_turns, self.recent_budget) and not conversation.summarizing:
+            conversation.summarizing = True
+            task = asyncio.create_task(self._summarize(conversation))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _fold(self, turns: List[Turn], max_tokens: int) -> str:
+        """Extractive fallback: latest lines that fit in max_tokens"""
+        lines = []
+        budget = max_tokens
+        for turn in reversed(turns):
+            line = f"{turn.role}: {turn.content}"
+            tokens = count_tokens(line)
+            if tokens > budget:
+                if not lines:
+                    lines.append(line[-max(budget - MESSAGE_OVERHEAD_TOKENS, 1) * 4:])
+                break
+            lines.append(line)
+            budget -= tokens
+        return "\n".join(reversed(lines))
+
+    async def _summarize(self, conversation: Conversation) -> None:
+        """Fold pending turns into the rolling summary (background priority)"""
+        from services.llm import llm
+        from services.llm_scheduler import BACKGROUND
+
+        try:
+            while conversation.pending:
+                batch = list(conversation.pending)
+                prompt = self.SUMMARY_PROMPT.format(
+                    max_words=self.summary_tokens * 3 // 4,
+                    summary=conversation.summary or "(none)",
+                    messages="\n".join(f"{t.role}: {t.content}" for t in batch)
+                )
+                try:
+                    result = await llm.completion(
+                        prompt,
+                        max_tokens=self.summary_tokens,
+                        temperature=0.2,
+                        priority=BACKGROUND
+                    )
+                    summary = result["text"]
+                except Exception as e:
+                    logger.warning("Summary update failed for %s: %s", conversation.session_id, e)
+                    summary = ""
+
+                if not summary:
+                    previous = [Turn("summary", conversation.summary)] if conversation.summary else []
+                    summary = self._fold(previous + batch, self.summary_tokens)
+
+                conversation.set_summary(summary)
+                del conversation.pending[:len(batch)]
+        finally:
+            conversation.summarizing = False
+
+
+# Global instance
+conversation_store = ConversationStore(
+    max_sessions=config.CONVERSATION_MAX_SESSIONS,
+    context_tokens=config.CONVERSATION_CONTEXT_TOKENS,
+    recent_turns=config.CONVERSATION_RECENT_TURNS,
+    summary_tokens=config.CONVERSATION_SUMMARY_TOKENS,
+    memory_tokens=config.CONVERSATION_MEMORY_TOKENS,
+    memory_top_k=config.CONVERSATION_MEMORY_TOP_K,
+    memory_max_distance=config.CONVERSATION_MEMORY_MAX_DISTANCE
+)
@@ -5,10 +5,12 @@ Supports Vorpal (vLLM) and future backends.
 """
 
 import httpx
+import json
 import logging
-from typing import List, Dict, Any, Optional, Union
+from typing import AsyncIterator, List, Dict, Any, Optional, Union
 
 from config import config
+from services.llm_scheduler import llm_scheduler, INTERACTIVE, BACKGROUND
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +32,10 @@ class LLMClient:
             self._client = httpx.AsyncClient(
                 base_url=self.base_url,
                 timeout=self.timeout,
-                limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+                limits=httpx.Limits(
+                    max_keepalive_connections=5,
+                    max_connections=config.LLM_MAX_CONCURRENCY
+                )
             )
         return self._client
 
@@ -41,15 +46,21 @@ class LLMClient:
 
     async def completion(
         self,
-        prompt: str,
+        prompt: Union[str, List[str]],
         max_tokens: int = 1024,
         temperature: float = 0.7,
         stop: Optional[List[str]] = None,
         logprobs: Optional[int] = None,
-        echo: bool = False
+        echo: bool = False,
+        priority: str = INTERACTIVE
     ) -> Dict[str, Any]:
         """
         Generate text completion (legacy/instruct mode).
+
+        Args:
+            prompt: Prompt text, or a list of prompts scored in one request
+                (one choice per prompt in the raw response)
+            priority: Scheduler class (interactive, verification, agent, background)
         
         Returns:
             Dict containing 'text' and raw 'response' data.
@@ -67,7 +78,8 @@ class LLMClient:
         }
 
         try:
-            response = await client.post("/v1/completions", json=payload)
+            async with llm_scheduler.slot(priority):
+                response = await client.post("/v1/completions", json=payload)
             response.raise_for_status()
             data = response.json()
             
@@ -78,15 +90,67 @@ class LLMClient:
             logger.error(f"LLM Completion Error: {e}")
             raise
 
+    async def completion_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None,
+        priority: str = INTERACTIVE
+    ) -> AsyncIterator[str]:
+        """
+        Stream a text completion as it is generated.
+
+        Holds one scheduler slot until the stream ends or the caller closes it.
+
+        Yields:
+            Text deltas
+        """
+        client = await self._get_client()
+
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stop": stop,
+            "stream": True
+        }
+
+        try:
+            async with llm_scheduler.slot(priority):
+                async with client.stream("POST", "/v1/completions", json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        choices = json.loads(data).get("choices") or []
+                        if choices and choices[0].get("text"):
+                            yield choices[0]["text"]
+
+        except httpx.HTTPError as e:
+            logger.error(f"LLM Completion Stream Error: {e}")
+            raise
+
     async def chat(
         self,
         messages: List[Dict[str, str]],
         max_tokens: int = 1024,
         temperature: float = 0.7,
-        stop: Optional[List[str]] = None
+        stop: Optional[List[str]] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        priority: str = INTERACTIVE
     ) -> Dict[str, Any]:
         """
         Generate chat completion.
+
+        Args:
+            response_format: OpenAI-style {"type": "json_schema", ...} for
+                schema-constrained output (guided decoding on the engine)
+            priority: Scheduler class (interactive, verification, agent, background)
         
         Returns:
             Dict containing 'content' (message content) and raw 'response' data.
@@ -100,9 +164,12 @@ class LLMClient:
             "temperature": temperature,
             "stop": stop
         }
+        if response_format:
+            payload["response_format"] = response_format
 
         try:
-            response = await client.post("/v1/chat/completions", json=payload)
+            async with llm_scheduler.slot(priority):
+                response = await client.post("/v1/chat/completions", json=payload)
             response.raise_for_status()
             data = response.json()
             
@@ -113,10 +180,23 @@ class LLMClient:
             logger.error(f"LLM Chat Error: {e}")
             raise
 
-    async def get_logprobs(self, text: str) -> Optional[float]:
+    @staticmethod
+    def _average_logprob(choice: Dict[str, Any]) -> Optional[float]:
+        """Average token logprob from a completion choice (None if unavailable)"""
+        token_logprobs = (choice.get("logprobs") or {}).get("token_logprobs") or []
+        valid_logprobs = [lp for lp in token_logprobs if lp is not None]
+
+        if not valid_logprobs:
+            return None
+
+        return sum(valid_logprobs) / len(valid_logprobs)
+
+    async def get_logprobs(self, text: str, priority: str = BACKGROUND) -> Optional[float]:
         """
         Calculate perplexity/logprobs for text.
         Returns average log probability.
+
+        Scored at background priority by default so it yields to chat traffic.
         """
         try:
             result = await self.completion(
@@ -124,25 +204,80 @@ class LLMClient:
                 max_tokens=1,
                 logprobs=1,
                 echo=True,
-                temperature=0.0
+                temperature=0.0,
+                priority=priority
             )
             
             choices = result["raw"].get("choices", [])
             if not choices:
                 return None
-                
-            token_logprobs = choices[0].get("logprobs", {}).get("token_logprobs", [])
-            valid_logprobs = [lp for lp in token_logprobs if lp is not None]
-            
-            if not valid_logprobs:
-                return None
-                
-            return sum(valid_logprobs) / len(valid_logprobs)
+
+            return self._average_logprob(choices[0])
             
         except Exception as e:
             logger.warning(f"Failed to calculate logprobs: {e}")
             return None
 
+    async def get_logprobs_batch(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        priority: str = BACKGROUND
+    ) -> List[Optional[float]]:
+        """
+        Calculate average log probability for many texts.
+
+        Sends up to batch_size prompts per /v1/completions request instead of
+        one request per text. If the engine rejects a batch (4xx, e.g. one
+        prompt exceeds the context window), its texts are scored individually
+        so a single bad text doesn't fail the rest. Other failures (engine
+        down, timeouts, 5xx) stop scoring: retrying text by text would only
+        multiply the timeouts.
+
+        Args:
+            texts: Texts to score
+            batch_size: Prompts per request (default: config.PERPLEXITY_BATCH_SIZE)
+            priority: Scheduler class for the requests
+
+        Returns:
+            List aligned with texts; None where scoring failed
+        """
+        batch_size = batch_size or config.PERPLEXITY_BATCH_SIZE
+        results: List[Optional[float]] = [None] * len(texts)
+
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            try:
+                result = await self.completion(
+                    prompt=batch,
+                    max_tokens=1,
+                    logprobs=1,
+                    echo=True,
+                    temperature=0.0,
+                    priority=priority
+                )
+            except httpx.HTTPStatusError as e:
+                if not 400 <= e.response.status_code < 500:
+                    logger.warning(f"Batch logprobs failed, skipping {len(texts) - start} texts: {e}")
+                    break
+                logger.warning(
+                    f"Batch logprobs rejected for {len(batch)} texts, scoring individually: {e}"
+                )
+                for offset, text in enumerate(batch):
+                    results[start + offset] = await self.get_logprobs(text, priority=priority)
+                continue
+            except Exception as e:
+                logger.warning(f"Batch logprobs failed, skipping {len(texts) - start} texts: {e}")
+                break
+
+            for position, choice in enumerate(result["raw"].get("choices", [])):
+                # vLLM returns one choice per prompt, tagged with its index
+                offset = choice.get("index", position)
+                if 0 <= offset < len(batch):
+                    results[start + offset] = self._average_logprob(choice)
+
+        return results
+
     async def health_check(self) -> bool:
         """Check if LLM service is reachable"""
         client = await self._get_client()
@@ -0,0 +1,258 @@
+"""
+LLM Request Scheduler
+Priority-aware admission control for traffic sent to the LLM engines.
+
+Interactive chat, agent loops, Chain of Verification and background
+perplexity scoring all share the same engine connections. The scheduler
+hands out slots by priority class so background work yields to users:
+
+- A global concurrency limit caps in-flight requests (matches the HTTP pool).
+- Each class has its own concurrency limit and queue depth.
+- When a slot frees up, the highest-priority eligible waiter gets it.
+- When a class queue is full the request is shed with a Retry-After hint.
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+# Priority classes, highest priority first
+INTERACTIVE = "interactive"
+VERIFICATION = "verification"
+AGENT = "agent"
+BACKGROUND = "background"
+
+PRIORITY_ORDER = [INTERACTIVE, VERIFICATION, AGENT, BACKGROUND]
+
+
+class LLMOverloadedError(Exception):
+    """Raised when a request is shed because its priority queue is full"""
+
+    def __init__(self, priority: str, retry_after: int):
+        self.priority = priority
+        self.retry_after = retry_after
+        super().__init__(
+            f"LLM queue for '{priority}' traffic is full. Retry after {retry_after}s."
+        )
+
+
+class _ClassStats:
+    """Counters for a single priority class"""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue  # 0 = unbounded
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+
+    def avg_service_time(self) -> float:
+        return (self.total_service / self.completed) if self.completed else 1.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "avg_service_ms": round(self.total_service / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+class LLMScheduler:
+    """
+    Priority scheduler with per-class concurrency limits and load shedding.
+
+    Usage:
+        async with llm_scheduler.slot("background"):
+            await client.post(...)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        class_limits: Optional[Dict[str, int]] = None,
+        max_queue: Optional[Dict[str, int]] = None
+    ):
+        """
+        Initialize scheduler.
+
+        Args:
+            max_concurrency: Total in-flight LLM requests across all classes
+            class_limits: Max in-flight requests per priority class
+            max_queue: Max waiting requests per class before shedding (0 = unbounded)
+        """
+        class_limits = class_limits or {}
+        max_queue = max_queue or {}
+
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.classes: Dict[str, _ClassStats] = {
+            name: _ClassStats(
+                limit=class_limits.get(name, max_concurrency),
+                max_queue=max_queue.get(name, 0)
+            )
+            for name in PRIORITY_ORDER
+        }
+        # Waiters: (rank, seq, priority, future)
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+
+    def _rank(self, priority: str) -> int:
+        if priority not in self.classes:
+            raise ValueError(
+                f"Unknown priority '{priority}'. Expected one of: {', '.join(PRIORITY_ORDER)}"
+            )
+        return PRIORITY_ORDER.index(priority)
+
+    def _can_run(self, priority: str) -> bool:
+        stats = self.classes[priority]
+        return self.active < self.max_concurrency and stats.active < stats.limit
+
+    def _retry_after(self, priority: str) -> int:
+        """Estimate seconds until a queued request of this class would be served"""
+        stats = self.classes[priority]
+        backlog = stats.queued + stats.active + 1
+        estimate = stats.avg_service_time() * backlog / max(stats.limit, 1)
+        return max(1, math.ceil(estimate))
+
+    def _grant(self, priority: str) -> None:
+        self.active += 1
+        self.classes[priority].active += 1
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the highest-priority eligible waiters"""
+        if not self._waiters or self.active >= self.max_concurrency:
+            return
+
+        self._waiters.sort(key=lambda w: (w[0], w[1]))
+        remaining = []
+        for waiter in self._waiters:
+            _, _, priority, future = waiter
+            if future.done():
+                continue
+            if self._can_run(priority):
+                self._grant(priority)
+                future.set_result(True)
+            else:
+                remaining.append(waiter)
+        self._waiters = remaining
+
+    def _release(self, priority: str) -> None:
+        self.active -= 1
+        self.classes[priority].active -= 1
+        self._dispatch()
+
+    async def acquire(self, priority: str) -> float:
+        """
+        Wait for a slot in the given priority class.
+
+        Returns:
+            Seconds spent waiting in the queue
+
+        Raises:
+            LLMOverloadedError: If the class queue is full
+        """
+        rank = self._rank(priority)
+        stats = self.classes[priority]
+        started = time.monotonic()
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (rank, next(self._seq), priority, future)
+        self._waiters.append(waiter)
+        self._dispatch()
+
+        if future.done():
+            # Admitted immediately
+            stats.admitted += 1
+            return 0.0
+
+        if stats.max_queue and stats.queued >= stats.max_queue:
+            self._waiters.remove(waiter)
+            stats.rejected += 1
+            retry_after = self._retry_after(priority)
+            logger.warning(
+                "Shedding %s LLM request (queued=%d, active=%d, retry_after=%ds)",
+                priority, stats.queued, stats.active, retry_after
+            )
+            raise LLMOverloadedError(priority, retry_after)
+
+        stats.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just before cancellation; hand it back
+                self._release(priority)
+            raise
+        finally:
+            stats.queued -= 1
+
+        waited = time.monotonic() - started
+        stats.admitted += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+        return waited
+
+    def release(self, priority: str, service_time: float = 0.0) -> None:
+        """Return a slot acquired with acquire()"""
+        stats = self.classes[priority]
+        stats.completed += 1
+        stats.total_service += service_time
+        self._release(priority)
+
+    @asynccontextmanager
+    async def slot(self, priority: str = INTERACTIVE):
+        """Async context manager holding one LLM slot for the given class"""
+        await self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(priority, time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth and admission counters"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queued": sum(s.queued for s in self.classes.values()),
+            "classes": {name: stats.to_dict() for name, stats in self.classes.items()},
+        }
+
+
+# Global instance
+llm_scheduler = LLMScheduler(
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    class_limits={
+        INTERACTIVE: config.LLM_LIMIT_INTERACTIVE,
+        VERIFICATION: config.LLM_LIMIT_VERIFICATION,
+        AGENT: config.LLM_LIMIT_AGENT,
+        BACKGROUND: config.LLM_LIMIT_BACKGROUND,
+    },
+    max_queue={
+        INTERACTIVE: config.LLM_QUEUE_INTERACTIVE,
+        VERIFICATION: config.LLM_QUEUE_VERIFICATION,
+        AGENT: config.LLM_QUEUE_AGENT,
+        BACKGROUND: config.LLM_QUEUE_BACKGROUND,
+    }
+)
@@ -0,0 +1,281 @@
+"""
+Perplexity Providers
+Pluggable perplexity scoring for the memory worker's surprise score.
+
+Providers:
+- vorpal: Remote scoring via LLMClient (/v1/completions echo + logprobs)
+- bolt:   Same, against Bolt-XL (single forward pass per batch of prompts)
+- ngram:  Character n-gram model trained on the memory corpus (pure Python, CPU)
+- local:  Small causal LM (e.g. distilgpt2) run on CPU via transformers
+
+The memory worker uses one provider as primary and optionally a second as
+fallback, so ingestion keeps working when the GPU engine is busy or down.
+"""
+
+import asyncio
+import logging
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class PerplexityProvider:
+    """Base class for perplexity providers"""
+
+    name = "base"
+
+    async def score(self, texts: List[str]) -> List[Optional[float]]:
+        """
+        Calculate perplexity for each text.
+
+        Args:
+            texts: Texts to score
+
+        Returns:
+            Perplexity per text (None where scoring failed)
+        """
+        raise NotImplementedError
+
+    def observe(self, text: str) -> None:
+        """Feed a processed message back to the provider (optional)"""
+        pass
+
+    def train(self, texts: Iterable[str]) -> None:
+        """Bootstrap the provider from an existing corpus (optional)"""
+        pass
+
+
+def _logprob_to_perplexity(avg_logprob: float) -> float:
+    # Perplexity = exp(-average_log_prob)
+    try:
+        return math.exp(-avg_logprob)
+    except OverflowError:
+        return float('inf')
+
+
+class VorpalPerplexityProvider(PerplexityProvider):
+    """Scores text with Vorpal through the shared LLMClient"""
+
+    name = "vorpal"
+
+    def _client(self):
+        from services.llm import llm
+        return llm
+
+    async def score(self, texts: List[str]) -> List[Optional[float]]:
+        avg_logprobs = await self._client().get_logprobs_batch(texts)
+        return [
+            _logprob_to_perplexity(lp) if lp is not None else None
+            for lp in avg_logprobs
+        ]
+
+
+class BoltPerplexityProvider(VorpalPerplexityProvider):
+    """Scores text with Bolt-XL, moving surprise scoring off Vorpal"""
+
+    name = "bolt"
+
+    def __init__(self):
+        self.client = None
+
+    def _client(self):
+        if self.client is None:
+            from services.llm import LLMClient
+            self.client = LLMClient(base_url=config.BOLT_XL_URL, model=config.BOLT_XL_MODEL)
+        return self.client
+
+
+class NGramPerplexityProvider(PerplexityProvider):
+    """
+    Character n-gram language model with interpolated smoothing.
+
+    Trained on the memory corpus and updated with every processed message.
+    Raw character-level perplexity is not comparable to LLM per-token
+    perplexity, so scores are calibrated against the corpus itself: a text as
+    predictable as the average held-out message maps to REFERENCE_PERPLEXITY,
+    and more surprising text scales up exponentially from there.
+    """
+
+    name = "ngram"
+
+    REFERENCE_PERPLEXITY = 10.0  # Typical LLM perplexity for ordinary chat text
+    MIN_TRAINING_CHARS = 2000  # Below this the model abstains (returns None)
+    # Interpolation weights for trigram / bigram / unigram
+    LAMBDAS = (0.6, 0.3, 0.1)
+
+    def __init__(self):
+        self.order = len(self.LAMBDAS)
+        # counts[n][context][char] for n = 1..order
+        self.counts: List[Dict[str, Dict[str, int]]] = [
+            defaultdict(lambda: defaultdict(int)) for _ in range(self.order)
+        ]
+        self.context_totals: List[Dict[str, int]] = [defaultdict(int) for _ in range(self.order)]
+        self.vocab: set = set()
+        self.total_chars = 0
+        # Running mean of held-out per-character NLL (calibration baseline)
+        self.baseline_nll = 0.0
+        self.baseline_count = 0
+
+    def _padded(self, text: str) -> str:
+        return "\x02" * (self.order - 1) + text.lower() + "\x03"
+
+    def observe(self, text: str) -> None:
+        if not text:
+            return
+        # Score before counting so the baseline is a held-out estimate
+        nll = self._per_char_nll(text)
+        if nll is not None:
+            self.baseline_count += 1
+            self.baseline_nll += (nll - self.baseline_nll) / self.baseline_count
+
+        padded = self._padded(text)
+        for i in range(self.order - 1, len(padded)):
+            char = padded[i]
+            self.vocab.add(char)
+            for n in range(self.order):
+                context = padded[i - n:i]
+                self.counts[n][context][char] += 1
+                self.context_totals[n][context] += 1
+        self.total_chars += len(text)
+
+    def train(self, texts: Iterable[str]) -> None:
+        for text in texts:
+            self.observe(text)
+        logger.info(
+            "N-gram perplexity model trained: %d chars, vocab=%d",
+            self.total_chars, len(self.vocab)
+        )
+
+    def _char_prob(self, padded: str, i: int) -> float:
+        char = padded[i]
+        vocab_size = len(self.vocab) + 1  # +1 for unseen characters
+        # Unigram with add-one smoothing
+        prob = (self.counts[0][""].get(char, 0) + 1) / (self.context_totals[0][""] + vocab_size)
+        prob *= self.LAMBDAS[-1]
+
+        for n in range(1, self.order):
+            context = padded[i - n:i]
+            total = self.context_totals[n].get(context, 0)
+            if total:
+                prob += self.LAMBDAS[self.order - 1 - n] * self.counts[n][context].get(char, 0) / total
+        return prob
+
+    def _per_char_nll(self, text: str) -> Optional[float]:
+        if self.total_chars < self.MIN_TRAINING_CHARS:
+            return None
+
+        padded = self._padded(text)
+        log_prob = 0.0
+        count = 0
+        for i in range(self.order - 1, len(padded)):
+            log_prob += math.log(self._char_prob(padded, i))
+            count += 1
+        return -log_prob / count
+
+    def perplexity(self, text: str) -> Optional[float]:
+        """Synchronous scoring of a single text"""
+        if not text:
+            return None
+
+        nll = self._per_char_nll(text)
+        if nll is None or not self.baseline_count:
+            return None
+
+        ratio = nll / max(self.baseline_nll, 1e-6)
+        return _logprob_to_perplexity(-ratio * math.log(self.REFERENCE_PERPLEXITY))
+
+    async def score(self, texts: List[str]) -> List[Optional[float]]:
+        return [self.perplexity(text) for text in texts]
+
+
+class LocalLMPerplexityProvider(PerplexityProvider):
+    """
+    Small causal LM on CPU (default: distilgpt2).
+
+    transformers/torch are imported lazily; if they are missing or the model
+    fails to load, the provider abstains and the caller falls back.
+    """
+
+    name = "local"
+
+    MAX_LENGTH = 512  # Truncate long messages (tokens)
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or config.LOCAL_PERPLEXITY_MODEL
+        self.model = None
+        self.tokenizer = None
+        self.load_error: Optional[str] = None
+
+    def _load(self) -> bool:
+        if self.model is not None:
+            return True
+        if self.load_error:
+            return False
+        try:
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+
+            logger.info("Loading local perplexity model: %s", self.model_name)
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModelForCausalLM.from_pretrained(self.model_name, torch_dtype=torch.float32)
+            model.eval()
+            self.model = model
+            return True
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error("Local perplexity model unavailable: %s", e)
+            return False
+
+    def _score_sync(self, texts: List[str]) -> List[Optional[float]]:
+        if not self._load():
+            return [None] * len(texts)
+
+        import torch
+
+        results: List[Optional[float]] = []
+        with torch.inference_mode():
+            for text in texts:
+                ids = self.tokenizer(
+                    text, return_tensors="pt", truncation=True, max_length=self.MAX_LENGTH
+                )["input_ids"]
+                if ids.shape[-1] < 2:
+                    results.append(None)
+                    continue
+                loss = self.model(input_ids=ids, labels=ids).loss
+                results.append(_logprob_to_perplexity(-float(loss)))
+        return results
+
+    async def score(self, texts: List[str]) -> List[Optional[float]]:
+        return await asyncio.to_thread(self._score_sync, texts)
+
+
+PROVIDERS = {
+    "vorpal": VorpalPerplexityProvider,
+    "bolt": BoltPerplexityProvider,
+    "ngram": NGramPerplexityProvider,
+    "local": LocalLMPerplexityProvider,
+}
+
+
+def get_perplexity_provider(name: Optional[str]) -> Optional[PerplexityProvider]:
+    """
+    Build a provider by name.
+
+    Args:
+        name: vorpal, bolt, ngram, local, or none/empty for no provider
+
+    Returns:
+        Provider instance, or None if disabled
+    """
+    if not name or name.lower() == "none":
+        return None
+    try:
+        return PROVIDERS[name.lower()]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown perplexity provider '{name}'. Expected one of: {', '.join(PROVIDERS)}"
+        )
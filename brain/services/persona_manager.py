@@ -11,6 +11,8 @@ class PersonasManager:
     def __init__(self):
         self.file_path = config.PERSONAS_FILE
         self.active_file_path = os.path.join("data", "active_persona.json")
+        self._prompt_cache_key = None
+        self._prompt_cache = ""
         self._ensure_file()
 
     def _ensure_file(self):
@@ -115,6 +117,23 @@ class PersonasManager:
         if active_id:
             return self.get_by_id(active_id)
         return None
+
+    def build_system_prompt(self, persona: Persona) -> str:
+        """
+        Build the persona system prompt.
+
+        The result must be byte-identical across requests for the same persona
+        version so the engines can reuse the cached KV prefix. Memoized on
+        (id, last_modified) so edits produce a new prefix.
+        """
+        key = (persona.id, persona.last_modified)
+        if self._prompt_cache_key != key:
+            system_content = persona.personality.strip()
+            if persona.history and persona.history.strip():
+                system_content += f"\n\nContext/History: {persona.history.strip()}"
+            self._prompt_cache_key = key
+            self._prompt_cache = system_content
+        return self._prompt_cache
     
     def save_asset(self, file_obj, filename: str) -> str:
         """Saves an asset file and returns the relative path"""
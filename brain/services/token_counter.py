@@ -0,0 +1,163 @@
+"""
+Token Counter
+Shared token counting for budget checks and context assembly.
+
+Modes:
+- approx: ~4 characters per token, no tokenizer (default, cheapest)
+- exact:  HF tokenizer named by TOKENIZER_MODEL (falls back to approx if it can't load)
+
+The tokenizer loads in a background thread (started at brain startup, or
+by the first count) so a download never blocks the event loop; counts are
+approximate until it is ready.
+
+Exact counts are cached by content hash, so the same persona prompt,
+memory or chunk is only tokenized once, and misses are encoded in a
+single batched tokenizer call.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+def approx_tokens(text: str) -> int:
+    """Approximate token count (~4 characters per token for English text)"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+class TokenCounter:
+    """
+    Content-hash cached token counter.
+
+    Usage:
+        token_counter.count(text)
+        token_counter.count_many(texts)
+    """
+
+    def __init__(self, mode: str = "approx", tokenizer_model: Optional[str] = None, cache_size: int = 4096):
+        """
+        Initialize counter.
+
+        Args:
+            mode: "approx" or "exact"
+            tokenizer_model: HF tokenizer for exact mode
+            cache_size: Cached counts (least recently used dropped first)
+        """
+        self.mode = mode.lower()
+        self.tokenizer_model = tokenizer_model
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.tokenizer = None
+        self.load_error: Optional[str] = None
+        self.loader: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def exact(self) -> bool:
+        if self.mode != "exact":
+            return False
+        if self.tokenizer is None:
+            self.start_loading()
+        return self.tokenizer is not None
+
+    def start_loading(self) -> None:
+        """Load the exact-mode tokenizer in a background thread (once)"""
+        with self.lock:
+            if self.mode != "exact" or self.loader is not None or self.tokenizer is not None:
+                return
+            self.loader = threading.Thread(target=self._load, name="token-counter-load", daemon=True)
+        self.loader.start()
+
+    def _load(self) -> bool:
+        if self.tokenizer is not None:
+            return True
+        if self.load_error:
+            return False
+        if not self.tokenizer_model:
+            self.load_error = "TOKENIZER_MODEL not set"
+            logger.warning("Exact token counting needs TOKENIZER_MODEL; using approximate counts")
+            return False
+        try:
+            from transformers import AutoTokenizer
+
+            self.tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_model)
+            logger.info("Token counter using %s", self.tokenizer_model)
+            return True
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error("Tokenizer %s unavailable, using approximate counts: %s", self.tokenizer_model, e)
+            return False
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def count(self, text: str) -> int:
+        """Token count for a single text"""
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: Iterable[str]) -> List[int]:
+        """Token counts for many texts; cache misses are encoded in one batch"""
+        texts = list(texts)
+        if not self.exact:
+            return [approx_tokens(text) for text in texts]
+
+        counts: List[Optional[int]] = [None] * len(texts)
+        missing = {}
+        with self.lock:
+            for i, text in enumerate(texts):
+                if not text:
+                    counts[i] = 0
+                    continue
+                key = self._key(text)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.cache.move_to_end(key)
+                    counts[i] = cached
+                    self.hits += 1
+                elif key in missing:
+                    missing[key].append(i)  # Repeated in this batch, encoded once
+                    self.hits += 1
+                else:
+                    missing[key] = [i]
+                    self.misses += 1
+
+        if missing:
+            keys = list(missing)
+            encoded = self.tokenizer(
+                [texts[missing[key][0]] for key in keys], add_special_tokens=False
+            )["input_ids"]
+            with self.lock:
+                for key, ids in zip(keys, encoded):
+                    for i in missing[key]:
+                        counts[i] = len(ids)
+                    self.cache[key] = len(ids)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            "mode": "exact" if self.tokenizer is not None else "approx",
+            "tokenizer": self.tokenizer_model if self.tokenizer is not None else None,
+            "cached": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global instance
+token_counter = TokenCounter(
+    mode=config.TOKEN_COUNT_MODE,
+    tokenizer_model=config.TOKENIZER_MODEL,
+    cache_size=config.TOKEN_COUNT_CACHE_SIZE
+)
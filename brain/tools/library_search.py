@@ -17,6 +17,9 @@ import redis
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Registry of ingested filenames maintained by the librarian (sorted set, alphabetical)
+FILES_KEY = "library_files"
+
 
 class LibrarySearchTool:
     """Tool for searching the ingested library"""
@@ -77,7 +80,9 @@ class LibrarySearchTool:
                     {"name": "total_chunks", "type": "numeric"},
                     {"name": "tokens", "type": "numeric"},
                     {"name": "timestamp", "type": "numeric"},
-                    {"name": "doc_type", "type": "tag"}
+                    {"name": "doc_type", "type": "tag"},
+                    {"name": "section", "type": "text"},
+                    {"name": "page", "type": "numeric"}
                 ]
             }
 
@@ -117,7 +122,8 @@ class LibrarySearchTool:
                 vector_field_name="embedding",
                 return_fields=[
                     "text", "filename", "file_type",
-                    "chunk_index", "total_chunks", "tokens", "timestamp"
+                    "chunk_index", "total_chunks", "tokens", "timestamp",
+                    "section", "page"
                 ],
                 num_results=top_k
             )
@@ -145,6 +151,8 @@ class LibrarySearchTool:
                     "total_chunks": int(result.get("total_chunks", 0)),
                     "tokens": int(result.get("tokens", 0)),
                     "timestamp": int(result.get("timestamp", 0)),
+                    "section": result.get("section", ""),
+                    "page": int(result.get("page", 0)),
                     "similarity_score": distance,
                     "similarity_pct": similarity_pct
                 })
@@ -156,35 +164,33 @@ class LibrarySearchTool:
             logger.error(f"Error searching library: {str(e)}")
             return []
 
-    def get_stats(self) -> Dict[str, Any]:
+    def get_stats(self, offset: int = 0, limit: int = 100) -> Dict[str, Any]:
         """
         Get statistics about the library.
 
+        Chunk count from FT.INFO and files from the librarian's registry:
+        constant cost instead of a scan over every chunk.
+
+        Args:
+            offset: First file to list (alphabetical)
+            limit: Files to list
+
         Returns:
-            Dictionary with stats (total chunks, unique files, etc.)
+            Dictionary with stats (total chunks, unique files, a page of filenames)
         """
         try:
-            # Count total library chunks
-            cursor, keys = self.redis_client.scan(match="library:*", count=1000)
-            total_count = len(keys)
-
-            while cursor != 0:
-                cursor, batch = self.redis_client.scan(cursor, match="library:*", count=1000)
-                total_count += len(batch)
-
-            # Get unique filenames
-            filenames = set()
-            for key in self.redis_client.scan_iter(match="library:*", count=100):
-                filename = self.redis_client.hget(key, "filename")
-                if filename:
-                    if isinstance(filename, bytes):
-                        filename = filename.decode('utf-8')
-                    filenames.add(filename)
+            info = self.redis_client.ft(self.index_name).info()
+            files = [
+                name.decode('utf-8') if isinstance(name, bytes) else name
+                for name in self.redis_client.zrange(FILES_KEY, offset, offset + limit - 1)
+            ] if limit > 0 else []
 
             return {
-                "total_chunks": total_count,
-                "unique_files": len(filenames),
-                "files": list(filenames)
+                "total_chunks": int(info["num_docs"]),
+                "unique_files": self.redis_client.zcard(FILES_KEY),
+                "files": files,
+                "offset": offset,
+                "limit": limit
             }
 
         except Exception as e:
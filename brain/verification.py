@@ -5,13 +5,53 @@ Reduces hallucinations by verifying model responses before returning them.
 Process:
 1. Generate initial response
 2. Create verification questions about the response
-3. Answer verification questions independently
-4. Revise response based on verification results
+3. Answer verification questions independently (concurrently)
+4. Revise response based on verification results (skipped when every
+   answer already agrees with the response)
+
+verify_stream() yields the draft, questions and answers as they arrive,
+and starts answering each question as soon as its line is generated.
 """
 
-from typing import List, Dict, Optional
+import asyncio
+import re
+from contextlib import aclosing
+from typing import Any, AsyncIterator, List, Dict, Optional
 from config import config
 from services.llm import llm
+from services.llm_scheduler import VERIFICATION
+
+MAX_QUESTIONS = 3
+NEGATIVE_ANSWER = re.compile(r"^\W*(no|not|false|incorrect|wrong)\b", re.IGNORECASE)
+POSITIVE_ANSWER = re.compile(r"^\W*(yes|correct|true|indeed)\b", re.IGNORECASE)
+
+
+def answer_supports(response: str, answer: str) -> bool:
+    """
+    Cheap check that a verification answer agrees with the response.
+
+    Yes/no answers are taken at their word; otherwise every number and
+    mid-sentence capitalized word (names, places, dates) in the answer must
+    appear in the response. Answers with nothing checkable don't count as
+    agreement, so doubtful cases still go through revision.
+    """
+    if NEGATIVE_ANSWER.match(answer):
+        return False
+    if POSITIVE_ANSWER.match(answer):
+        return True
+
+    facts = set()
+    sentence_start = True
+    for word in re.findall(r"[A-Za-z0-9][\w'-]*|[.!?]", answer):
+        if word in ".!?":
+            sentence_start = True
+            continue
+        if word[0].isdigit() or (word[0].isupper() and not sentence_start):
+            facts.add(word.lower())
+        sentence_start = False
+
+    text = response.lower()
+    return bool(facts) and all(fact in text for fact in facts)
 
 
 class ChainOfVerification:
@@ -25,6 +65,14 @@ class ChainOfVerification:
     - Revising responses when needed
     """
 
+    def __init__(self, early_exit: Optional[bool] = None):
+        """
+        Args:
+            early_exit: Skip the revision call when all answers agree with the
+                response (default: config.VERIFY_EARLY_EXIT)
+        """
+        self.early_exit = config.VERIFY_EARLY_EXIT if early_exit is None else early_exit
+
     async def __aenter__(self):
         """Async context manager entry"""
         return self
@@ -45,7 +93,8 @@ class ChainOfVerification:
         """
         result = await llm.completion(
             prompt=prompt,
-            temperature=0.7
+            temperature=0.7,
+            priority=VERIFICATION
         )
         return result["text"].strip()
 
@@ -67,7 +116,27 @@ class ChainOfVerification:
         Returns:
             List of verification questions (2-4 questions)
         """
-        verification_prompt = f"""Given this question and answer, generate 2-3 specific verification questions to check if the answer is factually correct.
+        result = await llm.completion(
+            prompt=self._questions_prompt(original_prompt, response),
+            max_tokens=150,
+            temperature=0.3,
+            priority=VERIFICATION
+        )
+
+        questions_text = result["text"].strip()
+
+        # Parse questions (simple line-based parsing)
+        questions = []
+        for line in questions_text.split('\n'):
+            question = self._parse_question(line)
+            if question:
+                questions.append(question)
+
+        return questions[:MAX_QUESTIONS]
+
+    @staticmethod
+    def _questions_prompt(original_prompt: str, response: str) -> str:
+        return f"""Given this question and answer, generate 2-3 specific verification questions to check if the answer is factually correct.
 
 Question: {original_prompt}
 Answer: {response}
@@ -80,26 +149,15 @@ Generate verification questions that:
         Format: One question per line, numbered.
         Verification questions:"""
 
-        result = await llm.completion(
-            prompt=verification_prompt,
-            max_tokens=150,
-            temperature=0.3
-        )
-
-        questions_text = result["text"].strip()
-
-        # Parse questions (simple line-based parsing)
-        questions = []
-        for line in questions_text.split('\n'):
-            line = line.strip()
-            # Remove numbering like "1.", "2)", etc.
-            if line and (line[0].isdigit() or line.startswith('-')):
-                # Strip leading number and punctuation
-                clean_line = line.lstrip('0123456789.-) ').strip()
-                if clean_line:
-                    questions.append(clean_line)
-
-        return questions[:3]  # Limit to 3 questions
+    @staticmethod
+    def _parse_question(line: str) -> Optional[str]:
+        """Question text from a numbered/bulleted line, None for other lines"""
+        line = line.strip()
+        # Remove numbering like "1.", "2)", etc.
+        if line and (line[0].isdigit() or line.startswith('-')):
+            # Strip leading number and punctuation
+            return line.lstrip('0123456789.-) ').strip() or None
+        return None
 
     async def answer_verification_question(self, question: str) -> str:
         """
@@ -114,10 +172,17 @@ Generate verification questions that:
         result = await llm.completion(
             prompt=question,
             max_tokens=100,
-            temperature=0.3
+            temperature=0.3,
+            priority=VERIFICATION
         )
         return result["text"].strip()
 
+    async def answer_verification_questions(self, questions: List[str]) -> List[str]:
+        """Answer all verification questions concurrently (they are independent)"""
+        return list(await asyncio.gather(
+            *(self.answer_verification_question(question) for question in questions)
+        ))
+
     async def verify_and_revise(
         self,
         original_prompt: str,
@@ -153,15 +218,45 @@ Provide the final answer (corrected if needed):"""
 
         result = await llm.completion(
             prompt=revision_prompt,
-            temperature=0.5
+            temperature=0.5,
+            priority=VERIFICATION
         )
         return result["text"].strip()
 
+    async def _conclude(
+        self,
+        prompt: str,
+        initial_response: str,
+        questions: List[str],
+        verification_qa: List[Dict[str, str]]
+    ) -> Dict[str, Any]:
+        """Revise (unless every answer agrees) and assemble the result"""
+        revision_skipped = self.early_exit and bool(verification_qa) and all(
+            answer_supports(initial_response, qa["answer"]) for qa in verification_qa
+        )
+        if revision_skipped:
+            final_response = initial_response
+        else:
+            final_response = await self.verify_and_revise(
+                prompt,
+                initial_response,
+                verification_qa
+            )
+
+        return {
+            "initial_response": initial_response,
+            "verification_questions": questions,
+            "verification_qa": verification_qa,
+            "final_response": final_response,
+            "revised": final_response.strip() != initial_response.strip(),
+            "revision_skipped": revision_skipped
+        }
+
     async def verify(
         self,
         prompt: str,
         initial_response: Optional[str] = None
-    ) -> Dict[str, any]:
+    ) -> Dict[str, Any]:
         """
         Complete verification chain for a prompt.
 
@@ -173,9 +268,10 @@ Provide the final answer (corrected if needed):"""
             Dict with:
                 - initial_response: Original response
                 - verification_questions: List of verification questions
-                - verification_answers: List of answers to verification questions
+                - verification_qa: List of {question, answer} pairs
                 - final_response: Revised response after verification
                 - revised: Boolean indicating if response was revised
+                - revision_skipped: True if all answers agreed and revision was skipped
         """
         # Step 1: Generate initial response (if not provided)
         if initial_response is None:
@@ -187,32 +283,76 @@ Provide the final answer (corrected if needed):"""
             initial_response
         )
 
-        # Step 3: Answer verification questions independently
-        verification_qa = []
-        for question in questions:
-            answer = await self.answer_verification_question(question)
-            verification_qa.append({
-                "question": question,
-                "answer": answer
-            })
+        # Step 3: Answer verification questions independently, in parallel
+        answers = await self.answer_verification_questions(questions)
+        verification_qa = [
+            {"question": question, "answer": answer}
+            for question, answer in zip(questions, answers)
+        ]
 
         # Step 4: Revise based on verification
-        final_response = await self.verify_and_revise(
-            prompt,
-            initial_response,
-            verification_qa
-        )
+        return await self._conclude(prompt, initial_response, questions, verification_qa)
 
-        # Determine if response was revised
-        revised = final_response.strip() != initial_response.strip()
+    async def verify_stream(
+        self,
+        prompt: str,
+        initial_response: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Verification chain as a stream of events.
 
-        return {
-            "initial_response": initial_response,
-            "verification_questions": questions,
-            "verification_qa": verification_qa,
-            "final_response": final_response,
-            "revised": revised
-        }
+        Yields dicts with a "type" of:
+            - draft: {"text": delta} while the initial response is generated
+            - question: {"index", "question"} as each question line completes
+            - answer: {"index", "question", "answer"}
+            - result: the same fields verify() returns
+        """
+        if initial_response is None:
+            parts = []
+            async for delta in llm.completion_stream(prompt, temperature=0.7, priority=VERIFICATION):
+                parts.append(delta)
+                yield {"type": "draft", "text": delta}
+            initial_response = "".join(parts).strip()
+
+        questions: List[str] = []
+        answers: List[asyncio.Task] = []
+        try:
+            # Answer each question while the next ones are still being generated
+            pending = ""
+            stream = llm.completion_stream(
+                self._questions_prompt(prompt, initial_response),
+                max_tokens=150,
+                temperature=0.3,
+                priority=VERIFICATION
+            )
+            async with aclosing(stream):
+                async for delta in stream:
+                    *lines, pending = (pending + delta).split("\n")
+                    for line in lines:
+                        question = self._parse_question(line)
+                        if question and len(questions) < MAX_QUESTIONS:
+                            questions.append(question)
+                            answers.append(asyncio.create_task(self.answer_verification_question(question)))
+                            yield {"type": "question", "index": len(questions) - 1, "question": question}
+                    if len(questions) >= MAX_QUESTIONS:
+                        break
+            question = self._parse_question(pending)
+            if question and len(questions) < MAX_QUESTIONS:
+                questions.append(question)
+                answers.append(asyncio.create_task(self.answer_verification_question(question)))
+                yield {"type": "question", "index": len(questions) - 1, "question": question}
+
+            verification_qa = []
+            for index, (question, task) in enumerate(zip(questions, answers)):
+                answer = await task
+                verification_qa.append({"question": question, "answer": answer})
+                yield {"type": "answer", "index": index, "question": question, "answer": answer}
+        finally:
+            for task in answers:
+                task.cancel()
+
+        result = await self._conclude(prompt, initial_response, questions, verification_qa)
+        yield {"type": "result", **result}
 
 
 # Convenience function for one-off verifications
@@ -3,17 +3,21 @@ Memory Worker (Chunk 2.5)
 Background worker that processes inputs from Redis Stream.
 Calculates surprise score (perplexity + vector distance).
 Stores surprising memories in vector store.
+
+Perplexity comes from a pluggable provider (services/perplexity.py):
+Vorpal by default, with a local CPU provider as fallback or primary.
 """
 
 import asyncio
 import redis.asyncio as redis_async
-from typing import Optional
+from typing import Dict, List, Optional
 import math
 import logging
 
 from config import config
 from memory.vector_store import VectorStore
 from services.llm import llm
+from services.perplexity import PerplexityProvider, get_perplexity_provider
 
 logger = logging.getLogger(__name__)
 
@@ -37,12 +41,37 @@ class MemoryWorker:
     # Retry settings for perplexity calls
     PERPLEXITY_RETRIES = 3
     PERPLEXITY_RETRY_DELAY = 2.0  # seconds
+    # Stored memories used to bootstrap local providers (e.g. n-gram)
+    PERPLEXITY_TRAINING_LIMIT = 5000
 
-    def __init__(self):
+    def __init__(
+        self,
+        perplexity_provider: Optional[PerplexityProvider] = None,
+        fallback_provider: Optional[PerplexityProvider] = None
+    ):
         self.redis_client: Optional[redis_async.Redis] = None
         self.vector_store: Optional[VectorStore] = None
         self.running = False
         self.last_id: Optional[str] = None  # Populated during connect
+        self.perplexity_provider = perplexity_provider or self._configured_provider(
+            config.PERPLEXITY_PROVIDER, default="vorpal"
+        )
+        self.fallback_provider = fallback_provider or self._configured_provider(
+            config.PERPLEXITY_FALLBACK_PROVIDER, default="ngram"
+        )
+
+    @staticmethod
+    def _configured_provider(name, default: str) -> Optional[PerplexityProvider]:
+        """Build a provider from config; an unknown name logs an error and uses the default"""
+        try:
+            return get_perplexity_provider(name)
+        except ValueError as e:
+            # The worker is created at import time, so a typo must not stop the brain
+            logger.error("%s; using '%s'", e, default)
+            return get_perplexity_provider(default)
+
+    def _providers(self) -> List[PerplexityProvider]:
+        return [p for p in (self.perplexity_provider, self.fallback_provider) if p]
 
     async def connect(self):
         """Initialize connections"""
@@ -52,7 +81,9 @@ class MemoryWorker:
         )
 
         # Wait for Vorpal health before starting the worker loop
-        await self.wait_for_vorpal_ready()
+        # (only needed when Vorpal is the primary perplexity provider)
+        if self.perplexity_provider and self.perplexity_provider.name == "vorpal":
+            await self.wait_for_vorpal_ready()
 
         # Load last processed stream ID (or start strategy)
         await self.load_last_id()
@@ -68,6 +99,28 @@ class MemoryWorker:
             self.vector_store.create_index
         )
 
+        # Bootstrap local perplexity providers from the memory corpus
+        await self.train_local_providers()
+
+    async def train_local_providers(self) -> None:
+        """Train providers that learn from stored memories (e.g. n-gram)"""
+        trainable = [p for p in self._providers() if p.name == "ngram"]
+        if not trainable or not self.vector_store:
+            return
+
+        try:
+            messages = await asyncio.get_event_loop().run_in_executor(
+                None,
+                self.vector_store.get_messages,
+                self.PERPLEXITY_TRAINING_LIMIT
+            )
+        except Exception as e:
+            logger.warning("Could not load memory corpus for perplexity training: %s", e)
+            return
+
+        for provider in trainable:
+            await asyncio.get_event_loop().run_in_executor(None, provider.train, messages)
+
     async def close(self):
         """Close connections"""
         self.running = False
@@ -118,9 +171,24 @@ class MemoryWorker:
             attempt += 1
             await asyncio.sleep(2.0)
 
+    async def _score(
+        self,
+        provider: PerplexityProvider,
+        texts: List[str]
+    ) -> List[Optional[float]]:
+        """Score texts with one provider, never raising"""
+        try:
+            return await provider.score(texts)
+        except Exception as e:
+            logger.warning("Perplexity provider '%s' failed: %s", provider.name, e)
+            return [None] * len(texts)
+
     async def calculate_perplexity(self, text: str) -> Optional[float]:
         """
-        Calculate perplexity of text using Vorpal via LLMClient.
+        Calculate perplexity of text with the configured provider.
+
+        The primary provider is retried only when no fallback is configured;
+        otherwise a failure goes straight to the fallback instead of sleeping.
 
         Args:
             text: Input text to evaluate
@@ -128,21 +196,52 @@ class MemoryWorker:
         Returns:
             Perplexity score (lower = more predictable)
         """
-        for attempt in range(1, self.PERPLEXITY_RETRIES + 1):
-            avg_logprob = await llm.get_logprobs(text)
-            
-            if avg_logprob is not None:
-                # Perplexity = exp(-average_log_prob)
-                try:
-                    return math.exp(-avg_logprob)
-                except OverflowError:
-                    return float('inf')
-
-            if attempt < self.PERPLEXITY_RETRIES:
-                await asyncio.sleep(self.PERPLEXITY_RETRY_DELAY)
+        if self.perplexity_provider:
+            for attempt in range(1, self.PERPLEXITY_RETRIES + 1):
+                perplexity = (await self._score(self.perplexity_provider, [text]))[0]
+
+                if perplexity is not None:
+                    return perplexity
+
+                if self.fallback_provider:
+                    break
+
+                if attempt < self.PERPLEXITY_RETRIES:
+                    await asyncio.sleep(self.PERPLEXITY_RETRY_DELAY)
+
+        if self.fallback_provider:
+            return (await self._score(self.fallback_provider, [text]))[0]
 
         return None
 
+    async def calculate_perplexity_batch(self, texts: List[str]) -> List[Optional[float]]:
+        """
+        Calculate perplexity for many texts in one provider call.
+
+        Texts the primary provider could not score are sent to the fallback.
+
+        Args:
+            texts: Input texts to evaluate
+
+        Returns:
+            Perplexity per text (None where scoring failed; callers fall back
+            to calculate_perplexity with retries)
+        """
+        if not texts:
+            return []
+
+        results: List[Optional[float]] = [None] * len(texts)
+        if self.perplexity_provider:
+            results = await self._score(self.perplexity_provider, texts)
+
+        missing = [i for i, ppl in enumerate(results) if ppl is None]
+        if missing and self.fallback_provider:
+            fallback = await self._score(self.fallback_provider, [texts[i] for i in missing])
+            for i, ppl in zip(missing, fallback):
+                results[i] = ppl
+
+        return results
+
     async def calculate_vector_distance(self, text: str) -> float:
         """
         Calculate vector distance (novelty) by comparing with recent memories.
@@ -217,7 +316,12 @@ class MemoryWorker:
 
         return surprise
 
-    async def process_entry(self, entry_id: str, entry_data: dict) -> bool:
+    async def process_entry(
+        self,
+        entry_id: str,
+        entry_data: dict,
+        perplexity: Optional[float] = None
+    ) -> bool:
         """
         Process a single stream entry.
         Calculates surprise score and stores if > threshold.
@@ -225,6 +329,7 @@ class MemoryWorker:
         Args:
             entry_id: Redis stream entry ID
             entry_data: Entry data dict
+            perplexity: Pre-computed perplexity from a batched call (optional)
 
         Returns:
             True if processing completed successfully (stored or skipped),
@@ -236,8 +341,9 @@ class MemoryWorker:
         if not message:
             return True  # Empty message, nothing to do
 
-        # Calculate perplexity
-        perplexity = await self.calculate_perplexity(message)
+        # Calculate perplexity (unless already scored in a batch)
+        if perplexity is None:
+            perplexity = await self.calculate_perplexity(message)
         perplexity_failed = False
         if perplexity is None:
             # CRITICAL: Perplexity calculation failed after all retries
@@ -252,6 +358,10 @@ class MemoryWorker:
             perplexity = self.PERPLEXITY_FALLBACK
             perplexity_failed = True
 
+        # Let local providers learn from every processed message
+        for provider in self._providers():
+            provider.observe(message)
+
         # Calculate vector distance (novelty)
         vector_distance = await self.calculate_vector_distance(message)
 
@@ -297,6 +407,28 @@ class MemoryWorker:
             logger.info("Skipped (surprise < %s)", self.SURPRISE_THRESHOLD)
             return True  # Intentionally skipped, mark as processed
 
+    async def _prescore_entries(self, stream_entries: list) -> Dict[str, float]:
+        """Score all messages in a stream read with one batched perplexity call"""
+        scored = [
+            (entry_id, entry_data.get("message", ""))
+            for entry_id, entry_data in stream_entries
+            if entry_data.get("message")
+        ]
+        if not scored:
+            return {}
+
+        try:
+            perplexities = await self.calculate_perplexity_batch([msg for _, msg in scored])
+        except Exception as e:
+            logger.warning("Batched perplexity failed, scoring per entry: %s", e)
+            return {}
+
+        return {
+            entry_id: ppl
+            for (entry_id, _), ppl in zip(scored, perplexities)
+            if ppl is not None
+        }
+
     async def run(self):
         """Main worker loop - reads from stream and processes entries"""
         self.running = True
@@ -307,7 +439,7 @@ class MemoryWorker:
                 # Read new entries from stream (blocking with timeout)
                 entries = await self.redis_client.xread(
                     {config.REDIS_STREAM_KEY: self.last_id},
-                    count=10,
+                    count=config.PERPLEXITY_BATCH_SIZE,
                     block=1000  # Block for 1 second
                 )
 
@@ -317,9 +449,14 @@ class MemoryWorker:
 
                 # Process each entry
                 for stream_key, stream_entries in entries:
+                    perplexities = await self._prescore_entries(stream_entries)
                     for entry_id, entry_data in stream_entries:
                         try:
-                            success = await self.process_entry(entry_id, entry_data)
+                            success = await self.process_entry(
+                                entry_id,
+                                entry_data,
+                                perplexity=perplexities.get(entry_id)
+                            )
                             if success:
                                 # Only update last_id after successful processing
                                 self.last_id = entry_id
@@ -0,0 +1,138 @@
+"""
+Librarian Job API
+Local HTTP interface to the ingestion pipeline: submit paths, follow
+per-job progress (pages, chunks, embeddings/sec, ETA) and cancel jobs.
+Proxied by the brain under /library/jobs.
+Archive-AI v7.5 - Phase 5.2
+"""
+
+import logging
+import threading
+from pathlib import Path
+from typing import List
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from pipeline import IngestionPipeline
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.txt', '.md'}
+
+
+class JobRequest(BaseModel):
+    """Files to ingest, relative to the library directory ("." for all of them)"""
+    paths: List[str]
+
+
+def resolve_paths(library_dir: Path, paths: List[str]) -> List[Path]:
+    """
+    Resolve requested paths to supported files at the top of the library directory.
+
+    Files are keyed by name in the manifest and the watcher doesn't recurse, so
+    only top-level files (or the library root itself, for all of them) are accepted.
+
+    Args:
+        library_dir: Library root; nothing outside it is ingested
+        paths: File names, or "." for the whole library
+
+    Returns:
+        Files to ingest
+
+    Raises:
+        ValueError: Path outside the library, in a subdirectory, missing, or unsupported
+    """
+    root = library_dir.resolve()
+    files = []
+    for raw in paths:
+        path = (root / raw).resolve()
+        if path != root and root not in path.parents:
+            raise ValueError(f"Path is outside the library: {raw}")
+        if path == root:
+            files.extend(sorted(
+                p for p in root.iterdir()
+                if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS and root in p.resolve().parents
+            ))
+        elif path.parent != root:
+            raise ValueError(f"Subdirectories are not watched; move files to the library root: {raw}")
+        elif path.is_file():
+            if path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+                raise ValueError(f"Unsupported file type: {raw}")
+            files.append(path)
+        elif path.is_dir():
+            raise ValueError(f"Subdirectories are not watched; move files to the library root: {raw}")
+        else:
+            raise ValueError(f"Not found: {raw}")
+    return files
+
+
+def create_app(pipeline: IngestionPipeline, library_dir: Path) -> FastAPI:
+    """
+    Build the job API for a running pipeline.
+
+    Args:
+        pipeline: Started IngestionPipeline
+        library_dir: Directory that submitted paths are resolved against
+    """
+    app = FastAPI(title="Archive-AI Librarian")
+
+    @app.get("/health")
+    def health():
+        return {"status": "healthy", "idle": pipeline.idle()}
+
+    @app.get("/stats")
+    def stats():
+        """Per-stage concurrency, queue depth and throughput"""
+        return pipeline.stats()
+
+    @app.post("/jobs")
+    def submit_job(request: JobRequest):
+        try:
+            files = resolve_paths(Path(library_dir), request.paths)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not files:
+            raise HTTPException(status_code=400, detail="No supported files in the given paths")
+
+        job = pipeline.submit_job(files)
+        logger.info(f"Job {job.id}: {len(files)} files queued")
+        return job.to_dict()
+
+    @app.get("/jobs")
+    def list_jobs(limit: int = 50):
+        return {"jobs": [job.to_dict(files=False) for job in pipeline.list_jobs(limit)]}
+
+    @app.get("/jobs/{job_id}")
+    def get_job(job_id: str):
+        job = pipeline.get_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job.to_dict()
+
+    @app.post("/jobs/{job_id}/cancel")
+    def cancel_job(job_id: str):
+        job = pipeline.cancel(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        logger.info(f"Job {job_id} cancelled")
+        return job.to_dict()
+
+    return app
+
+
+def serve(pipeline: IngestionPipeline, library_dir: Path, host: str, port: int) -> threading.Thread:
+    """Run the API in a background thread (the watcher keeps the main thread)"""
+    import uvicorn
+
+    app = create_app(pipeline, library_dir)
+    thread = threading.Thread(
+        target=uvicorn.run,
+        args=(app,),
+        kwargs={"host": host, "port": port, "log_level": "warning"},
+        name="librarian-api",
+        daemon=True
+    )
+    thread.start()
+    logger.info(f"Librarian API listening on {host}:{port}")
+    return thread
@@ -0,0 +1,781 @@
+"""
+Ingestion Pipeline
+Staged, concurrent library ingestion.
+
+Stages (each with its own concurrency and throughput counters):
+1. Extract: text extraction, OCR and chunking in a process pool
+2. Embed: chunk embeddings, batched across small files
+3. Load: bulk writes of embedded chunks to Redis
+
+Files are queued on submit() and flow through the stages independently,
+so one large scanned PDF occupies a single extract worker instead of
+blocking every other drop. Extract workers stream chunk batches back as
+they go, so a file is embedded and loaded while it is still being read,
+and no stage holds more than a few batches of it; total_chunks, orphan
+cleanup and the manifest entry are written once its last batch is loaded.
+Files whose content is already stored (per the storage manifest) are
+skipped before extraction, and only chunks whose text changed are embedded.
+Only one task per filename runs at a time: a file submitted again while it
+is in flight (e.g. by the startup scan and a watcher event) waits, and
+further submissions replace the waiting one.
+
+Every submission belongs to a job (one per watched file, or one per API
+request) with live progress: pages, chunks, embeddings/sec and ETA.
+Archive-AI v7.5 - Phase 5.1
+"""
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from processor import DocumentProcessor
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress updates sent back from an extract worker
+PROGRESS_INTERVAL = 0.5
+
+
+class IngestionCancelled(Exception):
+    """Raised inside an extract worker when its job is cancelled"""
+
+
+def _extract(
+    processor: DocumentProcessor,
+    file_path: str,
+    key: str,
+    progress,
+    cancelled,
+    batches,
+    batch_size: int
+) -> int:
+    """
+    Extract and chunk one document (runs in a worker process).
+
+    Chunks are sent to the shared `batches` queue as (key, chunks) in
+    batches of `batch_size`, then (key, None) once the document is done.
+    Progress is published to the shared `progress` dict under `key`, and the
+    shared `cancelled` dict is checked at each update and before each batch.
+
+    Returns:
+        Number of chunks sent
+    """
+    state: Dict[str, Any] = {}
+    last = [0.0]
+
+    def report(**counters):
+        state.update(counters)
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL:
+            return
+        last[0] = now
+        if key in cancelled:
+            raise IngestionCancelled()
+        progress[key] = dict(state)
+
+    batch: List[Dict[str, Any]] = []
+    count = 0
+    for chunk in processor.iter_document(file_path, progress=report):
+        batch.append(chunk)
+        count += 1
+        report(chunks=count)
+        if len(batch) >= batch_size:
+            if key in cancelled:
+                raise IngestionCancelled()
+            batches.put((key, batch))  # Blocks while the pipeline is behind
+            batch = []
+    if batch:
+        batches.put((key, batch))
+    batches.put((key, None))
+    progress[key] = dict(state, chunks=count)
+    return count
+
+
+class FileTask:
+    """One file moving through the pipeline"""
+
+    def __init__(self, path: Path, delete: bool = False, job: Optional["IngestionJob"] = None):
+        self.key = uuid.uuid4().hex
+        self.path = path
+        self.delete = delete
+        self.job = job
+        self.stage = "queued"
+        self.signature: Optional[Dict[str, Any]] = None
+        self.chunk_ids: List[str] = []  # Loaded so far (batches may load out of order)
+        self.batches_queued = 0
+        self.batches_loaded = 0
+        self.extracted = False  # Every batch has been queued
+        self.lock = threading.RLock()  # Held while loading, finalizing or discarding
+        self.pages_done = 0
+        self.pages_total = 0
+        self.chunks_done = 0
+        self.embedded = 0
+        self.cancelled = False
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def fraction(self) -> float:
+        """Rough completion: extraction is the first half, embedding + load the second"""
+        if self.done.is_set():
+            return 1.0
+        if self.stage in ("queued", "extracting"):
+            return 0.5 * self.pages_done / self.pages_total if self.pages_total else 0.0
+        if self.stage == "embedding":
+            return 0.5
+        return 0.9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "stage": self.stage,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "chunks": self.chunks_done,
+            "embedded": self.embedded,
+            "error": self.error,
+        }
+
+
+class IngestionJob:
+    """A set of files submitted together, with aggregate progress"""
+
+    def __init__(self, source: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.tasks: List[FileTask] = []
+        self.created_at = time.time()
+        self.cancelled = False
+
+    @property
+    def finished(self) -> bool:
+        return all(task.done.is_set() for task in self.tasks)
+
+    def status(self) -> str:
+        if not self.finished:
+            return "cancelling" if self.cancelled else "running"
+        if self.cancelled:
+            return "cancelled"
+        stages = {task.stage for task in self.tasks}
+        if "failed" in stages:
+            return "failed" if stages == {"failed"} else "partial"
+        return "done"
+
+    def to_dict(self, files: bool = True) -> Dict[str, Any]:
+        finished = self.finished
+        end = max((t.finished_at for t in self.tasks), default=self.created_at) if finished else time.time()
+        elapsed = max(end - self.created_at, 1e-9)
+        embedded = sum(task.embedded for task in self.tasks)
+        fraction = sum(task.fraction() for task in self.tasks) / len(self.tasks) if self.tasks else 1.0
+        eta = None
+        if not finished and fraction > 0:
+            eta = round(elapsed * (1 - fraction) / fraction, 1)
+
+        result = {
+            "id": self.id,
+            "source": self.source,
+            "status": self.status(),
+            "created_at": self.created_at,
+            "elapsed_seconds": round(elapsed, 2),
+            "files": len(self.tasks),
+            "files_finished": sum(task.done.is_set() for task in self.tasks),
+            "pages_done": sum(task.pages_done for task in self.tasks),
+            "pages_total": sum(task.pages_total for task in self.tasks),
+            "chunks": sum(task.chunks_done for task in self.tasks),
+            "embedded": embedded,
+            "embeddings_per_second": round(embedded / elapsed, 2),
+            "progress": round(fraction, 3),
+            "eta_seconds": eta,
+        }
+        if files:
+            result["file_tasks"] = [task.to_dict() for task in self.tasks]
+        return result
+
+
+class StageStats:
+    """Concurrency and throughput counters for one stage"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.active = 0
+        self.files = 0
+        self.chunks = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def track(self, files: int = 1):
+        with self.lock:
+            self.active += 1
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self.lock:
+                self.failed += files
+            raise
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.busy_seconds += time.perf_counter() - started
+
+    def record(self, files: int, chunks: int) -> None:
+        with self.lock:
+            self.files += files
+            self.chunks += chunks
+
+    def to_dict(self, queued: int) -> Dict[str, Any]:
+        uptime = max(time.time() - self.started_at, 1e-9)
+        busy = max(self.busy_seconds, 1e-9)
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "queued": queued,
+            "files": self.files,
+            "chunks": self.chunks,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 2),
+            "chunks_per_busy_second": round(self.chunks / busy, 2) if self.busy_seconds else 0.0,
+            "chunks_per_second": round(self.chunks / uptime, 2),
+        }
+
+
+class IngestionPipeline:
+    """
+    Queue-fed extract → embed → load pipeline.
+
+    Usage:
+        pipeline = IngestionPipeline(processor, storage)
+        pipeline.start()
+        job = pipeline.submit_job([path])
+    """
+
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        storage,
+        extract_workers: int = 2,
+        embed_workers: int = 1,
+        load_workers: int = 1,
+        embed_batch_chunks: int = 256,
+        on_complete: Optional[Callable[[FileTask], None]] = None,
+        max_jobs: int = 200
+    ):
+        """
+        Initialize pipeline.
+
+        Args:
+            processor: DocumentProcessor used by the extract workers
+            storage: LibraryStorage (manifest checks, embed_chunks / load_batch / finalize_file)
+            extract_workers: Processes extracting, OCRing and chunking files
+            embed_workers: Threads embedding chunks
+            load_workers: Threads writing to Redis
+            embed_batch_chunks: Chunks per batch streamed from an extract worker; small
+                files are grouped until this many chunks per embed call
+            on_complete: Called with each finished FileTask (done, skipped, removed, cancelled or failed)
+            max_jobs: Finished jobs kept for status queries
+        """
+        self.processor = processor
+        self.storage = storage
+        self.embed_batch_chunks = max(1, embed_batch_chunks)
+        self.on_complete = on_complete
+        self.max_jobs = max_jobs
+
+        self.files: "queue.Queue[Optional[FileTask]]" = queue.Queue()
+        # Items are (task, chunks) batches, or (task, None) once a file's batches are all queued
+        self.embed_queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max(4, extract_workers * 2))
+        self.load_queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max(4, load_workers * 2))
+        self.stages = {
+            "extract": StageStats("extract", extract_workers),
+            "embed": StageStats("embed", embed_workers),
+            "load": StageStats("load", load_workers),
+        }
+        self.extract_slots = threading.Semaphore(extract_workers)
+        self.context = None
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.manager = None
+        self.progress = None  # Shared with extract workers: task key -> counters
+        self.cancelled = None  # Shared with extract workers: cancelled task keys
+        self.batches = None  # Shared with extract workers: (task key, chunks) batches
+        self.extracting: Dict[str, FileTask] = {}  # Task key -> task, from dispatch until finished
+        self.running: Dict[str, FileTask] = {}  # Filename -> its task, from dispatch until finished
+        self.waiting: Dict[str, FileTask] = {}  # Filename -> latest task submitted while it was running
+        self.stopping = False
+        self.threads: List[threading.Thread] = []
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self.outcomes = {"done": 0, "skipped": 0, "removed": 0, "cancelled": 0, "failed": 0}
+        self.embedders_running = 0
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the worker pool and stage threads"""
+        if self.pool is not None:
+            return
+        # spawn: forking a process that holds torch / watchdog threads can deadlock
+        self.context = multiprocessing.get_context("spawn")
+        self.manager = self.context.Manager()
+        self.progress = self.manager.dict()
+        self.cancelled = self.manager.dict()
+        self.batches = self.manager.Queue(maxsize=max(4, self.stages["extract"].workers * 2))
+        self.pool = ProcessPoolExecutor(max_workers=self.stages["extract"].workers, mp_context=self.context)
+        self.embedders_running = self.stages["embed"].workers
+        self.stopping = False
+        workers = [("extract", self._dispatch_loop, 1), ("collect", self._collect_loop, 1)]
+        workers.append(("embed", self._embed_loop, self.stages["embed"].workers))
+        workers.append(("load", self._load_loop, self.stages["load"].workers))
+        for name, target, count in workers:
+            for i in range(count):
+                thread = threading.Thread(target=target, name=f"ingest-{name}-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        logger.info(
+            "Ingestion pipeline started: "
+            + ", ".join(f"{s.name}={s.workers}" for s in self.stages.values())
+        )
+
+    def stop(self) -> None:
+        """Finish queued work and stop the stages"""
+        if self.pool is None:
+            return
+        self.files.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.pool.shutdown()
+        self.manager.shutdown()
+        self.pool = None
+        self.manager = None
+        self.progress = None
+        self.cancelled = None
+        self.batches = None
+        self.threads = []
+
+    def submit(self, path, job: Optional[IngestionJob] = None) -> FileTask:
+        """Queue a file for ingestion (non-blocking); a one-file job is created if none is given"""
+        job = job or self._new_job("watch")
+        task = FileTask(Path(path), job=job)
+        job.tasks.append(task)
+        self.files.put(task)
+        return task
+
+    def submit_job(self, paths: List, source: str = "api") -> IngestionJob:
+        """Queue several files as one job"""
+        job = self._new_job(source)
+        for path in paths:
+            self.submit(path, job)
+        return job
+
+    def remove(self, path) -> FileTask:
+        """Queue removal of a deleted file's chunks (ordered with submits)"""
+        job = self._new_job("watch")
+        task = FileTask(Path(path), delete=True, job=job)
+        job.tasks.append(task)
+        self.files.put(task)
+        return task
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job:
+            self._refresh(job)
+        return job
+
+    def list_jobs(self, limit: int = 50) -> List[IngestionJob]:
+        """Most recent jobs first"""
+        with self.lock:
+            jobs = list(self.jobs.values())[::-1][:limit]
+        for job in jobs:
+            self._refresh(job)
+        return jobs
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """
+        Cancel a job's unfinished files.
+
+        Queued files are dropped, running extractions stop at their next
+        progress update, and chunks already loaded for an unfinished file are
+        deleted again.
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+        job.cancelled = True
+        for task in job.tasks:
+            if not task.done.is_set():
+                task.cancelled = True
+                if self.cancelled is not None:
+                    self.cancelled[task.key] = True
+        return job
+
+    def idle(self) -> bool:
+        return (
+            self.files.empty() and self.embed_queue.empty() and self.load_queue.empty()
+            and not self.extracting and not self.waiting and not any(stage.active for stage in self.stages.values())
+        )
+
+    def _new_job(self, source: str) -> IngestionJob:
+        job = IngestionJob(source)
+        with self.lock:
+            # Forget the oldest finished jobs
+            excess = len(self.jobs) + 1 - self.max_jobs
+            if excess > 0:
+                for old_id in [i for i, j in self.jobs.items() if j.finished][:excess]:
+                    del self.jobs[old_id]
+            self.jobs[job.id] = job
+        return job
+
+    def _refresh(self, job: IngestionJob) -> None:
+        """Pull live extraction counters from the worker processes"""
+        for task in job.tasks:
+            if task.stage == "extracting":
+                self._apply_progress(task)
+
+    def _apply_progress(self, task: FileTask) -> None:
+        try:
+            counters = self.progress.get(task.key) if self.progress is not None else None
+        except Exception:
+            return  # Manager shutting down
+        if counters:
+            task.pages_done = counters.get("pages_done", task.pages_done)
+            task.pages_total = counters.get("pages_total", task.pages_total)
+            task.chunks_done = counters.get("chunks", task.chunks_done)
+
+    def _finish(self, task: FileTask, error: Optional[str] = None, outcome: Optional[str] = None) -> None:
+        task.error = error
+        task.stage = "failed" if error else outcome or ("removed" if task.delete else "done")
+        task.finished_at = time.time()
+        with self.lock:
+            self.outcomes[task.stage] += 1
+        if error:
+            logger.error(f"Ingestion failed for {task.path.name}: {error}")
+        try:
+            if self.progress is not None:
+                self.progress.pop(task.key, None)
+                self.cancelled.pop(task.key, None)
+        except Exception:
+            pass  # Manager shutting down
+        with self.lock:
+            self.extracting.pop(task.key, None)
+            waiting = self._release(task)
+        task.done.set()
+        if self.on_complete:
+            try:
+                self.on_complete(task)
+            except Exception as e:
+                logger.error(f"Ingestion callback failed for {task.path.name}: {e}")
+        if waiting is not None:
+            self._finish(waiting, outcome="cancelled")  # Pipeline stopping
+
+    def _claim(self, task: FileTask) -> bool:
+        """Mark the task's file in flight; False if another task has it (this one then waits)"""
+        name = task.path.name  # Storage keys files by name
+        with self.lock:
+            running = self.running.get(name)
+            if running is None:
+                self.running[name] = task
+                return True
+            superseded = self.waiting.get(name)
+            self.waiting[name] = task
+        logger.info(f"Already ingesting {name}; queued to run again after it")
+        if superseded is not None:
+            self._finish(superseded, outcome="skipped")
+        return False
+
+    def _release(self, task: FileTask) -> Optional[FileTask]:
+        """
+        Free the task's file (caller holds self.lock) and re-queue the task
+        waiting on it; returns that task instead if the pipeline is stopping.
+        """
+        name = task.path.name
+        if self.running.get(name) is not task:
+            return None
+        del self.running[name]
+        waiting = self.waiting.pop(name, None)
+        if waiting is not None and not self.stopping:
+            self.files.put(waiting)
+            return None
+        return waiting
+
+    def _abort(self, task: FileTask, error: Optional[str] = None, outcome: Optional[str] = None) -> None:
+        """Finish a file that won't be finalized, deleting the chunks it already loaded"""
+        with task.lock:
+            if task.done.is_set():
+                return
+            if task.chunk_ids:
+                try:
+                    self.storage.discard_chunks(task.path.name, task.chunk_ids)
+                except Exception as e:
+                    logger.error(f"Could not discard partial chunks of {task.path.name}: {e}")
+            self._finish(task, error, outcome)
+
+    # Stage 1: extraction in worker processes
+    def _dispatch_loop(self) -> None:
+        stage = self.stages["extract"]
+        while True:
+            task = self.files.get()
+            if task is None:
+                break
+            if task.cancelled:
+                self._finish(task, outcome="cancelled")
+                continue
+            if not self._claim(task):
+                continue
+            if task.delete:
+                try:
+                    self.storage.remove_file(task.path.name)
+                    self._finish(task)
+                except Exception as e:
+                    self._finish(task, f"Remove failed: {e}")
+                continue
+            try:
+                task.signature = self.storage.file_signature(task.path)
+                if self.storage.is_current(task.path, task.signature):
+                    logger.info(f"Unchanged, skipping: {task.path.name}")
+                    self._finish(task, outcome="skipped")
+                    continue
+            except Exception as e:
+                self._finish(task, f"Manifest check failed: {e}")
+                continue
+            self.extract_slots.acquire()
+            task.stage = "extracting"
+            with self.lock:
+                self.extracting[task.key] = task
+            with stage.lock:
+                stage.active += 1
+            started = time.perf_counter()
+            try:
+                future = self._submit_extract(task)
+            except Exception as e:
+                with stage.lock:
+                    stage.active -= 1
+                    stage.failed += 1
+                self._finish(task, f"Extraction failed to start: {e}")
+                self.extract_slots.release()
+                continue
+            future.add_done_callback(lambda f, t=task, s=started: self._extracted(t, f, s))
+
+        # Submissions still waiting on a running file are dropped; a restart's scan picks them up
+        with self.lock:
+            self.stopping = True
+            dropped = list(self.waiting.values())
+            self.waiting.clear()
+        while True:
+            try:
+                dropped.append(self.files.get_nowait())
+            except queue.Empty:
+                break
+        for task in dropped:
+            if task is not None:
+                self._finish(task, outcome="cancelled")
+
+        # Drain: wait for running extractions, then stop downstream stages behind their batches
+        for _ in range(stage.workers):
+            self.extract_slots.acquire()
+        self.batches.put(None)
+
+    def _submit_extract(self, task: FileTask):
+        """
+        Submit a file to the extract pool.
+
+        A worker killed mid-file (e.g. OOM while OCRing a huge scan) breaks the
+        whole executor: its in-flight files fail, and the pool is replaced so
+        later files still run.
+        """
+        args = (
+            _extract, self.processor, str(task.path), task.key,
+            self.progress, self.cancelled, self.batches, self.embed_batch_chunks
+        )
+        try:
+            return self.pool.submit(*args)
+        except BrokenProcessPool:
+            logger.warning("Extract pool broken (a worker died); starting a new one")
+            broken, self.pool = self.pool, ProcessPoolExecutor(
+                max_workers=self.stages["extract"].workers, mp_context=self.context
+            )
+            broken.shutdown(wait=False)
+            return self.pool.submit(*args)
+
+    def _extracted(self, task: FileTask, future, started: float) -> None:
+        stage = self.stages["extract"]
+        error = None
+        count = 0
+        try:
+            count = future.result()
+        except IngestionCancelled:
+            task.cancelled = True
+        except Exception as e:
+            error = str(e)
+        self._apply_progress(task)
+        with stage.lock:
+            stage.active -= 1
+            stage.busy_seconds += time.perf_counter() - started
+
+        if error:
+            with stage.lock:
+                stage.failed += 1
+            self._abort(task, error)
+        elif task.cancelled:
+            self._abort(task, outcome="cancelled")
+        else:
+            task.chunks_done = count
+            stage.record(1, count)
+        # Released last, so stop() can't close the embed stage ahead of this task
+        self.extract_slots.release()
+
+    def _collect_loop(self) -> None:
+        """Hand batches streamed by the extract workers to the embed stage"""
+        while True:
+            item = self.batches.get()
+            if item is None:
+                break
+            key, chunks = item
+            with self.lock:
+                task = self.extracting.get(key)
+            if task is None or task.done.is_set():
+                continue  # Failed or cancelled; later batches are dropped
+            with task.lock:
+                if chunks is None:
+                    task.extracted = True
+                    task.stage = "embedding"
+                else:
+                    task.batches_queued += 1
+            self.embed_queue.put((task, chunks))
+
+        for _ in range(self.stages["embed"].workers):
+            self.embed_queue.put(None)
+
+    # Stage 2: embeddings, grouping batches (small files) into one call
+    def _embed_loop(self) -> None:
+        stage = self.stages["embed"]
+        stopping = False
+        while not stopping:
+            item = self.embed_queue.get()
+            if item is None:
+                break
+            batch = []
+            total = 0
+            while True:
+                task, chunks = item
+                if task.done.is_set():
+                    pass
+                elif task.cancelled:
+                    self._abort(task, outcome="cancelled")
+                elif chunks is None:
+                    stage.record(1, 0)
+                    self.load_queue.put((task, None, None))
+                else:
+                    try:
+                        pending = self.storage.pending_chunks(chunks, task.path.name)
+                        batch.append((task, chunks, pending))
+                        total += len(pending)
+                    except Exception as e:
+                        self._abort(task, f"Manifest check failed: {e}")
+                if total >= self.embed_batch_chunks:
+                    break
+                try:
+                    item = self.embed_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+            if not batch:
+                continue
+
+            pending = [chunk for _, _, chunks in batch for chunk in chunks]
+            try:
+                with stage.track(len({id(task) for task, _, _ in batch})):
+                    embeddings = self.storage.embed_chunks(pending) if pending else []
+            except Exception as e:
+                for task, _, _ in batch:
+                    self._abort(task, f"Embedding failed: {e}")
+                continue
+            stage.record(0, len(pending))
+
+            offset = 0
+            for task, chunks, pending in batch:
+                embedded = {
+                    self.storage.chunk_id(chunk): embedding
+                    for chunk, embedding in zip(pending, embeddings[offset:offset + len(pending)])
+                }
+                offset += len(pending)
+                with task.lock:
+                    task.embedded += len(pending)
+                self.load_queue.put((task, chunks, embedded))
+
+        with self.lock:
+            self.embedders_running -= 1
+            last = self.embedders_running == 0
+        if last:  # Other embedders may still be handing batches to the load stage
+            for _ in range(self.stages["load"].workers):
+                self.load_queue.put(None)
+
+    # Stage 3: Redis loads
+    def _load_loop(self) -> None:
+        stage = self.stages["load"]
+        while True:
+            item = self.load_queue.get()
+            if item is None:
+                break
+            task, chunks, embeddings = item
+            with task.lock:
+                if task.done.is_set():
+                    continue
+                if task.cancelled:
+                    self._abort(task, outcome="cancelled")
+                    continue
+                if chunks is not None:
+                    try:
+                        with stage.track():
+                            task.chunk_ids.extend(self.storage.load_batch(chunks, embeddings))
+                    except Exception as e:
+                        self._abort(task, f"Load failed: {e}")
+                        continue
+                    task.batches_loaded += 1
+                    stage.record(0, len(chunks))
+                if task.extracted and task.batches_loaded == task.batches_queued:
+                    self._finalize(task)
+
+    def _finalize(self, task: FileTask) -> None:
+        """Every batch of the file is loaded: set totals, drop orphans, write the manifest"""
+        stage = self.stages["load"]
+        task.stage = "loading"
+        if not task.path.exists():
+            logger.info(f"Deleted during ingestion, discarding: {task.path.name}")
+            self._abort(task, outcome="skipped")
+            return
+        try:
+            with stage.track():
+                self.storage.finalize_file(task.path, task.chunk_ids, task.signature)
+        except Exception as e:
+            self._abort(task, f"Load failed: {e}")
+            return
+        stage.record(1, 0)
+        self._finish(task)
+
+    def stats(self) -> Dict[str, Any]:
+        queued = {
+            "extract": self.files.qsize(),
+            "embed": self.embed_queue.qsize(),
+            "load": self.load_queue.qsize(),
+        }
+        with self.lock:
+            outcomes = dict(self.outcomes)
+            running = sum(not job.finished for job in self.jobs.values())
+        return {
+            "files": outcomes,
+            "jobs_running": running,
+            "stages": {name: stage.to_dict(queued[name]) for name, stage in self.stages.items()},
+        }
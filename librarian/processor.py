@@ -6,46 +6,113 @@ Archive-AI v7.5 - Phase 5.1
 
 import os
 import re
+import codecs
+import hashlib
+import io
 import logging
+import multiprocessing
+from collections import deque
+from itertools import chain, groupby, takewhile
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
 from datetime import datetime
 
 import PyPDF2
 import pytesseract
-from pdf2image import convert_from_path
-import tiktoken
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from token_counter import token_counter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Token counting
-ENCODING = tiktoken.get_encoding("cl100k_base")  # GPT-4 tokenizer
+# Pages with less extracted text than this are treated as scanned and OCR'd
+MIN_PAGE_CHARS = 10
+
+# Text files are read in blocks of this many bytes
+BLOCK_BYTES = 1 << 20
+
+# A run of text with no sentence break is cut at whitespace past this length,
+# so unpunctuated input can't grow the chunker's buffer without bound
+MAX_SENTENCE_CHARS = 100_000
+
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+# Structure mode: paragraphs, lists and code blocks longer than this are
+# handed to the chunker in pieces
+MAX_UNIT_CHARS = 100_000
+
+HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+LIST_ITEM = re.compile(r'^\s*([-*+]|\d+[.)])\s+')
+FENCE = re.compile(r'^\s*(```|~~~)')
+SECTION_SEPARATOR = '\n\n'
+
+CHUNK_MODES = ('sentence', 'structure')
+
+
+def _ocr_page(file_path: str, page_num: int, dpi: int) -> str:
+    """
+    Rasterize and OCR a single PDF page (runs in an OCR worker process).
+
+    Only this page is rendered, so memory per worker is one page image
+    regardless of document length.
+    """
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_num, last_page=page_num)
+    return pytesseract.image_to_string(images[0]) if images else ""
 
 
 class DocumentProcessor:
     """Processes documents for library ingestion"""
 
-    def __init__(self, chunk_size: int = 250, chunk_overlap: int = 50):
+    def __init__(
+        self,
+        chunk_size: int = 250,
+        chunk_overlap: int = 50,
+        ocr_workers: int = 2,
+        ocr_dpi: int = 200,
+        chunk_mode: str = 'sentence'
+    ):
         """
         Initialize document processor.
 
         Args:
             chunk_size: Target size for text chunks (in tokens)
             chunk_overlap: Number of overlapping tokens between chunks
+            ocr_workers: Processes OCRing pages of one PDF in parallel (1 = in-process)
+            ocr_dpi: Rasterization DPI for OCR
+            chunk_mode: 'sentence' (sliding window over sentences) or 'structure'
+                (split at headings, pages, lists and code blocks; small adjacent
+                sections are merged up to chunk_size)
         """
+        if chunk_mode not in CHUNK_MODES:
+            raise ValueError(f"Unknown chunk mode: {chunk_mode} (expected one of {', '.join(CHUNK_MODES)})")
+
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-
-        logger.info(f"DocumentProcessor initialized: chunk_size={chunk_size}, overlap={chunk_overlap}")
-
-    def process_document(self, file_path: str) -> List[Dict[str, Any]]:
+        self.ocr_workers = max(1, ocr_workers)
+        self.ocr_dpi = ocr_dpi
+        self.chunk_mode = chunk_mode
+
+        logger.info(
+            f"DocumentProcessor initialized: chunk_size={chunk_size}, overlap={chunk_overlap}, "
+            f"ocr_workers={self.ocr_workers}, chunk_mode={chunk_mode}"
+        )
+
+    def process_document(
+        self,
+        file_path: str,
+        progress: Optional[Callable[..., None]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Process a document and return chunks with metadata.
 
         Args:
             file_path: Path to document file
+            progress: Optional callback receiving pages_done / pages_total / chunks
+                keyword counters as they advance; raising from it aborts processing
 
         Returns:
             List of chunks with metadata
@@ -59,7 +126,10 @@ class DocumentProcessor:
                     'filename': 'document.pdf',
                     'file_type': 'pdf',
                     'timestamp': 1234567890,
-                    'total_chunks': 5
+                    'total_chunks': 5,
+                    'section': 'Setup > Install',  # Heading path ('' in sentence mode)
+                    'page': 3,  # PDF page, 1-based (0 for text files and sentence mode)
+                    'occurrence': 0  # Earlier chunks in the file with identical text
                 },
                 ...
             ]
@@ -67,133 +137,237 @@ class DocumentProcessor:
         try:
             file_path = Path(file_path)
 
-            if not file_path.exists():
-                raise FileNotFoundError(f"File not found: {file_path}")
-
-            # Extract text based on file type
-            file_type = file_path.suffix.lower()
-
-            if file_type == '.pdf':
-                text = self._extract_from_pdf(file_path)
-            elif file_type in ['.txt', '.md']:
-                text = self._extract_from_text(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {file_type}")
-
-            # Chunk the text
-            chunks = self._chunk_text(text)
-
-            # Add metadata to each chunk
-            timestamp = int(datetime.now().timestamp())
-            total_chunks = len(chunks)
-
-            result = []
-            for idx, chunk_text in enumerate(chunks):
-                chunk_tokens = len(ENCODING.encode(chunk_text))
+            # total_chunks needs the full count, so this one holds every chunk
+            chunks = []
+            for chunk in self.iter_document(file_path, progress):
+                chunks.append(chunk)
+                if progress:
+                    progress(chunks=len(chunks))
 
-                result.append({
-                    'text': chunk_text,
-                    'tokens': chunk_tokens,
-                    'chunk_index': idx,
-                    'filename': file_path.name,
-                    'file_type': file_type.lstrip('.'),
-                    'timestamp': timestamp,
-                    'total_chunks': total_chunks
-                })
+            for chunk in chunks:
+                chunk['total_chunks'] = len(chunks)
 
-            logger.info(f"Processed {file_path.name}: {len(text)} chars → {total_chunks} chunks")
-            return result
+            logger.info(f"Processed {file_path.name}: {len(chunks)} chunks")
+            return chunks
 
         except Exception as e:
             logger.error(f"Error processing {file_path}: {str(e)}")
             raise
 
-    def _extract_from_pdf(self, file_path: Path) -> str:
+    def iter_document(
+        self,
+        file_path: str,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Extract text from PDF using PyPDF2, fallback to OCR if needed.
+        Stream chunks with metadata, as process_document() returns them
+        but without 'total_chunks' (unknown until the document ends).
 
         Args:
-            file_path: Path to PDF file
+            file_path: Path to document file
+            progress: Optional callback receiving pages_done / pages_total for PDFs
 
         Returns:
-            Extracted text
+            Iterator of chunk dicts
         """
-        try:
-            # Try text extraction first (faster)
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                text = ""
-
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    text += page_text + "\n"
+        file_path = Path(file_path)
+
+        if not file_path.exists():
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        file_type = file_path.suffix.lower()
+        timestamp = int(datetime.now().timestamp())
+        seen: Dict[bytes, int] = {}  # Digest of each chunk text -> times seen (repeated boilerplate)
+
+        for idx, (chunk_text, chunk_tokens, location) in enumerate(self.iter_chunks(file_path, progress)):
+            digest = hashlib.blake2b(chunk_text.encode('utf-8'), digest_size=16).digest()
+            occurrence = seen.get(digest, 0)
+            seen[digest] = occurrence + 1
+            yield {
+                'text': chunk_text,
+                'tokens': chunk_tokens,
+                'chunk_index': idx,
+                'filename': file_path.name,
+                'file_type': file_type.lstrip('.'),
+                'timestamp': timestamp,
+                'section': location['section'],
+                'page': location['page'],
+                'occurrence': occurrence
+            }
+
+    def iter_chunks(
+        self,
+        file_path: Path,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+        """
+        Stream (chunk text, token count, location) triples from a document.
 
-                # If we got reasonable text, use it
-                if len(text.strip()) > 100:  # Arbitrary threshold
-                    logger.info(f"PDF text extraction successful: {file_path.name}")
-                    return self._clean_text(text)
+        Extraction, cleaning and chunking are generators end to end: memory
+        holds one page or text block plus the current chunk window, never
+        the whole document.
 
-            # If text extraction failed, use OCR
-            logger.warning(f"PDF text extraction yielded little text, trying OCR: {file_path.name}")
-            return self._ocr_pdf(file_path)
+        Args:
+            file_path: Path to document file
+            progress: Optional callback receiving pages_done / pages_total for PDFs
 
-        except Exception as e:
-            logger.error(f"PDF extraction failed, trying OCR: {str(e)}")
-            return self._ocr_pdf(file_path)
+        Returns:
+            Iterator of (chunk text, token count, {'section': ..., 'page': ...})
+        """
+        file_path = Path(file_path)
+        file_type = file_path.suffix.lower()
 
-    def _ocr_pdf(self, file_path: Path) -> str:
+        if self.chunk_mode == 'structure':
+            if file_type == '.pdf':
+                pages = enumerate(self._iter_pdf_pages(file_path, progress), start=1)
+                lines = ((page_num, line) for page_num, page in pages for line in page.splitlines())
+            elif file_type in ['.txt', '.md']:
+                lines = ((0, line) for line in self._iter_lines(self._iter_text_blocks(file_path)))
+            else:
+                raise ValueError(f"Unsupported file type: {file_type}")
+            return self._iter_structured_chunks(self._iter_units(lines))
+
+        if file_type == '.pdf':
+            blocks = (page + "\n" for page in self._iter_pdf_pages(file_path, progress))
+        elif file_type in ['.txt', '.md']:
+            blocks = self._iter_text_blocks(file_path)
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
+
+        return (
+            (text, tokens, {'section': '', 'page': 0})
+            for text, tokens in self._iter_chunks(self._iter_sentences(blocks))
+        )
+
+    def _iter_pdf_pages(
+        self,
+        file_path: Path,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Iterator[str]:
         """
-        OCR a PDF using Tesseract.
+        Yield the text of each PDF page, OCRing only pages without a text layer.
+
+        Born-digital pages use the PDF text layer; pages where that comes back
+        (nearly) empty are rasterized one at a time and OCR'd, in a process
+        pool when ocr_workers > 1. At most 2 × ocr_workers pages are in
+        flight, and pages are yielded in order.
 
         Args:
             file_path: Path to PDF file
+            progress: Optional callback receiving pages_done / pages_total
 
         Returns:
-            OCR'd text
+            Iterator of page texts
         """
+        progress = progress or (lambda **counters: None)
+        window = self.ocr_workers * 2
+        pages_done = 0
+        in_flight: "deque[Any]" = deque()  # Page text, or Future for an OCR'd page
+        scanned = 0
+
+        with ExitStack() as stack:
+            pool = None
+            for page_num, text in enumerate(self._iter_text_layer(file_path, progress), start=1):
+                if len(text.strip()) >= MIN_PAGE_CHARS:
+                    in_flight.append(text)
+                else:
+                    scanned += 1
+                    if self.ocr_workers <= 1:
+                        in_flight.append(self._ocr(file_path, page_num))
+                    else:
+                        if pool is None:
+                            pool = stack.enter_context(ProcessPoolExecutor(
+                                max_workers=self.ocr_workers,
+                                mp_context=multiprocessing.get_context("spawn")
+                            ))
+                        in_flight.append(pool.submit(_ocr_page, str(file_path), page_num, self.ocr_dpi))
+
+                while in_flight and (len(in_flight) > window or not isinstance(in_flight[0], Future)):
+                    yield self._resolve(file_path, in_flight.popleft())
+                    pages_done += 1
+                    progress(pages_done=pages_done)
+
+            while in_flight:
+                yield self._resolve(file_path, in_flight.popleft())
+                pages_done += 1
+                progress(pages_done=pages_done)
+
+        if scanned:
+            logger.info(f"OCR successful: {file_path.name} ({scanned} pages)")
+        else:
+            logger.info(f"PDF text extraction successful: {file_path.name}")
+
+    def _iter_text_layer(self, file_path: Path, progress: Callable[..., None]) -> Iterator[str]:
+        """Yield the embedded text of each PDF page ("" where there is none)"""
+        with open(file_path, 'rb') as f:
+            try:
+                pages = PyPDF2.PdfReader(f).pages
+            except Exception as e:
+                pages = None
+                logger.error(f"PDF extraction failed, trying OCR: {str(e)}")
+
+            if pages is not None:
+                progress(pages_total=len(pages))
+                for page in pages:
+                    try:
+                        yield page.extract_text() or ""
+                    except Exception as e:
+                        logger.debug(f"Text extraction failed on a page of {file_path.name}: {e}")
+                        yield ""
+                return
+
+        # Unreadable text layer: OCR every page
+        page_count = pdfinfo_from_path(str(file_path))["Pages"]
+        progress(pages_total=page_count)
+        yield from [""] * page_count
+
+    def _ocr(self, file_path: Path, page_num: int) -> str:
         try:
-            # Convert PDF to images
-            images = convert_from_path(str(file_path), dpi=200)
-
-            text = ""
-            for page_num, image in enumerate(images):
-                # OCR each page
-                page_text = pytesseract.image_to_string(image)
-                text += page_text + "\n"
-
-                logger.debug(f"OCR'd page {page_num + 1}/{len(images)}")
-
-            logger.info(f"OCR successful: {file_path.name} ({len(images)} pages)")
-            return self._clean_text(text)
-
+            return _ocr_page(str(file_path), page_num, self.ocr_dpi)
         except Exception as e:
             logger.error(f"OCR failed for {file_path.name}: {str(e)}")
             raise
 
-    def _extract_from_text(self, file_path: Path) -> str:
+    def _resolve(self, file_path: Path, page: Any) -> str:
+        if isinstance(page, Future):
+            try:
+                return page.result()
+            except Exception as e:
+                logger.error(f"OCR failed for {file_path.name}: {str(e)}")
+                raise
+        return page
+
+    def _iter_text_blocks(self, file_path: Path) -> Iterator[str]:
         """
-        Extract text from TXT or MD file.
+        Yield a TXT or MD file in blocks decoded from BLOCK_BYTES bytes.
+
+        Decoded as UTF-8 as it is read; from the first block that isn't valid
+        UTF-8 on, the rest of the file is read as latin-1.
 
         Args:
             file_path: Path to text file
 
         Returns:
-            File contents
+            Iterator of text blocks
         """
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-
-            logger.info(f"Text extraction successful: {file_path.name}")
-            return self._clean_text(text)
-
-        except UnicodeDecodeError:
-            # Try with different encoding
-            with open(file_path, 'r', encoding='latin-1') as f:
-                text = f.read()
-
-            logger.warning(f"Used latin-1 encoding for {file_path.name}")
-            return self._clean_text(text)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        newlines = io.IncrementalNewlineDecoder(None, translate=True)
+
+        with open(file_path, 'rb') as f:
+            for block in chain(iter(lambda: f.read(BLOCK_BYTES), b''), [b'']):
+                final = not block
+                pending = decoder.getstate()[0]
+                try:
+                    text = decoder.decode(block, final=final)
+                except UnicodeDecodeError:
+                    logger.warning(f"{file_path.name} is not valid UTF-8; reading the rest as latin-1")
+                    decoder = codecs.getincrementaldecoder('latin-1')()
+                    text = decoder.decode(pending + block, final=final)
+                text = newlines.decode(text, final=final)
+                if text:
+                    yield text
+
+        logger.info(f"Text extraction successful: {file_path.name}")
 
     def _clean_text(self, text: str) -> str:
         """
@@ -214,61 +388,289 @@ class DocumentProcessor:
 
         return text
 
-    def _chunk_text(self, text: str) -> List[str]:
+    def _iter_sentences(self, blocks: Iterable[str]) -> Iterator[List[str]]:
         """
-        Chunk text into overlapping pieces.
+        Clean streamed text and split it into sentences (rough approximation).
 
-        Uses a sliding window approach with token-based chunking.
+        The unfinished sentence at the end of each block is carried into the
+        next one, so the result matches cleaning and splitting the whole text.
 
         Args:
-            text: Full text to chunk
+            blocks: Consecutive pieces of the document text
 
         Returns:
-            List of text chunks
+            Iterator of sentence batches (one per block)
         """
-        # Split into sentences (rough approximation)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-
-        chunks = []
-        current_chunk = []
-        current_tokens = 0
-
-        for sentence in sentences:
-            sentence_tokens = len(ENCODING.encode(sentence))
-
-            # If adding this sentence would exceed chunk size, save current chunk
-            if current_tokens + sentence_tokens > self.chunk_size and current_chunk:
-                # Save chunk
-                chunk_text = ' '.join(current_chunk)
-                chunks.append(chunk_text)
-
-                # Start new chunk with overlap
-                # Keep last few sentences for overlap
-                overlap_sentences = []
-                overlap_tokens = 0
-
-                for s in reversed(current_chunk):
-                    s_tokens = len(ENCODING.encode(s))
-                    if overlap_tokens + s_tokens <= self.chunk_overlap:
-                        overlap_sentences.insert(0, s)
-                        overlap_tokens += s_tokens
-                    else:
-                        break
+        carry = ""
+        started = False
+        for block in blocks:
+            text = re.sub(r' +', ' ', re.sub(r'\n{3,}', '\n\n', carry + block))
+            if not carry:
+                text = text.lstrip()  # Document start, or whitespace after a sentence break
+            sentences = SENTENCE_BREAK.split(text)
+            carry = sentences.pop()
+
+            if len(carry) > MAX_SENTENCE_CHARS:
+                cut = max(carry.rfind(' ', 0, MAX_SENTENCE_CHARS), carry.rfind('\n', 0, MAX_SENTENCE_CHARS))
+                cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+                sentences.append(carry[:cut].rstrip())
+                carry = carry[cut:].lstrip()
+
+            if sentences:
+                started = True
+                yield sentences
+
+        carry = carry.rstrip()
+        if carry or not started:
+            yield [carry]
+
+    def _iter_chunks(self, sentence_batches: Iterable[List[str]]) -> Iterator[Tuple[str, int]]:
+        """
+        Chunk a sentence stream into overlapping pieces.
+
+        Uses a sliding window over sentences. Each batch of sentences is
+        tokenized once, and a running token total decides chunk and overlap
+        boundaries, so nothing is re-encoded and each chunk's token count
+        (the sum of its sentences) comes out for free.
+
+        Args:
+            sentence_batches: Sentences, in document order
+
+        Returns:
+            Iterator of (chunk text, token count)
+        """
+        window: "deque[Tuple[str, int]]" = deque()
+        window_tokens = 0
+
+        for sentences in sentence_batches:
+            for sentence, sentence_tokens in zip(sentences, token_counter.count_many(sentences)):
+                # If adding this sentence would exceed chunk size, emit current chunk
+                if window_tokens + sentence_tokens > self.chunk_size and window:
+                    yield ' '.join(s for s, _ in window), window_tokens
 
-                current_chunk = overlap_sentences
-                current_tokens = overlap_tokens
+                    # Start new chunk with overlap: the longest run of trailing
+                    # sentences that fits in chunk_overlap tokens
+                    while window and window_tokens > self.chunk_overlap:
+                        window_tokens -= window.popleft()[1]
 
-            # Add sentence to current chunk
-            current_chunk.append(sentence)
-            current_tokens += sentence_tokens
+                window.append((sentence, sentence_tokens))
+                window_tokens += sentence_tokens
 
         # Don't forget last chunk
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            chunks.append(chunk_text)
+        if window:
+            yield ' '.join(s for s, _ in window), window_tokens
+
+    def _iter_lines(self, blocks: Iterable[str]) -> Iterator[str]:
+        """Split streamed text blocks into lines, carrying a line cut by a block boundary"""
+        carry = ""
+        for block in blocks:
+            lines = (carry + block).split('\n')
+            carry = lines.pop()
+            if len(carry) > MAX_UNIT_CHARS:
+                cut = carry.rfind(' ', 0, MAX_UNIT_CHARS)
+                cut = cut if cut > 0 else MAX_UNIT_CHARS
+                lines.append(carry[:cut])
+                carry = carry[cut:].lstrip()
+            yield from lines
+        if carry:
+            yield carry
+
+    def _iter_units(
+        self,
+        lines: Iterable[Tuple[int, str]]
+    ) -> Iterator[Tuple[str, str, Tuple[str, ...], int]]:
+        """
+        Parse a line stream into structural units.
+
+        Units are headings, fenced code blocks (kept verbatim), list runs and
+        paragraphs. Paragraphs and lists end at blank lines, headings, fences
+        and page boundaries; code blocks end at their closing fence. Markdown
+        headings maintain the section path attached to every unit.
 
-        return chunks
+        Args:
+            lines: (page number, line) in document order; page 0 when the
+                source has no pages
+
+        Returns:
+            Iterator of (kind, text, section path, page)
+        """
+        headings: List[Tuple[int, str]] = []
+        section: Tuple[str, ...] = ()
+        kind, buf, size, page = None, [], 0, 0
+        fence = None
+
+        def unit():
+            if kind == 'code':
+                text = '\n'.join(buf)
+            elif kind == 'list':
+                text = '\n'.join(re.sub(r'(?<=\S) +', ' ', line) for line in buf)
+            else:
+                text = '\n'.join(re.sub(r' +', ' ', line.strip()) for line in buf)
+            return kind, text, section, page
+
+        for line_page, line in lines:
+            line = line.rstrip()
+
+            if fence:
+                buf.append(line)
+                size += len(line)
+                if line.strip().startswith(fence):
+                    yield unit()
+                    kind, buf, size, fence = None, [], 0, None
+                elif size > MAX_UNIT_CHARS:
+                    yield unit()
+                    buf, size = [], 0
+                continue
+
+            heading = HEADING.match(line)
+            opening = FENCE.match(line)
+            item = LIST_ITEM.match(line)
+            if kind and (
+                not line.strip() or heading or opening or line_page != page
+                or size > MAX_UNIT_CHARS or (kind == 'paragraph' and item)
+            ):
+                yield unit()
+                kind, buf, size = None, [], 0
+
+            if not line.strip():
+                continue
+
+            page = line_page if kind is None else page
+            if heading:
+                level = len(heading.group(1))
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, heading.group(2)))
+                section = tuple(title for _, title in headings)
+                yield 'heading', line.strip(), section, page
+                continue
+
+            if opening:
+                kind, fence = 'code', opening.group(1)
+            elif kind is None:
+                kind = 'list' if item else 'paragraph'
+            buf.append(line)
+            size += len(line)
+
+        if kind:
+            yield unit()
+
+    def _iter_structured_chunks(
+        self,
+        units: Iterable[Tuple[str, str, Tuple[str, ...], int]]
+    ) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+        """
+        Chunk structural units without crossing section or page boundaries.
 
+        Each section (heading to next heading, within one page) is packed up
+        to chunk_size. A section that fits whole is held back and merged with
+        the following small sections on the same page while the total fits,
+        so short sections don't become tiny chunks; a merged chunk is labelled
+        with the sections' common heading path. Units larger than chunk_size
+        are split: paragraphs by sentence (with chunk_overlap), lists by item,
+        code blocks by line.
+
+        Args:
+            units: (kind, text, section path, page) from _iter_units
+
+        Returns:
+            Iterator of (chunk text, token count, {'section': ..., 'page': ...})
+        """
+        separator_tokens = token_counter.count(SECTION_SEPARATOR)
+        merged: List[Tuple[str, int, Tuple[str, ...]]] = []  # Whole small sections awaiting merge
+        merged_tokens = 0
+        merged_page = 0
+
+        for (section, page), group in groupby(units, key=lambda unit: (unit[2], unit[3])):
+            pieces = self._pack(self._iter_unit_pieces(group), SECTION_SEPARATOR)
+            first = next(pieces, None)
+            second = next(pieces, None)
+            if first is None:
+                continue
+
+            if second is None:
+                text, tokens = first
+                if merged and (page != merged_page or merged_tokens + separator_tokens + tokens > self.chunk_size):
+                    yield self._merge_sections(merged, merged_page, separator_tokens)
+                    merged = []
+                merged_tokens = merged_tokens + separator_tokens + tokens if merged else tokens
+                merged_page = page
+                merged.append((text, tokens, section))
+                continue
+
+            if merged:
+                yield self._merge_sections(merged, merged_page, separator_tokens)
+                merged = []
+            for text, tokens in chain([first, second], pieces):
+                yield text, tokens, {'section': ' > '.join(section), 'page': page}
+
+        if merged:
+            yield self._merge_sections(merged, merged_page, separator_tokens)
+
+    def _merge_sections(
+        self,
+        sections: List[Tuple[str, int, Tuple[str, ...]]],
+        page: int,
+        separator_tokens: int
+    ) -> Tuple[str, int, Dict[str, Any]]:
+        """Join whole small sections into one chunk, labelled with their common (else first) heading path"""
+        paths = [path for _, _, path in sections]
+        common = paths[0]
+        for path in paths[1:]:
+            common = tuple(a for a, _ in takewhile(lambda pair: pair[0] == pair[1], zip(common, path)))
+
+        text = SECTION_SEPARATOR.join(text for text, _, _ in sections)
+        tokens = sum(tokens for _, tokens, _ in sections) + separator_tokens * (len(sections) - 1)
+        label = common or next((path for path in paths if path), ())
+        return text, tokens, {'section': ' > '.join(label), 'page': page}
+
+    def _iter_unit_pieces(
+        self,
+        units: Iterable[Tuple[str, str, Tuple[str, ...], int]]
+    ) -> Iterator[Tuple[str, int]]:
+        """Yield units as (text, tokens), splitting any larger than chunk_size"""
+        for kind, text, _, _ in units:
+            tokens = token_counter.count(text)
+            if tokens <= self.chunk_size:
+                yield text, tokens
+            elif kind == 'list':
+                items: List[str] = []
+                for line in text.split('\n'):
+                    if items and not LIST_ITEM.match(line):
+                        items[-1] += '\n' + line  # Continuation of the previous item
+                    else:
+                        items.append(line)
+                yield from self._pack(self._iter_unit_pieces(('paragraph', item, (), 0) for item in items), '\n')
+            elif kind == 'code':
+                yield from self._pack(self._iter_unit_pieces(('paragraph', line, (), 0) for line in text.split('\n')), '\n')
+            else:
+                yield from self._iter_chunks(self._iter_sentences([text]))
+
+    def _pack(self, pieces: Iterable[Tuple[str, int]], separator: str) -> Iterator[Tuple[str, int]]:
+        """Greedily join consecutive (text, tokens) pieces up to chunk_size tokens"""
+        separator_tokens = token_counter.count(separator)
+        window: List[str] = []
+        window_tokens = 0
+        for piece, piece_tokens in pieces:
+            if window and window_tokens + separator_tokens + piece_tokens > self.chunk_size:
+                yield separator.join(window), window_tokens
+                window, window_tokens = [], 0
+            window_tokens += separator_tokens + piece_tokens if window else piece_tokens
+            window.append(piece)
+        if window:
+            yield separator.join(window), window_tokens
+
+    def _chunk_text(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Chunk text into overlapping pieces.
+
+        Args:
+            text: Full text to chunk
+
+        Returns:
+            List of (chunk text, token count)
+        """
+        return list(self._iter_chunks(self._iter_sentences([text])))
 
 def test_processor():
     """Test the document processor with sample files"""
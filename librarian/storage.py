@@ -5,9 +5,11 @@ Archive-AI v7.5 - Phase 5.2
 """
 
 import logging
+from pathlib import Path
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import hashlib
+import json
 
 from redisvl.index import SearchIndex
 from redisvl.query import VectorQuery
@@ -19,6 +21,21 @@ import redis
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Redis hash: filename -> JSON manifest entry (outside the indexed "library:" prefix)
+MANIFEST_KEY = "library_manifest"
+
+# Redis sorted set of ingested filenames (all score 0, so ranges are alphabetical)
+FILES_KEY = "library_files"
+
+
+def _file_hash(file_path: Path) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 
 class LibraryStorage:
     """Handles storage of library chunks in RedisVL"""
@@ -27,7 +44,10 @@ class LibraryStorage:
         self,
         redis_url: str = "redis://redis:6379",
         index_name: str = "library_index",
-        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        chunker_version: str = "",
+        embed_batch_size: int = 64,
+        load_batch_size: int = 500
     ):
         """
         Initialize library storage.
@@ -36,10 +56,16 @@ class LibraryStorage:
             redis_url: Redis connection URL
             index_name: Name for the vector search index
             embedding_model: HuggingFace model for embeddings
+            chunker_version: Chunking settings; files ingested with other settings are redone
+            embed_batch_size: Texts per embedding model forward pass
+            load_batch_size: Chunks (or commands) per Redis pipeline round trip
         """
         self.redis_url = redis_url
         self.index_name = index_name
         self.embedding_model_name = embedding_model
+        self.model_version = f"{embedding_model}@{chunker_version}" if chunker_version else embedding_model
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.load_batch_size = max(1, load_batch_size)
 
         # Initialize Redis client with default encoding
         # RedisVL handles vector serialization internally
@@ -59,6 +85,7 @@ class LibraryStorage:
 
         # Initialize search index
         self._init_index()
+        self._backfill_registry()
 
         logger.info(f"LibraryStorage initialized: {index_name}")
 
@@ -112,6 +139,14 @@ class LibraryStorage:
                 {
                     "name": "doc_type",
                     "type": "tag"  # Always "library_book"
+                },
+                {
+                    "name": "section",
+                    "type": "text"  # Heading path (structure chunk mode)
+                },
+                {
+                    "name": "page",
+                    "type": "numeric"  # PDF page, 0 if unknown
                 }
             ]
         }
@@ -129,79 +164,342 @@ class LibraryStorage:
             self.index = SearchIndex.from_dict(schema)
             self.index.set_client(self.redis_client)
 
+    def _backfill_registry(self):
+        """Register manifest files ingested before the file registry existed"""
+        try:
+            if not self.redis_client.exists(FILES_KEY):
+                filenames = self.redis_client.hkeys(MANIFEST_KEY)
+                if filenames:
+                    self.redis_client.zadd(FILES_KEY, {name: 0 for name in filenames})
+        except Exception as e:
+            logger.warning(f"Could not backfill file registry: {str(e)}")
+
     def store_chunks(self, chunks: List[Dict[str, Any]], file_path: str):
         """
         Store document chunks with embeddings.
 
+        Only chunks not already stored for this file are embedded.
+
         Args:
             chunks: List of chunk dictionaries from DocumentProcessor
-            file_path: Path to original file (for logging)
+            file_path: Path to original file
         """
         try:
-            # Prepare all data and keys for batch loading
-            all_data = []
-            all_keys = []
-
-            for chunk in chunks:
-                # Generate embedding with RedisVL vectorizer (as bytes for Redis)
-                text = chunk['text']
-                embedding = self.vectorizer.embed(text, as_buffer=True)
-
-                # Create unique ID (hash of text + filename + chunk_index)
-                chunk_id = self._generate_chunk_id(
-                    chunk['filename'],
-                    chunk['chunk_index']
-                )
-
-                # Prepare data for storage
-                data = {
-                    "text": text,
-                    "embedding": embedding,
-                    "filename": chunk['filename'],
-                    "file_type": chunk['file_type'],
+            pending = self.pending_chunks(chunks, Path(file_path).name)
+            embeddings = self.embed_chunks(pending)
+            self.load_chunks(
+                chunks,
+                {self.chunk_id(chunk): embedding for chunk, embedding in zip(pending, embeddings)},
+                file_path
+            )
+        except Exception as e:
+            logger.error(f"Error storing chunks from {file_path}: {str(e)}")
+            raise
+
+    def embed_chunks(self, chunks: List[Dict[str, Any]]) -> List[bytes]:
+        """
+        Embed chunk texts.
+
+        Args:
+            chunks: List of chunk dictionaries from DocumentProcessor
+
+        Returns:
+            Embeddings as bytes (Redis vector format), aligned with chunks
+        """
+        if not chunks:
+            return []
+        # Batched forward passes through the RedisVL vectorizer (as bytes for Redis)
+        return self.vectorizer.embed_many(
+            [chunk['text'] for chunk in chunks],
+            batch_size=self.embed_batch_size,
+            as_buffer=True
+        )
+
+    def load_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        embeddings: Dict[str, bytes],
+        file_path: str,
+        signature: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Write a file's chunks to the index and record it in the manifest.
+
+        Chunks with a new embedding are written in full; already-stored chunks
+        only get their position metadata refreshed. Chunks the file no longer
+        produces are deleted.
+
+        Args:
+            chunks: Every chunk of the file, from DocumentProcessor
+            embeddings: Chunk ID -> embedding for chunks that needed embedding
+            file_path: Path to original file
+            signature: File signature taken before extraction (default: now)
+        """
+        chunk_ids = self.load_batch(chunks, embeddings)
+        self.finalize_file(file_path, chunk_ids, signature)
+
+    def load_batch(self, chunks: List[Dict[str, Any]], embeddings: Dict[str, bytes]) -> List[str]:
+        """
+        Write one batch of a file's chunks, ahead of finalize_file().
+
+        Chunks with a new embedding are written in full; already-stored chunks
+        only get their position metadata refreshed. Streamed chunks carry no
+        'total_chunks' yet; finalize_file() sets it.
+
+        Args:
+            chunks: Consecutive chunks of one file, from DocumentProcessor
+            embeddings: Chunk ID -> embedding for chunks that needed embedding
+
+        Returns:
+            Chunk IDs of the batch, in order
+        """
+        all_data = []
+        all_keys = []
+        chunk_ids = []
+        pipe = self.redis_client.pipeline(transaction=False)
+
+        for chunk in chunks:
+            chunk_id = self.chunk_id(chunk)
+            chunk_ids.append(chunk_id)
+            embedding = embeddings.get(chunk_id)
+
+            if embedding is None:
+                # Unchanged text: keep the stored embedding, refresh its position
+                pipe.hset(f"library:{chunk_id}", mapping={
                     "chunk_index": chunk['chunk_index'],
-                    "total_chunks": chunk['total_chunks'],
-                    "tokens": chunk['tokens'],
-                    "timestamp": chunk['timestamp'],
-                    "doc_type": "library_book"  # Tag for filtering
-                }
+                    "total_chunks": chunk.get('total_chunks', 0),
+                    "section": chunk.get('section', ''),
+                    "page": chunk.get('page', 0),
+                })
+                if len(pipe) >= self.load_batch_size:
+                    pipe.execute()
+                continue
+
+            # Prepare data for storage
+            data = {
+                "text": chunk['text'],
+                "embedding": embedding,
+                "filename": chunk['filename'],
+                "file_type": chunk['file_type'],
+                "chunk_index": chunk['chunk_index'],
+                "total_chunks": chunk.get('total_chunks', 0),
+                "tokens": chunk['tokens'],
+                "timestamp": chunk['timestamp'],
+                "doc_type": "library_book",  # Tag for filtering
+                "section": chunk.get('section', ''),
+                "page": chunk.get('page', 0)
+            }
 
-                all_data.append(data)
-                all_keys.append(f"library:{chunk_id}")
+            all_data.append(data)
+            all_keys.append(f"library:{chunk_id}")
 
-                logger.debug(
-                    f"Prepared chunk {chunk['chunk_index']}/{chunk['total_chunks']} "
-                    f"from {chunk['filename']}"
-                )
+            logger.debug(f"Prepared chunk {chunk['chunk_index']} from {chunk['filename']}")
 
-            # Batch load all chunks at once
-            self.index.load(all_data, keys=all_keys)
+        # Load new chunks in slices, so a huge batch never builds one giant pipeline
+        for start in range(0, len(all_data), self.load_batch_size):
+            end = start + self.load_batch_size
+            self.index.load(all_data[start:end], keys=all_keys[start:end])
+        pipe.execute()
 
-            stored_count = len(chunks)
+        return chunk_ids
 
-            logger.info(
-                f"✅ Stored {stored_count} chunks from {file_path.name if hasattr(file_path, 'name') else file_path}"
-            )
+    def finalize_file(
+        self,
+        file_path: str,
+        chunk_ids: List[str],
+        signature: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Finish a file once every batch is loaded: set total_chunks, delete
+        chunks the file no longer produces and record it in the manifest.
 
-        except Exception as e:
-            logger.error(f"Error storing chunks from {file_path}: {str(e)}")
-            raise
+        Args:
+            file_path: Path to original file
+            chunk_ids: Every chunk ID of the file, in order (from load_batch)
+            signature: File signature taken before extraction (default: now)
+        """
+        file_path = Path(file_path)
+        filename = file_path.name
+        entry = self.manifest_entry(filename)
+        pipe = self.redis_client.pipeline(transaction=False)
+
+        for chunk_id in dict.fromkeys(chunk_ids):
+            pipe.hset(f"library:{chunk_id}", "total_chunks", len(chunk_ids))
+            if len(pipe) >= self.load_batch_size:
+                pipe.execute()
+
+        # Orphans: chunks from the previous version of the file (or legacy positional IDs)
+        previous = entry["chunk_ids"] if entry else self._legacy_chunk_ids(filename)
+        orphans = set(previous) - set(chunk_ids)
+        for chunk_id in orphans:
+            pipe.delete(f"library:{chunk_id}")
+            if len(pipe) >= self.load_batch_size:
+                pipe.execute()
+
+        signature = signature or self.file_signature(file_path)
+        pipe.hset(MANIFEST_KEY, filename, json.dumps({
+            **signature,
+            "chunks": len(chunk_ids),
+            "model": self.model_version,
+            "chunk_ids": list(dict.fromkeys(chunk_ids)),
+        }))
+        pipe.zadd(FILES_KEY, {filename: 0})
+        pipe.execute()
+
+        logger.info(f"✅ Stored {filename}: {len(chunk_ids)} chunks, {len(orphans)} removed")
+
+    def discard_chunks(self, filename: str, chunk_ids: List[str]) -> int:
+        """
+        Delete chunks loaded for an ingestion that won't be finalized
+        (failed or cancelled); chunks the manifest still lists are kept.
+
+        Args:
+            filename: Source filename
+            chunk_ids: IDs written by load_batch() for this ingestion
+
+        Returns:
+            Number of chunks deleted
+        """
+        entry = self.manifest_entry(filename)
+        keep = set(entry["chunk_ids"] if entry else self._legacy_chunk_ids(filename))
+        discard = set(chunk_ids) - keep
+        pipe = self.redis_client.pipeline(transaction=False)
+        for chunk_id in discard:
+            pipe.delete(f"library:{chunk_id}")
+            if len(pipe) >= self.load_batch_size:
+                pipe.execute()
+        pipe.execute()
+        return len(discard)
+
+    def manifest_entry(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Manifest entry for a file (hash, mtime, size, chunks, model, chunk_ids)"""
+        raw = self.redis_client.hget(MANIFEST_KEY, filename)
+        return json.loads(raw) if raw else None
+
+    def file_signature(self, file_path: Path) -> Dict[str, Any]:
+        """
+        Size, mtime and content hash of a file.
+
+        The hash is reused from the manifest when size and mtime are unchanged,
+        so checking an untouched library only costs a stat per file.
+        """
+        file_path = Path(file_path)
+        stat = file_path.stat()
+        entry = self.manifest_entry(file_path.name)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            file_hash = entry["hash"]
+        else:
+            file_hash = _file_hash(file_path)
+        return {"hash": file_hash, "mtime": stat.st_mtime, "size": stat.st_size}
+
+    def is_current(self, file_path: Path, signature: Dict[str, Any]) -> bool:
+        """
+        Whether a file is already stored with this content and model.
+
+        Args:
+            file_path: Path to file
+            signature: From file_signature()
+        """
+        filename = Path(file_path).name
+        entry = self.manifest_entry(filename)
+        if not entry or entry["hash"] != signature["hash"] or entry["model"] != self.model_version:
+            return False
+        if entry["mtime"] != signature["mtime"]:  # Touched but identical
+            entry["mtime"] = signature["mtime"]
+            self.redis_client.hset(MANIFEST_KEY, filename, json.dumps(entry))
+        return True
+
+    def pending_chunks(self, chunks: List[Dict[str, Any]], filename: str) -> List[Dict[str, Any]]:
+        """
+        Chunks that need embedding (not stored for this file with the current model).
+
+        Args:
+            chunks: Every chunk of the file
+            filename: Source filename
+
+        Returns:
+            Chunks to embed
+        """
+        entry = self.manifest_entry(filename)
+        stored = set(entry["chunk_ids"]) if entry and entry["model"] == self.model_version else set()
+        return [chunk for chunk in chunks if self.chunk_id(chunk) not in stored]
+
+    def remove_file(self, filename: str) -> int:
+        """
+        Delete a file's chunks and manifest entry.
 
-    def _generate_chunk_id(self, filename: str, chunk_index: int) -> str:
+        Returns:
+            Number of chunks deleted
+        """
+        entry = self.manifest_entry(filename)
+        chunk_ids = entry["chunk_ids"] if entry else self._legacy_chunk_ids(filename)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for chunk_id in chunk_ids:
+            pipe.delete(f"library:{chunk_id}")
+            if len(pipe) >= self.load_batch_size:
+                pipe.execute()
+        pipe.hdel(MANIFEST_KEY, filename)
+        pipe.zrem(FILES_KEY, filename)
+        pipe.execute()
+        logger.info(f"🗑️ Removed {filename}: {len(chunk_ids)} chunks")
+        return len(chunk_ids)
+
+    def prune_missing(self, present: List[str]) -> List[str]:
+        """
+        Remove files in the manifest that are no longer present.
+
+        Args:
+            present: Filenames currently in the library directory
+
+        Returns:
+            Removed filenames
+        """
+        known = [
+            name.decode('utf-8') if isinstance(name, bytes) else name
+            for name in self.redis_client.hkeys(MANIFEST_KEY)
+        ]
+        missing = sorted(set(known) - set(present))
+        for filename in missing:
+            self.remove_file(filename)
+        return missing
+
+    def chunk_id(self, chunk: Dict[str, Any]) -> str:
+        return self._generate_chunk_id(chunk['filename'], chunk['text'], chunk.get('occurrence', 0))
+
+    def _generate_chunk_id(self, filename: str, text: str, occurrence: int = 0) -> str:
         """
         Generate unique ID for chunk.
 
         Args:
             filename: Source filename
-            chunk_index: Index of chunk in document
+            text: Chunk text
+            occurrence: Earlier chunks in the file with the same text, so repeats
+                (boilerplate, headers) get their own IDs instead of overwriting each other
 
         Returns:
-            Unique hash-based ID
+            Content-addressed ID (unchanged text keeps its ID when a file is edited).
+            First occurrences hash as before, so already-stored chunks keep their IDs.
         """
-        # Create deterministic ID based on filename and chunk index
-        content = f"{filename}:{chunk_index}"
+        content = f"{filename}:{text}" if occurrence == 0 else f"{filename}:{text}:{occurrence}"
         return hashlib.md5(content.encode()).hexdigest()
 
+    def _legacy_chunk_ids(self, filename: str) -> List[str]:
+        """IDs from before the manifest (md5 of filename:chunk_index) that still exist"""
+        ids = []
+        while True:
+            batch = [
+                hashlib.md5(f"{filename}:{i}".encode()).hexdigest()
+                for i in range(len(ids), len(ids) + 64)
+            ]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for chunk_id in batch:
+                pipe.exists(f"library:{chunk_id}")
+            found = pipe.execute()
+            for chunk_id, exists in zip(batch, found):
+                if not exists:
+                    return ids
+                ids.append(chunk_id)
+
     def search(
         self,
         query: str,
@@ -229,7 +527,8 @@ class LibraryStorage:
                 vector_field_name="embedding",
                 return_fields=[
                     "text", "filename", "file_type",
-                    "chunk_index", "total_chunks", "tokens", "timestamp"
+                    "chunk_index", "total_chunks", "tokens", "timestamp",
+                    "section", "page"
                 ],
                 num_results=top_k
             )
@@ -252,6 +551,8 @@ class LibraryStorage:
                     "total_chunks": int(result.get("total_chunks", 0)),
                     "tokens": int(result.get("tokens", 0)),
                     "timestamp": int(result.get("timestamp", 0)),
+                    "section": result.get("section", ""),
+                    "page": int(result.get("page", 0)),
                     "similarity_score": float(result.get("vector_distance", 0.0))
                 })
 
@@ -262,34 +563,33 @@ class LibraryStorage:
             logger.error(f"Error searching library: {str(e)}")
             return []
 
-    def get_stats(self) -> Dict[str, Any]:
+    def get_stats(self, offset: int = 0, limit: int = 100) -> Dict[str, Any]:
         """
         Get statistics about stored library chunks.
 
+        Counts come from FT.INFO and the file registry, so this costs a few
+        round trips regardless of library size.
+
+        Args:
+            offset: First file to list (alphabetical)
+            limit: Files to list
+
         Returns:
-            Dictionary with stats (total_chunks, file_count, etc.)
+            Dictionary with stats (total_chunks, unique_files, a page of files, etc.)
         """
         try:
-            # Count total library chunks
-            cursor, keys = self.redis_client.scan(match="library:*", count=1000)
-            total_count = len(keys)
-
-            while cursor != 0:
-                cursor, batch = self.redis_client.scan(cursor, match="library:*", count=1000)
-                total_count += len(batch)
-
-            # Get unique filenames
-            filenames = set()
-            for key in self.redis_client.scan_iter(match="library:*", count=100):
-                filename = self.redis_client.hget(key, "filename")
-                if filename:
-                    if isinstance(filename, bytes):
-                        filename = filename.decode('utf-8')
-                    filenames.add(filename)
+            info = self.redis_client.ft(self.index_name).info()
+            files = [
+                name.decode('utf-8') if isinstance(name, bytes) else name
+                for name in self.redis_client.zrange(FILES_KEY, offset, offset + limit - 1)
+            ] if limit > 0 else []
 
             return {
-                "total_chunks": total_count,
-                "unique_files": len(filenames),
+                "total_chunks": int(info["num_docs"]),
+                "unique_files": self.redis_client.zcard(FILES_KEY),
+                "files": files,
+                "offset": offset,
+                "limit": limit,
                 "index_name": self.index_name,
                 "embedding_model": self.embedding_model_name
             }
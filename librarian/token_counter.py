@@ -0,0 +1,90 @@
+"""
+Token Counter
+Cached, batched token counting for library ingestion.
+
+Counts are cached by content hash, so text seen twice (overlap sentences,
+re-ingested documents, repeated boilerplate) is only encoded once, and
+misses are encoded in a single batched tiktoken call.
+Archive-AI v7.5 - Phase 5.1
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+import tiktoken
+
+
+class TokenCounter:
+    """Content-hash cached token counter (tiktoken)"""
+
+    def __init__(self, encoding: str = "cl100k_base", cache_size: int = 65536):
+        """
+        Initialize counter.
+
+        Args:
+            encoding: tiktoken encoding name
+            cache_size: Cached counts (least recently used dropped first)
+        """
+        self.encoding = tiktoken.get_encoding(encoding)
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def approx(text: str) -> int:
+        """Cheap estimate (~4 characters per token) for budget checks"""
+        return math.ceil(len(text) / 4) if text else 0
+
+    def encode(self, text: str) -> List[int]:
+        return self.encoding.encode_ordinary(text)
+
+    def count(self, text: str) -> int:
+        """Token count for a single text"""
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: Iterable[str]) -> List[int]:
+        """Token counts for many texts; cache misses are encoded in one batch"""
+        texts = list(texts)
+        counts: List[Optional[int]] = [None] * len(texts)
+        missing = {}
+        with self.lock:
+            for i, text in enumerate(texts):
+                if not text:
+                    counts[i] = 0
+                    continue
+                key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.cache.move_to_end(key)
+                    counts[i] = cached
+                    self.hits += 1
+                elif key in missing:
+                    missing[key].append(i)  # Repeated in this batch, encoded once
+                    self.hits += 1
+                else:
+                    missing[key] = [i]
+                    self.misses += 1
+
+        if missing:
+            keys = list(missing)
+            encoded = self.encoding.encode_ordinary_batch([texts[missing[key][0]] for key in keys])
+            with self.lock:
+                for key, ids in zip(keys, encoded):
+                    for i in missing[key]:
+                        counts[i] = len(ids)
+                    self.cache[key] = len(ids)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return counts
+
+    def stats(self) -> dict:
+        return {"cached": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+
+# Global instance
+token_counter = TokenCounter()
@@ -8,14 +8,16 @@ import os
 import time
 import logging
 import asyncio
+import threading
 from pathlib import Path
-from typing import Optional, Callable
+from typing import Any, Dict, Optional, Callable
 from datetime import datetime
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileCreatedEvent
 
 from processor import DocumentProcessor
+from pipeline import IngestionPipeline
 
 # Configure logging
 logging.basicConfig(
@@ -26,23 +28,55 @@ logger = logging.getLogger(__name__)
 
 
 class LibraryFileHandler(FileSystemEventHandler):
-    """Handles file system events for library ingestion"""
+    """
+    Handles file system events for library ingestion.
+
+    Observer callbacks only record the path; flush() (run off the observer
+    thread) hands a file on once its size and mtime have stopped changing,
+    so half-written copies are never ingested and bursts of events for one
+    path become a single ingest.
+    """
 
-    def __init__(self, processor: DocumentProcessor, callback: Optional[Callable] = None):
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        callback: Optional[Callable] = None,
+        pipeline: Optional[IngestionPipeline] = None,
+        settle_seconds: float = 2.0
+    ):
         """
         Initialize file handler.
 
         Args:
             processor: DocumentProcessor instance
             callback: Optional callback function to call with processed chunks
+            pipeline: Optional ingestion pipeline; files are queued to it instead
+                of being processed by the handler
+            settle_seconds: Quiet period (no events, unchanged size/mtime) before a file is ingested
         """
         super().__init__()
         self.processor = processor
         self.callback = callback
+        self.pipeline = pipeline
+        self.settle_seconds = settle_seconds
         self.supported_extensions = {'.pdf', '.txt', '.md'}
+        self.pending: Dict[Path, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
 
         logger.info(f"LibraryFileHandler initialized. Supported: {self.supported_extensions}")
 
+    def _supported(self, path: str) -> bool:
+        return Path(path).suffix.lower() in self.supported_extensions
+
+    def _mark(self, path: str, deleted: bool = False):
+        """Record a change; the latest event for a path wins"""
+        with self.lock:
+            self.pending[Path(path)] = {
+                "deleted": deleted,
+                "changed_at": time.monotonic(),
+                "stat": None,
+            }
+
     def on_created(self, event):
         """
         Handle file creation event.
@@ -53,18 +87,69 @@ class LibraryFileHandler(FileSystemEventHandler):
         if event.is_directory:
             return
 
-        file_path = Path(event.src_path)
-        extension = file_path.suffix.lower()
-
         # Only process supported file types
-        if extension not in self.supported_extensions:
-            logger.debug(f"Ignoring unsupported file type: {file_path.name}")
+        if not self._supported(event.src_path):
+            logger.debug(f"Ignoring unsupported file type: {Path(event.src_path).name}")
             return
 
-        logger.info(f"New file detected: {file_path.name}")
+        logger.info(f"New file detected: {Path(event.src_path).name}")
+        self._mark(event.src_path)
 
-        # Wait a moment to ensure file is fully written
-        time.sleep(1)
+    def on_modified(self, event):
+        if not event.is_directory and self._supported(event.src_path):
+            self._mark(event.src_path)
+
+    def on_moved(self, event):
+        # Renames (e.g. rsync's temp file → final name) delete the source and create the destination
+        if event.is_directory:
+            return
+        if self._supported(event.src_path):
+            self._mark(event.src_path, deleted=True)
+        if self._supported(event.dest_path):
+            logger.info(f"File moved in: {Path(event.dest_path).name}")
+            self._mark(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory and self._supported(event.src_path):
+            self._mark(event.src_path, deleted=True)
+
+    def flush(self):
+        """Hand off files that have settled; call periodically"""
+        now = time.monotonic()
+        with self.lock:
+            changes = list(self.pending.items())
+
+        ready = []
+        for path, change in changes:
+            if now - change["changed_at"] < self.settle_seconds:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                ready.append((path, change, True))
+                continue
+            current = (stat.st_size, stat.st_mtime)
+            if change["stat"] == current:
+                ready.append((path, change, False))
+            else:
+                # Still being written (or first look): check again after another quiet period
+                change["stat"] = current
+                change["changed_at"] = now
+
+        for path, change, deleted in ready:
+            with self.lock:
+                if self.pending.get(path) is not change:
+                    continue  # New event since; wait for it to settle
+                del self.pending[path]
+            if deleted:
+                self._remove(path)
+            else:
+                self._ingest(path)
+
+    def _ingest(self, file_path: Path):
+        if self.pipeline:
+            self.pipeline.submit(file_path)
+            return
 
         try:
             # Process the document
@@ -79,6 +164,11 @@ class LibraryFileHandler(FileSystemEventHandler):
         except Exception as e:
             logger.error(f"Error processing {file_path.name}: {str(e)}")
 
+    def _remove(self, file_path: Path):
+        logger.info(f"File removed: {file_path.name}")
+        if self.pipeline:
+            self.pipeline.remove(file_path)
+
 
 class LibraryWatcher:
     """Watches a directory for new library files"""
@@ -88,7 +178,9 @@ class LibraryWatcher:
         watch_dir: str,
         chunk_size: int = 250,
         chunk_overlap: int = 50,
-        callback: Optional[Callable] = None
+        callback: Optional[Callable] = None,
+        pipeline: Optional[IngestionPipeline] = None,
+        settle_seconds: float = 2.0
     ):
         """
         Initialize library watcher.
@@ -98,11 +190,17 @@ class LibraryWatcher:
             chunk_size: Token size for chunks
             chunk_overlap: Overlap tokens between chunks
             callback: Optional callback for processed chunks
+            pipeline: Optional ingestion pipeline (replaces in-thread processing + callback)
+            settle_seconds: Quiet period before a changed file is ingested
         """
         self.watch_dir = Path(watch_dir)
-        self.processor = DocumentProcessor(chunk_size, chunk_overlap)
+        self.processor = pipeline.processor if pipeline else DocumentProcessor(chunk_size, chunk_overlap)
         self.callback = callback
+        self.pipeline = pipeline
+        self.settle_seconds = settle_seconds
         self.observer = None
+        self.flusher = None
+        self.stopping = threading.Event()
 
         # Create watch directory if it doesn't exist
         self.watch_dir.mkdir(parents=True, exist_ok=True)
@@ -112,13 +210,20 @@ class LibraryWatcher:
     def start(self):
         """Start watching the directory"""
         # Create event handler
-        event_handler = LibraryFileHandler(self.processor, self.callback)
+        event_handler = LibraryFileHandler(self.processor, self.callback, self.pipeline, self.settle_seconds)
 
         # Create observer
         self.observer = Observer()
         self.observer.schedule(event_handler, str(self.watch_dir), recursive=False)
         self.observer.start()
 
+        # Settled files are handed off here, never in the observer thread
+        self.stopping.clear()
+        self.flusher = threading.Thread(
+            target=self._flush_loop, args=(event_handler,), name="library-settle", daemon=True
+        )
+        self.flusher.start()
+
         logger.info(f"🔍 Watching for files in: {self.watch_dir}")
         logger.info(f"Supported types: PDF, TXT, MD")
 
@@ -127,30 +232,59 @@ class LibraryWatcher:
         if self.observer:
             self.observer.stop()
             self.observer.join()
+            self.stopping.set()
+            self.flusher.join()
             logger.info("Watcher stopped")
 
+    def _flush_loop(self, handler: LibraryFileHandler):
+        while not self.stopping.wait(min(0.5, self.settle_seconds / 2 or 0.5)):
+            handler.flush()
+
     def process_existing_files(self):
         """Process any existing files in the watch directory"""
-        supported_patterns = ['*.pdf', '*.txt', '*.md']
+        # Same extension check as the event handler (Book.PDF counts), so a file
+        # the handler ingests is never pruned on restart
+        supported_extensions = {'.pdf', '.txt', '.md'}
+        present = []
+
+        for file_path in sorted(self.watch_dir.iterdir()):
+            if not file_path.is_file() or file_path.suffix.lower() not in supported_extensions:
+                continue
+            present.append(file_path.name)
+
+            if self.pipeline:
+                # Unchanged files are skipped by the pipeline's manifest check
+                self.pipeline.submit(file_path)
+                continue
 
-        for pattern in supported_patterns:
-            for file_path in self.watch_dir.glob(pattern):
-                logger.info(f"Processing existing file: {file_path.name}")
+            logger.info(f"Processing existing file: {file_path.name}")
 
-                try:
-                    chunks = self.processor.process_document(str(file_path))
+            try:
+                chunks = self.processor.process_document(str(file_path))
 
-                    logger.info(f"Processed {file_path.name}: {len(chunks)} chunks")
+                logger.info(f"Processed {file_path.name}: {len(chunks)} chunks")
 
-                    if self.callback:
-                        self.callback(chunks, file_path)
+                if self.callback:
+                    self.callback(chunks, file_path)
 
-                except Exception as e:
-                    logger.error(f"Error processing {file_path.name}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error processing {file_path.name}: {str(e)}")
+
+        # Files deleted while the watcher was down
+        if self.pipeline:
+            try:
+                removed = self.pipeline.storage.prune_missing(present)
+                if removed:
+                    logger.info(f"Removed {len(removed)} deleted files from the library")
+            except Exception as e:
+                logger.error(f"Error pruning deleted files: {str(e)}")
 
     def run_forever(self):
         """Run the watcher indefinitely"""
         try:
+            if self.pipeline:
+                self.pipeline.start()
+
             # Process any existing files first
             logger.info("Processing existing files...")
             self.process_existing_files()
@@ -160,12 +294,18 @@ class LibraryWatcher:
 
             # Keep running
             logger.info("Watcher running. Press Ctrl+C to stop.")
+            last_report = time.time()
             while True:
                 time.sleep(1)
+                if self.pipeline and time.time() - last_report >= 30 and not self.pipeline.idle():
+                    last_report = time.time()
+                    logger.info(f"Ingestion: {self.pipeline.stats()}")
 
         except KeyboardInterrupt:
             logger.info("Shutting down...")
             self.stop()
+            if self.pipeline:
+                self.pipeline.stop()
 
 
 # Standalone service mode
@@ -196,6 +336,67 @@ def main():
         default=50,
         help='Overlap tokens (default: 50)'
     )
+    parser.add_argument(
+        '--chunk-mode',
+        choices=['sentence', 'structure'],
+        default=os.getenv('LIBRARIAN_CHUNK_MODE', 'sentence'),
+        help='sentence: sliding window over sentences; structure: split at headings, '
+             'pages, lists and code blocks, merging small sections (default: sentence)'
+    )
+    parser.add_argument(
+        '--settle-seconds',
+        type=float,
+        default=float(os.getenv('LIBRARIAN_SETTLE_SECONDS', '2')),
+        help='Seconds a file must stay unchanged before ingestion (default: 2)'
+    )
+    parser.add_argument(
+        '--extract-workers',
+        type=int,
+        default=int(os.getenv('LIBRARIAN_EXTRACT_WORKERS', '2')),
+        help='Processes extracting/OCRing/chunking files (default: 2)'
+    )
+    parser.add_argument(
+        '--ocr-workers',
+        type=int,
+        default=int(os.getenv('LIBRARIAN_OCR_WORKERS', '2')),
+        help='Processes OCRing pages of one scanned PDF (default: 2)'
+    )
+    parser.add_argument(
+        '--embed-workers',
+        type=int,
+        default=int(os.getenv('LIBRARIAN_EMBED_WORKERS', '1')),
+        help='Threads embedding chunks (default: 1)'
+    )
+    parser.add_argument(
+        '--load-workers',
+        type=int,
+        default=int(os.getenv('LIBRARIAN_LOAD_WORKERS', '1')),
+        help='Threads writing chunks to Redis (default: 1)'
+    )
+    parser.add_argument(
+        '--embed-batch-chunks',
+        type=int,
+        default=int(os.getenv('LIBRARIAN_EMBED_BATCH_CHUNKS', '256')),
+        help='Chunks per batch streamed out of extraction; small files are grouped up to this per embed call (default: 256)'
+    )
+    parser.add_argument(
+        '--embed-batch-size',
+        type=int,
+        default=int(os.getenv('LIBRARIAN_EMBED_BATCH_SIZE', '64')),
+        help='Texts per embedding model forward pass (default: 64)'
+    )
+    parser.add_argument(
+        '--load-batch-size',
+        type=int,
+        default=int(os.getenv('LIBRARIAN_LOAD_BATCH_SIZE', '500')),
+        help='Chunks per Redis pipeline round trip (default: 500)'
+    )
+    parser.add_argument(
+        '--api-port',
+        type=int,
+        default=int(os.getenv('LIBRARIAN_API_PORT', '8090')),
+        help='Port for the job API (0 disables it, default: 8090)'
+    )
     parser.add_argument(
         '--redis-url',
         default=os.getenv('REDIS_URL', 'redis://redis:6379'),
@@ -206,31 +407,51 @@ def main():
 
     # Initialize storage (Phase 5.2)
     logger.info("Initializing library storage...")
-    storage = LibraryStorage(redis_url=args.redis_url)
+    chunker_version = f"{args.chunk_size}/{args.chunk_overlap}"
+    if args.chunk_mode != 'sentence':
+        chunker_version += f"/{args.chunk_mode}"  # Sentence-mode manifests predate the option
+    storage = LibraryStorage(
+        redis_url=args.redis_url,
+        chunker_version=chunker_version,
+        embed_batch_size=args.embed_batch_size,
+        load_batch_size=args.load_batch_size
+    )
 
-    # Create callback that stores chunks
-    def store_chunks_callback(chunks, file_path):
-        """Store processed chunks in RedisVL"""
-        try:
-            storage.store_chunks(chunks, file_path)
-
-            logger.info(f"📚 Stored {file_path.name}:")
-            for chunk in chunks:
-                logger.info(
-                    f"  Chunk {chunk['chunk_index']}/{chunk['total_chunks']}: "
-                    f"{chunk['tokens']} tokens"
-                )
-        except Exception as e:
-            logger.error(f"Failed to store chunks from {file_path.name}: {str(e)}")
+    def log_stored(task):
+        """Log each finished file"""
+        if task.stage == "done":
+            logger.info(
+                f"📚 Stored {task.path.name}: {task.chunks_done} chunks "
+                f"in {task.finished_at - task.submitted_at:.1f}s"
+            )
+
+    # Extract → embed → load pipeline (Phase 5.1 staged ingestion)
+    pipeline = IngestionPipeline(
+        DocumentProcessor(
+            args.chunk_size, args.chunk_overlap,
+            ocr_workers=args.ocr_workers, chunk_mode=args.chunk_mode
+        ),
+        storage,
+        extract_workers=args.extract_workers,
+        embed_workers=args.embed_workers,
+        load_workers=args.load_workers,
+        embed_batch_chunks=args.embed_batch_chunks,
+        on_complete=log_stored
+    )
 
     # Create and run watcher
     watcher = LibraryWatcher(
         watch_dir=args.watch_dir,
         chunk_size=args.chunk_size,
         chunk_overlap=args.chunk_overlap,
-        callback=store_chunks_callback
+        pipeline=pipeline,
+        settle_seconds=args.settle_seconds
     )
 
+    if args.api_port:
+        from api import serve
+        serve(pipeline, Path(args.watch_dir), host='0.0.0.0', port=args.api_port)
+
     watcher.run_forever()
 
 
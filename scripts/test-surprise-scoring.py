@@ -101,9 +101,47 @@ def test_surprise_calculation():
     return True
 
 
+def test_batch_perplexity():
+    """Score sample messages with one batched Vorpal request (requires Vorpal)"""
+    import asyncio
+    import time
+
+    print("\n" + "=" * 70)
+    print("Batched Perplexity Test (live Vorpal)")
+    print("=" * 70)
+
+    messages = [
+        "The weather is nice today.",
+        "I went to the store and bought some milk.",
+        "Quantum chromodynamics describes the strong interaction between quarks.",
+        "Purple elephants debate tax policy on Saturn's rings.",
+    ]
+
+    async def run():
+        worker = MemoryWorker()
+        start = time.time()
+        perplexities = await worker.calculate_perplexity_batch(messages)
+        elapsed = time.time() - start
+        return perplexities, elapsed
+
+    perplexities, elapsed = asyncio.run(run())
+
+    for message, perplexity in zip(messages, perplexities):
+        shown = f"{perplexity:.2f}" if perplexity is not None else "FAILED"
+        print(f"  {shown:>10}  {message}")
+    print(f"\n  Scored {len(messages)} messages in {elapsed:.2f}s (1 request)")
+
+    assert len(perplexities) == len(messages), "Expected one result per message"
+    assert any(p is not None for p in perplexities), "All batch scores failed"
+    print("  ✅ PASS")
+    return True
+
+
 if __name__ == "__main__":
     try:
         success = test_surprise_calculation()
+        if success and "--live" in sys.argv:
+            success = test_batch_perplexity()
         sys.exit(0 if success else 1)
     except AssertionError as e:
         print(f"\n❌ TEST FAILED: {e}")
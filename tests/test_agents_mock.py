@@ -42,6 +42,46 @@ class TestAgentsWithOctoTools(unittest.IsolatedAsyncioTestCase):
         mock_construct_solver.assert_called_once()
         mock_solver.solve.assert_called_once_with("What is 2 + 2?")
 
+    async def test_native_loop_uses_structured_steps(self):
+        registry = ToolRegistry()
+        registry.register("Calculator", "Evaluate arithmetic", lambda expr: str(eval(expr)))
+        chat = AsyncMock(side_effect=[
+            {"content": '{"thought": "Add them", "action": "Calculator", "action_input": "2+2"}'},
+            {"content": '{"thought": "Done", "action": "Final Answer", "action_input": "4"}'},
+        ])
+
+        with patch('services.llm.llm.chat', chat):
+            agent = ReActAgent(registry)
+            agent.structured = True
+            result = await agent.solve_native("What is 2 + 2?")
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.answer, "4")
+        self.assertEqual(result.steps[0].observation, "4")
+        schema = chat.call_args.kwargs["response_format"]["json_schema"]["schema"]
+        self.assertEqual(schema["properties"]["action"]["enum"], ["Calculator", "Final Answer"])
+
+    async def test_only_response_format_errors_disable_structured_steps(self):
+        import httpx
+
+        def rejected(status, detail):
+            request = httpx.Request("POST", "http://vorpal/v1/chat/completions")
+            response = httpx.Response(status, json={"detail": detail}, request=request)
+            return httpx.HTTPStatusError("Bad Request", request=request, response=response)
+
+        agent = ReActAgent(ToolRegistry())
+        final = {"content": "Thought: Done\nAction: Final Answer\nAction Input: ok"}
+
+        agent.structured = True
+        chat = AsyncMock(side_effect=[rejected(400, "Schema property limit: prompt is too long"), final])
+        await agent._next_step(MagicMock(chat=chat), "agent", "Question\nThought:")
+        self.assertTrue(agent.structured)
+        self.assertNotIn("response_format", chat.call_args.kwargs)
+
+        chat = AsyncMock(side_effect=[rejected(422, "Unsupported request"), final])
+        await agent._next_step(MagicMock(chat=chat), "agent", "Question\nThought:")
+        self.assertFalse(agent.structured)
+
     @patch('brain.agents.code_agent.llm')
     @patch('brain.agents.code_agent.execute_code')
     async def test_code_agent_flow(self, mock_execute, mock_llm_global):
@@ -0,0 +1,313 @@
+import unittest
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+from unittest import mock
+
+# Path setup
+sys.path.append(os.path.join(os.getcwd(), 'bolt-xl'))
+
+try:
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+    import batch_engine
+    import caches
+    import model_manager
+    import server_transformers as bolt
+except ImportError:  # pragma: no cover - Bolt-XL deps not installed
+    bolt = None
+
+EOS = 2
+
+
+def _tiny_tokenizer():
+    tok = Tokenizer(models.BPE(unk_token="<unk>"))
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=300,
+        special_tokens=["<unk>", "<s>", "</s>", "<|im_start|>", "<|im_end|>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    tok.train_from_iterator(["Hello there, how are you? The weather is nice today."] * 20, trainer)
+    fast = PreTrainedTokenizerFast(tokenizer_object=tok, eos_token="</s>", pad_token="</s>", unk_token="<unk>")
+    fast.chat_template = (
+        "{% for m in messages %}<|im_start|>{{ m['role'] }}\n{{ m['content'] }}<|im_end|>\n{% endfor %}"
+        "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+    )
+    return fast
+
+
+@unittest.skipIf(bolt is None, "Bolt-XL dependencies (torch, transformers) not installed")
+class TestBatchEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        bolt.tokenizer = _tiny_tokenizer()
+        config = LlamaConfig(
+            vocab_size=len(bolt.tokenizer), hidden_size=64, intermediate_size=128,
+            num_hidden_layers=2, num_attention_heads=4, max_position_embeddings=256,
+            eos_token_id=EOS, pad_token_id=EOS,
+        )
+        bolt.model = LlamaForCausalLM(config).eval()
+        cls.prompts = [
+            bolt.tokenizer("Hello there")["input_ids"],
+            bolt.tokenizer("The weather is nice today. How are you?")["input_ids"],
+            bolt.tokenizer("how are")["input_ids"],
+        ]
+
+    def _reference(self, input_ids, max_new_tokens):
+        output = bolt.model.generate(
+            torch.tensor([input_ids]), max_new_tokens=max_new_tokens,
+            do_sample=False, eos_token_id=EOS, pad_token_id=EOS,
+        )
+        return [t for t in output[0][len(input_ids):].tolist() if t != EOS]
+
+    def test_sequences_joining_mid_batch_match_greedy_generate(self):
+        engine = bolt.BatchEngine(bolt.primary, max_batch_size=4)
+        engine.eos_token_ids = {EOS}
+        requests = [bolt.GenerationRequest(ids, 10, temperature=0, top_p=1.0) for ids in self.prompts]
+
+        engine._admit(requests[0])
+        engine._step()
+        engine._step()
+        engine._admit(requests[1])
+        engine._step()
+        engine._admit(requests[2])
+        while engine.active:
+            engine._step()
+
+        for request, ids in zip(requests, self.prompts):
+            self.assertEqual(request.generated, self._reference(ids, 10))
+            self.assertTrue(request.done.is_set())
+        self.assertEqual(engine.stats()["peak_batch_size"], 3)
+
+    def test_per_request_limits_and_cancellation(self):
+        engine = bolt.BatchEngine(bolt.primary, max_batch_size=4)
+        engine.eos_token_ids = {EOS}
+        short = bolt.GenerationRequest(self.prompts[0], 2, temperature=0, top_p=1.0)
+        long = bolt.GenerationRequest(self.prompts[1], 50, temperature=0, top_p=1.0)
+        cancelled = bolt.GenerationRequest(self.prompts[2], 50, temperature=0, top_p=1.0)
+        for request in (short, long, cancelled):
+            engine._admit(request)
+
+        engine._step()
+        self.assertEqual(short.finish_reason, "length")
+        cancelled.cancel()
+        engine._step()
+        self.assertEqual(cancelled.finish_reason, "cancelled")
+        self.assertEqual(engine.active, [long])
+        self.assertEqual(engine.attention_mask.shape[0], 1)
+
+    def test_failed_join_errors_only_the_new_request(self):
+        engine = bolt.BatchEngine(bolt.primary, max_batch_size=4)
+        engine.eos_token_ids = {EOS}
+        running = bolt.GenerationRequest(self.prompts[0], 6, temperature=0, top_p=1.0)
+        engine._admit(running)
+
+        joining = bolt.GenerationRequest(self.prompts[1], 6, temperature=0, top_p=1.0)
+        with mock.patch.object(batch_engine, "_left_pad", side_effect=RuntimeError("CUDA out of memory")):
+            engine._admit(joining)
+        self.assertEqual(joining.finish_reason, "error")
+        self.assertIn("out of memory", joining.error)
+        self.assertTrue(joining.done.is_set())
+
+        while engine.active:
+            engine._step()
+        self.assertEqual(running.generated, self._reference(self.prompts[0], 6))
+
+    def test_full_queue_rejects_and_stale_requests_time_out(self):
+        engine = bolt.BatchEngine(bolt.primary, max_batch_size=1, max_queue=1, queue_timeout=5)
+        engine.start = lambda: None  # Keep requests queued
+        stale = engine.submit(bolt.GenerationRequest(self.prompts[0], 4, temperature=0, top_p=1.0))
+        with self.assertRaises(bolt.QueueFullError) as ctx:
+            engine.submit(bolt.GenerationRequest(self.prompts[1], 4, temperature=0, top_p=1.0))
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+        stale.submitted_at -= 10
+        engine._admit(engine.waiting.get_nowait())
+        self.assertEqual(stale.finish_reason, "timeout")
+        self.assertEqual(engine.active, [])
+        self.assertEqual(engine.stats()["rejected"], 1)
+
+    def test_threaded_submit_streams_events(self):
+        engine = bolt.BatchEngine(bolt.primary, max_batch_size=4)
+        requests = [
+            engine.submit(bolt.GenerationRequest(ids, 8, temperature=0, top_p=1.0))
+            for ids in self.prompts
+        ]
+        for request in requests:
+            self.assertTrue(request.done.wait(timeout=60))
+            chunks = []
+            while True:
+                delta = request.events.get(timeout=1)
+                if delta is None:
+                    break
+                chunks.append(delta)
+            self.assertEqual("".join(chunks), request.text)
+
+
+    def test_speculative_decoding_keeps_greedy_output(self):
+        config = bolt.model.config.to_dict()
+        config.update(num_hidden_layers=1)
+        draft = LlamaForCausalLM(LlamaConfig(**config)).eval()
+        engine = bolt.BatchEngine(bolt.primary, max_batch_size=4)
+        engine.eos_token_ids = {EOS}
+        try:
+            for candidate in (draft, bolt.model):
+                bolt.draft_model = candidate
+                request = bolt.GenerationRequest(self.prompts[1], 12, temperature=0, top_p=1.0)
+                engine._admit(request)
+                while engine.active:
+                    engine._step()
+                self.assertEqual(request.generated, self._reference(self.prompts[1], 12))
+        finally:
+            bolt.draft_model = None
+
+        stats = engine.stats()["speculative"]
+        self.assertGreater(stats["steps"], 0)
+        self.assertGreater(stats["acceptance_rate"], 0)
+
+    def test_score_request_matches_teacher_forced_logprobs(self):
+        engine = bolt.BatchEngine(bolt.primary, max_batch_size=4)
+        request = bolt.ScoreRequest(self.prompts, top_logprobs=2, sample_next=True)
+        engine._admit(request)
+
+        self.assertEqual(request.finish_reason, "stop")
+        for ids, result in zip(self.prompts, request.results):
+            with torch.no_grad():
+                logits = bolt.model(torch.tensor([ids])).logits[0]
+            reference = torch.log_softmax(logits.float(), dim=-1)
+            expected = reference[:-1].gather(-1, torch.tensor(ids[1:]).unsqueeze(-1)).squeeze(-1)
+            self.assertIsNone(result["token_logprobs"][0])
+            self.assertTrue(torch.allclose(torch.tensor(result["token_logprobs"][1:]), expected, atol=1e-4))
+            self.assertEqual(result["next_token"], int(logits[-1].argmax()))
+            self.assertEqual(len(result["top"][1][0]), 2)
+
+    def test_json_schema_constraint_keeps_output_valid(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "thought": {"type": "string"},
+                "action": {"type": "string", "enum": ["Search", "Final Answer"]},
+            },
+        }
+        response_format = {"type": "json_schema", "json_schema": {"name": "step", "schema": schema}}
+        engine = bolt.BatchEngine(bolt.primary, max_batch_size=4)
+        engine.eos_token_ids = {EOS}
+        constraint = bolt.primary.json_constraint(response_format)
+        request = bolt.GenerationRequest(self.prompts[0], 30, temperature=1.5, top_p=1.0, constraint=constraint)
+        engine._admit(request)
+        while engine.active:
+            engine._step()
+
+        grammar = constraint.grammar
+        self.assertTrue(request.text.startswith('{"thought": "'))
+        self.assertIsNotNone(grammar.advance(grammar.start(), request.text))
+
+        state = grammar.advance(grammar.start(), '{"thought": "hi", "action": "Fin')
+        allowed = grammar.mask(state, len(bolt.tokenizer), torch.device("cpu"), {EOS}).nonzero().flatten().tolist()
+        self.assertTrue(allowed)
+        self.assertNotIn(EOS, allowed)
+        for token in allowed:
+            self.assertIsNotNone(grammar.advance(state, grammar.table.texts[token]))
+        done = grammar.advance(grammar.start(), '{"thought": "a \\"b\\"", "action": "Search"}')
+        self.assertTrue(grammar.done(done))
+        self.assertEqual(grammar.mask(done, len(bolt.tokenizer), torch.device("cpu"), {EOS}).nonzero().flatten().tolist(), [EOS])
+        with self.assertRaises(bolt.SchemaError):
+            bolt.primary.json_constraint({"type": "json_schema", "json_schema": {"schema": {"type": "array"}}})
+
+    def test_model_manager_routes_and_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as root:
+            names = [os.path.join(root, name) for name in ("chat", "code")]
+            for name in names:
+                bolt.model.save_pretrained(name)
+                bolt.tokenizer.save_pretrained(name)
+            manager = bolt.ModelManager(bolt.primary, names, max_models=2, memory_gb=0)
+
+            with mock.patch.object(model_manager, "DEVICE", "cpu"), mock.patch.object(model_manager, "DTYPE_NAME", "float32"):
+                chat = asyncio.run(manager.acquire(names[0]))
+                self.assertEqual(chat.name, names[0])
+                self.assertFalse(manager.evict(names[0]))  # Still leased
+                chat.release()
+                code = asyncio.run(manager.acquire(names[1]))
+                code.release()
+
+            self.assertEqual(list(manager.resident), [bolt.primary.name, names[1]])
+            self.assertIsNone(chat.model)
+            self.assertIs(asyncio.run(manager.acquire("unknown-model")), bolt.primary)
+            bolt.primary.release()
+            self.assertEqual(manager.stats()["evictions"], 1)
+
+    def test_stream_lease_released_when_client_leaves_before_body(self):
+        request = bolt.ChatCompletionRequest(
+            messages=[bolt.ChatMessage(role="user", content="Hello there")], max_tokens=50, stream=True
+        )
+        http_request = mock.Mock(is_disconnected=mock.AsyncMock(return_value=True))
+
+        async def disconnect_before_body():
+            response = await bolt.chat_completions(request, http_request)
+            self.assertEqual(bolt.primary.leases, 1)
+
+            async def receive():
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                await asyncio.sleep(3600)  # Never gets the headers out
+
+            scope = {"type": "http", "asgi": {"spec_version": "2.0"}}
+            await response(scope, receive, send)
+            generation = response.background.func.__self__.generation
+            while not generation.done.is_set():
+                await asyncio.sleep(0.01)
+            return generation
+
+        with mock.patch.object(bolt.primary.engine, "eos_token_ids", {EOS}):
+            generation = asyncio.run(disconnect_before_body())
+        self.assertEqual(bolt.primary.leases, 0)
+        self.assertTrue(generation.cancelled)
+
+    def test_prompt_is_tokenized_off_the_event_loop(self):
+        request = bolt.ChatCompletionRequest(
+            messages=[bolt.ChatMessage(role="user", content="Hello there")], max_tokens=3
+        )
+        http_request = mock.Mock(is_disconnected=mock.AsyncMock(return_value=False))
+        encode = bolt.primary.prompt_cache.encode
+        threads = []
+
+        def record(messages):
+            threads.append(threading.get_ident())
+            return encode(messages)
+
+        async def chat():
+            response = await bolt.chat_completions(request, http_request)
+            return threading.get_ident(), response
+
+        with mock.patch.object(bolt.primary.prompt_cache, "encode", side_effect=record), \
+                mock.patch.object(bolt.primary.engine, "eos_token_ids", {EOS}):
+            loop_thread, response = asyncio.run(chat())
+        self.assertEqual(response["usage"]["prompt_tokens"], len(encode(request.messages)[1]))
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+
+    def test_prompt_cache_matches_full_tokenization(self):
+        cache = caches.PromptCache(bolt.primary, max_entries=16)
+        persona = bolt.ChatMessage(role="system", content="You are a helpful assistant. The weather is nice.")
+        conversation = [persona]
+        for turn in range(4):
+            conversation.append(bolt.ChatMessage(role="user", content=f"Hello there {turn}, how are you? "))
+            prompt, ids = cache.encode(conversation)
+            self.assertEqual(ids, bolt.tokenizer(prompt)["input_ids"])
+            conversation.append(bolt.ChatMessage(role="assistant", content=f"Nice today {turn}."))
+
+        prompt, ids = cache.encode([persona, bolt.ChatMessage(role="user", content="how are you?")])
+        self.assertEqual(ids, bolt.tokenizer(prompt)["input_ids"])
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertGreater(cache.stats()["reused_tokens"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import asyncio
+from unittest import mock
+
+# Path setup
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'brain'))
+
+from services.conversation import ConversationStore
+from services.llm import llm
+from memory.vector_store import vector_store
+
+
+class TestConversationStore(unittest.IsolatedAsyncioTestCase):
+    async def test_recent_turns_follow_persona_prompt(self):
+        store = ConversationStore(memory_top_k=0)
+        session = store.get().session_id
+        store.record_exchange(session, "My name is Ada.", "Nice to meet you, Ada.")
+
+        messages = await store.build_messages(session, "You are Archie.", "What is my name?")
+
+        self.assertEqual([m["role"] for m in messages], ["system", "user", "assistant", "user"])
+        self.assertEqual(messages[0]["content"], "You are Archie.")
+        self.assertEqual(messages[-1]["content"], "What is my name?")
+
+    async def test_old_turns_roll_into_summary(self):
+        store = ConversationStore(recent_turns=2, memory_top_k=0)
+        session = store.get().session_id
+        summarize = mock.AsyncMock(return_value={"text": "User is called Ada."})
+
+        with mock.patch.object(llm, "completion", summarize):
+            store.record_exchange(session, "My name is Ada.", "Hi Ada.")
+            store.record_exchange(session, "I like tea.", "Noted.")
+            await asyncio.gather(*store._tasks)
+
+        conversation = store.get(session)
+        self.assertEqual(len(conversation.recent), 2)
+        self.assertEqual(conversation.pending, [])
+        self.assertEqual(conversation.recent_tokens, sum(t.tokens for t in conversation.recent))
+
+        messages = await store.build_messages(session, None, "What do I like?")
+        self.assertIn("User is called Ada.", messages[0]["content"])
+        self.assertEqual(messages[1]["content"], "I like tea.")
+
+    async def test_window_rolls_and_trims_whole_exchanges(self):
+        store = ConversationStore(recent_turns=3, memory_top_k=0)
+        session = store.get().session_id
+        with mock.patch.object(llm, "completion", mock.AsyncMock(return_value={"text": "Summary."})):
+            for i in range(3):
+                store.record_exchange(session, f"Question {i}?", f"Answer {i}.")
+            await asyncio.gather(*store._tasks)
+
+        conversation = store.get(session)
+        self.assertEqual([t.role for t in conversation.recent], ["user", "assistant"])
+
+        # A budget that fits one turn but not a whole exchange drops the exchange
+        store.context_tokens = store.summary_tokens + store.memory_tokens + conversation.recent[-1].tokens
+        messages = await store.build_messages(session, None, "Next?")
+        self.assertEqual([m["role"] for m in messages], ["system", "user"])
+
+    async def test_memories_already_in_history_are_skipped(self):
+        store = ConversationStore()
+        session = store.get().session_id
+        store.record_exchange(session, "I live in Lisbon.", "Lovely city.")
+        results = [
+            {"message": "i live in  Lisbon.", "similarity_score": 0.1},
+            {"message": "Favourite food is bacalhau.", "similarity_score": 0.2},
+            {"message": "Favourite food is bacalhau.", "similarity_score": 0.2},
+            {"message": "Unrelated note.", "similarity_score": 0.9},
+        ]
+
+        with mock.patch.object(vector_store, "client", object()), \
+                mock.patch.object(vector_store, "model", object()), \
+                mock.patch.object(vector_store, "search_similar", return_value=results):
+            messages = await store.build_messages(session, None, "What should I eat?")
+
+        context = messages[0]["content"]
+        self.assertEqual(context.count("bacalhau"), 1)
+        self.assertNotIn("Lisbon", context)
+        self.assertNotIn("Unrelated", context)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,588 @@
+import unittest
+import sys
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest import mock
+
+import tiktoken
+
+# Path setup
+sys.path.append(os.path.join(os.getcwd(), 'librarian'))
+
+# The librarian runs in its own container; stand in for its OCR, RedisVL and
+# watchdog dependencies where they aren't installed
+for name, attrs in {
+    "PyPDF2": ["PdfReader"],
+    "pytesseract": ["image_to_string"],
+    "pdf2image": ["convert_from_path", "pdfinfo_from_path"],
+    "redisvl": [],
+    "redisvl.index": ["SearchIndex"],
+    "redisvl.query": ["VectorQuery"],
+    "redisvl.query.filter": ["Tag"],
+    "redisvl.utils": [],
+    "redisvl.utils.vectorize": ["HFTextVectorizer"],
+    "watchdog": [],
+    "watchdog.observers": ["Observer"],
+    "watchdog.events": ["FileSystemEventHandler", "FileCreatedEvent"],
+}.items():
+    try:
+        __import__(name)
+    except ImportError:
+        module = sys.modules[name] = types.ModuleType(name)
+        for attr in attrs:
+            setattr(module, attr, type(attr, (), {}))
+
+# One token per byte, so tests don't need to download a tiktoken encoding
+BYTES = tiktoken.Encoding(
+    name="bytes", pat_str=r"\S+|\s+", mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={}
+)
+
+with mock.patch.object(tiktoken, "get_encoding", return_value=BYTES):
+    import processor
+    import storage
+    import pipeline
+    import watcher
+    import api
+
+
+class FakeRedis:
+    """The slice of redis-py the librarian uses, in memory"""
+
+    def __init__(self):
+        self.data = {}
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        fields = self.data.setdefault(key, {})
+        fields.update(mapping or {field: value})
+
+    def hkeys(self, key):
+        return list(self.data.get(key, {}))
+
+    def hdel(self, key, field):
+        self.data.get(key, {}).pop(field, None)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def zadd(self, key, members):
+        self.data.setdefault(key, {}).update(members)
+
+    def zrem(self, key, member):
+        self.data.get(key, {}).pop(member, None)
+
+    def zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    def zrange(self, key, start, end):
+        return sorted(self.data.get(key, {}))[start:end + 1]
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    def chunk_keys(self):
+        return sorted(key for key in self.data if key.startswith("library:"))
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class FakeIndex:
+    def __init__(self, schema):
+        self.schema = schema
+
+    @classmethod
+    def from_dict(cls, schema):
+        return cls(schema)
+
+    def set_client(self, client):
+        self.client = client
+
+    def create(self, overwrite=False):
+        pass
+
+    def load(self, data, keys):
+        for fields, key in zip(data, keys):
+            self.client.hset(key, mapping=fields)
+
+
+class FakeVectorizer:
+    dims = 4
+
+    def __init__(self, model):
+        self.texts = []
+
+    def embed_many(self, texts, batch_size=10, as_buffer=False):
+        self.texts.extend(texts)
+        return [b"vector" for _ in texts]
+
+
+def _storage(client=None, **kwargs):
+    with mock.patch.object(storage.redis, "from_url", return_value=client or FakeRedis()), \
+            mock.patch.object(storage, "SearchIndex", FakeIndex), \
+            mock.patch.object(storage, "HFTextVectorizer", FakeVectorizer):
+        return storage.LibraryStorage(**kwargs)
+
+
+def _sentences(*numbers):
+    return " ".join(f"Sentence number {n} is here." for n in numbers)
+
+
+def _store(store, path, chunk_size=30):
+    """Extract and load a file the way the pipeline does, returning the new chunks"""
+    chunks = processor.DocumentProcessor(chunk_size, 0).process_document(str(path))
+    pending = store.pending_chunks(chunks, path.name)
+    store.load_chunks(chunks, dict(zip(map(store.chunk_id, pending), store.embed_chunks(pending))), path)
+    return pending
+
+
+def _baseline_chunks(text, chunk_size, chunk_overlap):
+    """The original whole-document chunker: clean, split, slide a sentence window"""
+    count = lambda sentence: len(processor.token_counter.encode(sentence))
+    text = re.sub(r' +', ' ', re.sub(r'\n{3,}', '\n\n', text)).strip()
+    chunks, current, tokens = [], [], 0
+    for sentence in re.split(r'(?<=[.!?])\s+', text):
+        if tokens + count(sentence) > chunk_size and current:
+            chunks.append(' '.join(current))
+            overlap, overlap_tokens = [], 0
+            for kept in reversed(current):
+                if overlap_tokens + count(kept) > chunk_overlap:
+                    break
+                overlap.insert(0, kept)
+                overlap_tokens += count(kept)
+            current, tokens = overlap, overlap_tokens
+        current.append(sentence)
+        tokens += count(sentence)
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+class TestSentenceChunker(unittest.TestCase):
+    def _random_text(self, rng):
+        pieces = []
+        for _ in range(rng.randrange(0, 40)):
+            pieces.append(rng.choice(["word", "Other", "x", "longer-word", "a.b", "end.", "Why?", "Yes!", "..."]))
+            pieces.append(rng.choice([" ", " ", " ", "  ", "\n", "\n\n", "\n\n\n\n", " \n ", "\t"]))
+        return rng.choice(["", " ", "\n\n"]) + "".join(pieces)
+
+    def test_streamed_chunks_match_whole_text_for_any_block_split(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            text = self._random_text(rng)
+            cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randrange(0, 8))))
+            blocks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+            chunk_size = rng.randrange(5, 60)
+            chunk_overlap = rng.randrange(0, chunk_size)
+            chunker = processor.DocumentProcessor(chunk_size, chunk_overlap)
+
+            streamed = [chunk for chunk, _ in chunker._iter_chunks(chunker._iter_sentences(blocks))]
+            with self.subTest(blocks=blocks, chunk_size=chunk_size, chunk_overlap=chunk_overlap):
+                self.assertEqual(streamed, _baseline_chunks(text, chunk_size, chunk_overlap))
+
+    def test_chunk_token_counts_sum_sentences(self):
+        chunker = processor.DocumentProcessor(30, 10)
+        for chunk, tokens in chunker._chunk_text("One two. Three four five. Six! Seven eight nine ten?"):
+            sentences = re.split(r'(?<=[.!?])\s+', chunk)
+            self.assertEqual(tokens, sum(len(processor.token_counter.encode(s)) for s in sentences))
+
+    def test_text_file_falls_back_to_latin1_from_first_invalid_block(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = Path(root) / "notes.txt"
+            path.write_bytes("Caf\u00e9 na\u00efve.\r\n".encode("utf-8") + "R\u00e9sum\u00e9\r\n".encode("latin-1"))
+            chunker = processor.DocumentProcessor(30, 0)
+            with mock.patch.object(processor, "BLOCK_BYTES", 4):
+                blocks = chunker._iter_text_blocks(path)
+                self.assertEqual(next(blocks), "Caf")
+                self.assertEqual(next(blocks) + "".join(blocks), "\u00e9 na\u00efve.\nR\u00e9sum\u00e9\n")
+
+
+class TestStructureChunker(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+
+    def _chunks(self, name, text, chunk_size=40, pages=None):
+        path = self.root / name
+        path.write_text(text)
+        chunker = processor.DocumentProcessor(chunk_size, 0, chunk_mode="structure")
+        if pages is not None:
+            with mock.patch.object(chunker, "_iter_pdf_pages", return_value=iter(pages)):
+                return chunker.process_document(str(path))
+        return chunker.process_document(str(path))
+
+    def test_markdown_sections(self):
+        chunks = self._chunks("guide.md", (
+            "# Guide\nIntro here.\n\n"
+            "## Install\nRun the installer now. Then reboot the machine. Then log in again.\n\n"
+            "## Usage\n- first item\n- second item\n\n```\nx = 1\ny = 2\n```\n\n"
+            "# Appendix\nShort note.\n"
+        ))
+
+        self.assertEqual([(chunk["text"], chunk["section"]) for chunk in chunks], [
+            ("# Guide\n\nIntro here.", "Guide"),
+            ("## Install\n\nRun the installer now.", "Guide > Install"),
+            ("Then reboot the machine.", "Guide > Install"),  # Oversized paragraph split by sentence
+            ("Then log in again.", "Guide > Install"),
+            ("## Usage\n\n- first item\n- second item", "Guide > Usage"),
+            ("```\nx = 1\ny = 2\n```", "Guide > Usage"),  # Code kept verbatim
+            ("# Appendix\n\nShort note.", "Appendix"),
+        ])
+        self.assertEqual({chunk["page"] for chunk in chunks}, {0})
+        self.assertEqual({chunk["total_chunks"] for chunk in chunks}, {7})
+
+    def test_small_sections_merge_under_common_heading(self):
+        chunks = self._chunks("faq.md", "# FAQ\n## One\nYes.\n## Two\nNo.\n", chunk_size=200)
+
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0]["text"], "# FAQ\n\n## One\n\nYes.\n\n## Two\n\nNo.")
+        self.assertEqual(chunks[0]["section"], "FAQ")
+
+    def test_pdf_pages_are_never_merged(self):
+        chunks = self._chunks(
+            "book.pdf", "%PDF", chunk_size=200,
+            pages=["Chapter One\nFirst page text.", "More of it here.\n\nAnother para."]
+        )
+
+        self.assertEqual([(chunk["text"], chunk["page"]) for chunk in chunks], [
+            ("Chapter One\nFirst page text.", 1),
+            ("More of it here.\n\nAnother para.", 2),
+        ])
+        self.assertEqual({chunk["section"] for chunk in chunks}, {""})
+
+
+class TestLibraryStorage(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.path = Path(self.root.name, "notes.txt")
+        self.store = _storage()
+
+    def test_edited_file_only_embeds_changed_chunks(self):
+        self.path.write_text(_sentences(1, 2, 3, 4))
+        self.assertEqual(len(_store(self.store, self.path)), 4)
+        before = set(self.store.redis_client.chunk_keys())
+
+        self.path.write_text(_sentences(1, 2, 9, 4))
+        pending = _store(self.store, self.path)
+
+        self.assertEqual([chunk["text"] for chunk in pending], ["Sentence number 9 is here."])
+        after = set(self.store.redis_client.chunk_keys())
+        self.assertEqual(len(after), 4)
+        self.assertEqual(len(before - after), 1)  # Sentence 3's chunk was orphaned and deleted
+        self.assertEqual(self.store.manifest_entry("notes.txt")["chunks"], 4)
+
+    def test_repeated_text_keeps_every_chunk(self):
+        self.path.write_text(_sentences(1, 0, 2, 0, 3, 0))
+        _store(self.store, self.path)
+
+        keys = self.store.redis_client.chunk_keys()
+        self.assertEqual(len(keys), 6)
+        self.assertEqual(sorted(self.store.redis_client.hget(key, "chunk_index") for key in keys), list(range(6)))
+        self.assertEqual(len(self.store.manifest_entry("notes.txt")["chunk_ids"]), 6)
+
+        # Editing around the repeats keeps their IDs: only the new sentence is embedded
+        self.path.write_text(_sentences(1, 0, 2, 0, 9, 0))
+        self.assertEqual([chunk["text"] for chunk in _store(self.store, self.path)], ["Sentence number 9 is here."])
+        self.assertEqual(len(self.store.redis_client.chunk_keys()), 6)
+
+    def test_shrunk_file_drops_trailing_chunks(self):
+        self.path.write_text(_sentences(1, 2, 3, 4))
+        _store(self.store, self.path)
+
+        self.path.write_text(_sentences(1, 2))
+        self.assertEqual(_store(self.store, self.path), [])
+
+        keys = self.store.redis_client.chunk_keys()
+        self.assertEqual(len(keys), 2)
+        self.assertEqual(
+            sorted(f"library:{chunk_id}" for chunk_id in self.store.manifest_entry("notes.txt")["chunk_ids"]), keys
+        )
+        for key in keys:
+            self.assertEqual(self.store.redis_client.hget(key, "total_chunks"), 2)
+
+
+class TestIngestionPipeline(unittest.TestCase):
+    def test_broken_extract_pool_is_replaced(self):
+        pools = []
+
+        class BrokenPool:
+            """What a ProcessPoolExecutor becomes once a worker is killed"""
+            def submit(self, *args):
+                raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+            def shutdown(self, wait=True):
+                pass
+
+        def make_pool(max_workers, mp_context):
+            pools.append(BrokenPool() if not pools else ThreadPoolExecutor(max_workers))
+            return pools[-1]
+
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.object(pipeline, "ProcessPoolExecutor", make_pool):
+            path = Path(root, "notes.txt")
+            path.write_text("Hello there. " * 20)
+            ingest = pipeline.IngestionPipeline(processor.DocumentProcessor(30, 0), _storage())
+            ingest.start()
+            try:
+                task = ingest.submit(path)
+                self.assertTrue(task.done.wait(10))
+            finally:
+                ingest.stop()
+
+        self.assertEqual(task.stage, "done")
+        self.assertEqual(len(pools), 2)
+
+
+    def test_restart_keeps_files_with_uppercase_extensions(self):
+        client = FakeRedis()
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.object(pipeline, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)):
+            for name in ("Book.TXT", "notes.md"):
+                Path(root, name).write_text(_sentences(1, 2, 3))
+
+            for restart in range(2):
+                ingest = pipeline.IngestionPipeline(processor.DocumentProcessor(30, 0), _storage(client))
+                submit, tasks = ingest.submit, []
+                ingest.start()
+                try:
+                    with mock.patch.object(ingest, "submit", lambda path: tasks.append(submit(path)) or tasks[-1]):
+                        watcher.LibraryWatcher(root, pipeline=ingest).process_existing_files()
+                    self.assertEqual(len(tasks), 2)
+                    for task in tasks:
+                        self.assertTrue(task.done.wait(10))
+                finally:
+                    ingest.stop()
+
+                self.assertEqual(sorted(client.hkeys(storage.MANIFEST_KEY)), ["Book.TXT", "notes.md"])
+                self.assertEqual(len(client.chunk_keys()), 6)
+
+
+    def test_resubmitted_file_waits_for_its_running_task(self):
+        started, release = threading.Event(), threading.Event()
+        running, overlaps = [], []
+
+        class SlowProcessor(processor.DocumentProcessor):
+            """Holds the first extraction open until released"""
+            def iter_document(self, file_path, progress=None):
+                overlaps.append(len(running))
+                running.append(file_path)
+                try:
+                    started.set()
+                    release.wait(10)
+                    yield from super().iter_document(file_path, progress)
+                finally:
+                    running.remove(file_path)
+
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.object(pipeline, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)):
+            path = Path(root, "book.txt")
+            path.write_text(_sentences(1, 2, 3))
+            ingest = pipeline.IngestionPipeline(SlowProcessor(30, 0), _storage())
+            ingest.start()
+            try:
+                first = ingest.submit(path)
+                self.assertTrue(started.wait(10))
+                path.write_text(_sentences(1, 2, 3, 4))
+                superseded, latest = ingest.submit(path), ingest.submit(path)
+                self.assertTrue(superseded.done.wait(10))
+                self.assertFalse(first.done.is_set())
+                release.set()
+                self.assertTrue(latest.done.wait(10))
+            finally:
+                ingest.stop()
+
+        self.assertEqual([first.stage, superseded.stage, latest.stage], ["done", "skipped", "done"])
+        self.assertEqual(overlaps, [0, 0])
+
+
+    def _ingest(self, document_processor, path, client, batch_chunks):
+        """Run one file through a pipeline whose extract workers are threads"""
+        store = _storage(client)
+        with mock.patch.object(pipeline, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)):
+            ingest = pipeline.IngestionPipeline(document_processor, store, embed_batch_chunks=batch_chunks)
+            ingest.start()
+            try:
+                task = ingest.submit(path)
+                self.assertTrue(task.done.wait(10))
+            finally:
+                ingest.stop()
+        return task, store
+
+    def test_large_file_is_loaded_in_batches(self):
+        client = FakeRedis()
+        with tempfile.TemporaryDirectory() as root:
+            path = Path(root, "book.txt")
+            path.write_text(_sentences(*range(10)))
+            with mock.patch.object(storage.LibraryStorage, "load_batch", autospec=True,
+                                   side_effect=storage.LibraryStorage.load_batch) as load_batch:
+                task, store = self._ingest(processor.DocumentProcessor(30, 0), path, client, batch_chunks=3)
+
+        self.assertEqual(task.stage, "done")
+        self.assertEqual([len(call.args[1]) for call in load_batch.call_args_list], [3, 3, 3, 1])
+        keys = client.chunk_keys()
+        self.assertEqual(len(keys), 10)
+        self.assertEqual({client.hget(key, "total_chunks") for key in keys}, {10})
+        entry = store.manifest_entry("book.txt")
+        self.assertEqual(entry["chunks"], 10)
+        self.assertEqual(sorted(f"library:{chunk_id}" for chunk_id in entry["chunk_ids"]), keys)
+
+    def test_failed_extraction_discards_loaded_batches(self):
+        client = FakeRedis()
+
+        class FailingProcessor(processor.DocumentProcessor):
+            """Fails partway through, once its first batches are in Redis"""
+            def iter_document(self, file_path, progress=None):
+                chunks = super().iter_document(file_path, progress)
+                for _ in range(4):
+                    yield next(chunks)
+                deadline = time.monotonic() + 5
+                while not client.chunk_keys() and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                raise RuntimeError("Unreadable page")
+
+        with tempfile.TemporaryDirectory() as root:
+            path = Path(root, "book.txt")
+            path.write_text(_sentences(*range(10)))
+            task, store = self._ingest(FailingProcessor(30, 0), path, client, batch_chunks=2)
+
+        self.assertEqual(task.stage, "failed")
+        self.assertEqual(task.error, "Unreadable page")
+        self.assertEqual(client.chunk_keys(), [])
+        self.assertIsNone(store.manifest_entry("book.txt"))
+
+
+class TestLibraryFileHandler(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.now = 100.0
+        clock = mock.patch.object(watcher.time, "monotonic", lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.pipeline = mock.MagicMock()
+        self.handler = watcher.LibraryFileHandler(None, pipeline=self.pipeline, settle_seconds=2.0)
+
+    def _event(self, name, dest=None):
+        return types.SimpleNamespace(
+            src_path=str(self.root / name), dest_path=dest and str(self.root / dest), is_directory=False
+        )
+
+    def _flush_after(self, seconds):
+        self.now += seconds
+        self.handler.flush()
+
+    def test_ingests_once_size_and_mtime_settle(self):
+        path = self.root / "Book.PDF"
+        path.write_text("part")
+        self.handler.on_created(self._event("Book.PDF"))
+
+        self._flush_after(1)  # Inside the quiet period
+        self._flush_after(1.5)  # First look records size/mtime
+        path.write_text("part and the rest")
+        self.handler.on_modified(self._event("Book.PDF"))
+        self._flush_after(2.5)  # The new event started the wait over
+        self.pipeline.submit.assert_not_called()
+
+        self._flush_after(2.5)
+        self.pipeline.submit.assert_called_once_with(path)
+        self._flush_after(5)
+        self.pipeline.submit.assert_called_once()
+
+    def test_file_deleted_before_settling_is_removed_not_ingested(self):
+        (self.root / "notes.txt").write_text("draft")
+        self.handler.on_created(self._event("notes.txt"))
+        self._flush_after(2.5)
+        (self.root / "notes.txt").unlink()
+        self.handler.on_deleted(self._event("notes.txt"))
+
+        self._flush_after(2.5)
+        self.pipeline.submit.assert_not_called()
+        self.pipeline.remove.assert_called_once_with(self.root / "notes.txt")
+        self.assertEqual(self.handler.pending, {})
+
+    def test_move_removes_source_and_ingests_destination(self):
+        (self.root / "renamed.md").write_text("text")
+        self.handler.on_moved(self._event("notes.md", dest="renamed.md"))
+        (self.root / "book.pdf").write_text("text")
+        self.handler.on_moved(self._event(".book.pdf.partial", dest="book.pdf"))  # rsync temp file
+
+        self._flush_after(2.5)
+        self._flush_after(2.5)
+        self.pipeline.remove.assert_called_once_with(self.root / "notes.md")
+        self.assertEqual(
+            sorted(call.args[0] for call in self.pipeline.submit.call_args_list),
+            [self.root / "book.pdf", self.root / "renamed.md"]
+        )
+
+    def test_unsupported_files_are_ignored(self):
+        (self.root / "cover.png").write_text("image")
+        self.handler.on_created(self._event("cover.png"))
+        self.handler.on_modified(self._event("cover.png"))
+        self.assertEqual(self.handler.pending, {})
+
+
+class TestResolvePaths(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name, "library")
+        (self.root / "books").mkdir(parents=True)
+        for name in ("paper.pdf", "Notes.MD", "image.png", "books/nested.txt"):
+            (self.root / name).write_text("text")
+        Path(tmp.name, "outside.txt").write_text("text")
+        (self.root / "escape.txt").symlink_to(Path(tmp.name, "outside.txt"))
+
+    def test_top_level_files(self):
+        self.assertEqual(api.resolve_paths(self.root, ["paper.pdf"]), [self.root.resolve() / "paper.pdf"])
+        self.assertEqual(
+            [path.name for path in api.resolve_paths(self.root, ["."])], ["Notes.MD", "paper.pdf"]
+        )
+
+    def test_rejects_paths_outside_the_library(self):
+        for raw in ("../outside.txt", "escape.txt", "/etc/hostname", "books/../../outside.txt"):
+            with self.assertRaisesRegex(ValueError, "outside the library"):
+                api.resolve_paths(self.root, [raw])
+
+    def test_rejects_subdirectories(self):
+        for raw in ("books", "books/", "books/nested.txt"):
+            with self.assertRaisesRegex(ValueError, "Subdirectories"):
+                api.resolve_paths(self.root, [raw])
+
+    def test_rejects_missing_and_unsupported(self):
+        with self.assertRaisesRegex(ValueError, "Not found"):
+            api.resolve_paths(self.root, ["missing.pdf"])
+        with self.assertRaisesRegex(ValueError, "Unsupported"):
+            api.resolve_paths(self.root, ["image.png"])
+
+
+if __name__ == '__main__':
+    unittest.main()
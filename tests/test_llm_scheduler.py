@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import asyncio
+
+# Path setup
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'brain'))
+
+from services.llm_scheduler import LLMScheduler, LLMOverloadedError
+
+
+class TestLLMScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_interactive_jumps_background_queue(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+        gate = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("background"):
+                await gate.wait()
+
+        async def run(priority):
+            async with scheduler.slot(priority):
+                order.append(priority)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        background = asyncio.create_task(run("background"))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(run("interactive"))
+        await asyncio.sleep(0)
+
+        self.assertEqual(scheduler.stats()["queued"], 2)
+        gate.set()
+        await asyncio.gather(holder, background, interactive)
+
+        self.assertEqual(order, ["interactive", "background"])
+        self.assertEqual(scheduler.stats()["active"], 0)
+
+    async def test_class_limit_leaves_room_for_other_classes(self):
+        scheduler = LLMScheduler(max_concurrency=4, class_limits={"background": 1})
+        await scheduler.acquire("background")
+
+        # Second background request must wait, interactive is admitted
+        pending = asyncio.create_task(scheduler.acquire("background"))
+        await asyncio.sleep(0)
+        self.assertFalse(pending.done())
+        self.assertEqual(await scheduler.acquire("interactive"), 0.0)
+
+        scheduler.release("background")
+        await pending
+        self.assertEqual(scheduler.classes["background"].active, 1)
+
+    async def test_full_queue_is_shed_with_retry_after(self):
+        scheduler = LLMScheduler(max_concurrency=1, max_queue={"interactive": 1})
+        await scheduler.acquire("interactive")
+        waiter = asyncio.create_task(scheduler.acquire("interactive"))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(LLMOverloadedError) as ctx:
+            await scheduler.acquire("interactive")
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        self.assertEqual(scheduler.classes["interactive"].rejected, 1)
+
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(scheduler.classes["interactive"].queued, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
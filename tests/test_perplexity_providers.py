@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+import httpx
+
+# Path setup
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'brain'))
+
+from services.perplexity import NGramPerplexityProvider, get_perplexity_provider
+from services.llm import LLMClient
+
+CORPUS = [
+    "I went to the store to buy some milk and bread today.",
+    "The weather is nice and sunny this afternoon.",
+    "My favorite programming language is Python because it is readable.",
+    "Remember to call mom on Sunday about the family dinner plans.",
+    "We should meet for coffee next week and talk about the project.",
+] * 20
+
+
+class TestNGramPerplexityProvider(unittest.IsolatedAsyncioTestCase):
+    async def test_abstains_until_trained(self):
+        provider = NGramPerplexityProvider()
+        self.assertEqual(await provider.score(["hello world"]), [None])
+
+    async def test_familiar_text_scores_lower_than_gibberish(self):
+        provider = NGramPerplexityProvider()
+        provider.train(CORPUS)
+
+        familiar, gibberish = await provider.score([
+            "I went to the store to buy bread.",
+            "zxqv kjwp ghtr qqxz",
+        ])
+        self.assertIsNotNone(familiar)
+        self.assertLess(familiar, gibberish)
+
+    def test_unknown_provider_rejected(self):
+        self.assertIsNone(get_perplexity_provider("none"))
+        with self.assertRaises(ValueError):
+            get_perplexity_provider("gpt-17")
+
+    def test_worker_survives_unknown_configured_provider(self):
+        from workers.memory_worker import MemoryWorker, config
+
+        with mock.patch.object(config, "PERPLEXITY_PROVIDER", "vorpl"), \
+                mock.patch.object(config, "PERPLEXITY_FALLBACK_PROVIDER", "none"):
+            worker = MemoryWorker()
+        self.assertEqual(worker.perplexity_provider.name, "vorpal")
+        self.assertIsNone(worker.fallback_provider)
+
+
+def _choice(index, logprob):
+    return {"index": index, "logprobs": {"token_logprobs": [None, logprob]}}
+
+
+def _status_error(code):
+    request = httpx.Request("POST", "http://vorpal/v1/completions")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+class TestLogprobsBatch(unittest.IsolatedAsyncioTestCase):
+    async def test_choices_map_back_by_index(self):
+        client = LLMClient()
+
+        async def completion(prompt, **kwargs):
+            # Out of order, as some engines return them
+            return {"raw": {"choices": [_choice(i, -float(len(t))) for i, t in reversed(list(enumerate(prompt)))]}}
+
+        with mock.patch.object(client, "completion", mock.AsyncMock(side_effect=completion)):
+            results = await client.get_logprobs_batch(["a", "bb", "ccc", "dddd", "eeeee"], batch_size=2)
+        self.assertEqual(results, [-1.0, -2.0, -3.0, -4.0, -5.0])
+
+    async def test_rejected_batch_is_scored_per_text(self):
+        client = LLMClient()
+
+        async def completion(prompt, **kwargs):
+            if isinstance(prompt, list):
+                raise _status_error(400)
+            if prompt == "too long":
+                raise _status_error(400)
+            return {"raw": {"choices": [_choice(0, -1.0)]}}
+
+        with mock.patch.object(client, "completion", mock.AsyncMock(side_effect=completion)) as patched:
+            results = await client.get_logprobs_batch(["ok", "too long", "fine"], batch_size=8)
+        self.assertEqual(results, [-1.0, None, -1.0])
+        self.assertEqual(patched.await_count, 4)
+
+    async def test_engine_down_returns_none_without_per_text_retries(self):
+        client = LLMClient()
+        for error in (httpx.ConnectError("down"), _status_error(503)):
+            with mock.patch.object(client, "completion", mock.AsyncMock(side_effect=error)) as patched:
+                results = await client.get_logprobs_batch(["a", "b", "c"], batch_size=2)
+            self.assertEqual(results, [None, None, None])
+            self.assertEqual(patched.await_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
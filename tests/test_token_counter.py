@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+import threading
+from unittest import mock
+
+# Path setup
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'brain'))
+
+from services.token_counter import TokenCounter
+
+
+class TestTokenCounter(unittest.TestCase):
+    def test_approx_mode_needs_no_tokenizer(self):
+        counter = TokenCounter(mode="approx")
+        self.assertEqual(counter.count_many(["", "abcd", "abcde"]), [0, 1, 2])
+        self.assertIsNone(counter.tokenizer)
+
+    def test_exact_mode_batches_misses_and_caches_by_content(self):
+        counter = TokenCounter(mode="exact", tokenizer_model="fake", cache_size=2)
+        tokenizer = mock.Mock(side_effect=lambda texts, **kw: {"input_ids": [t.split() for t in texts]})
+        counter.tokenizer = tokenizer
+
+        self.assertEqual(counter.count_many(["a b", "c", "a b"]), [2, 1, 2])
+        tokenizer.assert_called_once_with(["a b", "c"], add_special_tokens=False)
+        self.assertEqual(counter.count("c"), 1)
+        self.assertEqual(tokenizer.call_count, 1)
+        self.assertEqual(counter.stats()["hits"], 2)
+
+        counter.count("d e f")  # Evicts "a b"
+        self.assertEqual(len(counter.cache), 2)
+
+    def test_tokenizer_loads_in_background(self):
+        counter = TokenCounter(mode="exact", tokenizer_model="slow-download")
+        release = threading.Event()
+        tokenizer = mock.Mock(side_effect=lambda texts, **kw: {"input_ids": [t.split() for t in texts]})
+
+        def from_pretrained(name):
+            release.wait(timeout=5)
+            return tokenizer
+
+        with mock.patch("transformers.AutoTokenizer.from_pretrained", side_effect=from_pretrained):
+            self.assertEqual(counter.count("one two three"), 4)  # Approximate while loading
+            release.set()
+            counter.loader.join(timeout=5)
+        self.assertEqual(counter.count("one two three"), 3)
+
+    def test_missing_tokenizer_falls_back_to_approx(self):
+        counter = TokenCounter(mode="exact", tokenizer_model="")
+        self.assertEqual(counter.count("abcdefgh"), 2)
+        self.assertEqual(counter.stats()["mode"], "approx")
+
+
+if __name__ == '__main__':
+    unittest.main()
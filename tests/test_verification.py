@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import asyncio
+from unittest import mock
+
+# Path setup
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'brain'))
+
+from verification import ChainOfVerification, answer_supports
+from services.llm import llm
+
+
+QUESTIONS = "1. Is Paris the capital of France?\n2. When was the Eiffel Tower completed?"
+
+
+class TestChainOfVerification(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.running = 0
+        self.peak = 0
+
+    async def _completion(self, prompt, **kwargs):
+        if "verification questions" in prompt:
+            return {"text": QUESTIONS}
+        if prompt.startswith("Review this answer"):
+            return {"text": "Revised answer."}
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        if "capital" in prompt:
+            return {"text": "Yes."}
+        return {"text": "It was completed in 1889."}
+
+    async def test_answers_run_concurrently_and_agreement_skips_revision(self):
+        draft = "Paris is the capital of France; the Eiffel Tower was completed in 1889."
+        completion = mock.AsyncMock(side_effect=self._completion)
+
+        with mock.patch.object(llm, "completion", completion):
+            result = await ChainOfVerification(early_exit=True).verify("Tell me about Paris", draft)
+
+        self.assertEqual(self.peak, 2)
+        self.assertTrue(result["revision_skipped"])
+        self.assertEqual(result["final_response"], draft)
+        self.assertEqual(completion.await_count, 3)  # Questions + 2 answers, no revision
+
+        with mock.patch.object(llm, "completion", mock.AsyncMock(side_effect=self._completion)):
+            result = await ChainOfVerification(early_exit=True).verify("Tell me about Paris", "It opened in 1925.")
+        self.assertFalse(result["revision_skipped"])
+        self.assertEqual(result["final_response"], "Revised answer.")
+
+    async def test_stream_yields_draft_questions_and_answers(self):
+        async def completion_stream(prompt, **kwargs):
+            chunks = ["1. Is Paris the ", "capital of France?\n2. When was", " the Eiffel Tower completed?"]
+            if "verification questions" not in prompt:
+                chunks = ["Paris is the capital. ", "The tower dates from 1889."]
+            for chunk in chunks:
+                yield chunk
+
+        with mock.patch.object(llm, "completion_stream", completion_stream), \
+                mock.patch.object(llm, "completion", mock.AsyncMock(side_effect=self._completion)):
+            events = [e async for e in ChainOfVerification(early_exit=True).verify_stream("Tell me about Paris")]
+
+        types = [e["type"] for e in events]
+        self.assertEqual(types, ["draft", "draft", "question", "question", "answer", "answer", "result"])
+        self.assertEqual(events[3]["question"], "When was the Eiffel Tower completed?")
+        self.assertTrue(events[-1]["revision_skipped"])
+
+    def test_answer_supports(self):
+        self.assertFalse(answer_supports("Completed in 1889 by Eiffel.", "It was finished in 1889 by Gustave Eiffel."))
+        self.assertTrue(answer_supports("Completed in 1889 by Gustave Eiffel.", "It was finished in 1889 by Gustave Eiffel."))
+        self.assertFalse(answer_supports("Anything.", "No, that is wrong."))
+        self.assertFalse(answer_supports("Anything.", "it depends on context"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -248,6 +248,8 @@ document.getElementById('savePersonaBtn').onclick = async () => {
 };
 
 // --- Chat Logic ---
+let chatSessionId = null;  // Assigned by /chat on the first reply
+
 async function sendMessage() {
     const text = userInput.value.trim();
     if (!text) return;
@@ -260,7 +262,7 @@ async function sendMessage() {
     try {
         const mode = agentSelect.value;
         let endpoint = "/chat";
-        let payload = { message: text };
+        let payload = { message: text, session_id: chatSessionId };
 
         if (mode === "basic") {
             endpoint = "/agent/";
@@ -285,6 +287,10 @@ async function sendMessage() {
         const data = await response.json();
         setThinking(false);
 
+        if (data.session_id) {
+            chatSessionId = data.session_id;
+        }
+
         if (data.response) {
             addMessage(data.response, 'agent', data.engine);
         }
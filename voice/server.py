@@ -4,9 +4,11 @@ Refactored and Simplified
 """
 
 import os
+import asyncio
 import tempfile
 import logging
 import shutil
+import time
 from pathlib import Path
 from typing import Optional, Tuple, Union
 
@@ -142,29 +144,55 @@ class TranscriptionResponse(BaseModel):
     language: Optional[str] = None
     duration: Optional[float] = None
 
+# Per-model readiness: pending -> loading -> ready | failed
+load_stages = {
+    name: {"state": "pending", "seconds": None, "error": None}
+    for name in ("stt", "tts")
+}
+
 @app.on_event("startup")
 async def startup_event():
     # Load models in background to avoid blocking health checks
-    import asyncio
     asyncio.create_task(load_models_async())
 
-async def load_models_async():
-    logger.info("Initializing models in background...")
+async def _load_stage(name: str, load, is_ready) -> None:
+    """Run a blocking load() in a worker thread and record its outcome"""
+    stage = load_stages[name]
+    stage["state"] = "loading"
+    started = time.perf_counter()
     try:
-        stt_service.load()
-        tts_service.load()
-        logger.info("🎉 All voice models loaded and ready.")
+        await asyncio.to_thread(load)
+        stage["state"] = "ready" if is_ready() else "failed"
     except Exception as e:
-        logger.error(f"Failed to load models: {e}")
+        stage["state"] = "failed"
+        stage["error"] = str(e)
+    finally:
+        stage["seconds"] = round(time.perf_counter() - started, 2)
+
+async def load_models_async():
+    # Whisper and XTTS are independent: load both at once, off the event loop
+    logger.info("Initializing models in background...")
+    started = time.perf_counter()
+    await asyncio.gather(
+        _load_stage("stt", stt_service.load, lambda: stt_service.model is not None),
+        _load_stage("tts", tts_service.load, lambda: tts_service.available),
+    )
+    failed = [name for name, stage in load_stages.items() if stage["state"] == "failed"]
+    if failed:
+        logger.error(f"Voice models unavailable: {', '.join(failed)}")
+    else:
+        logger.info(f"🎉 All voice models loaded and ready in {time.perf_counter() - started:.1f}s.")
 
 @app.get("/health")
 async def health_check():
     # Healthy if the API is up, even if models are still loading
+    finished = [s for s in load_stages.values() if s["state"] in ("ready", "failed")]
     return {
         "status": "healthy",
-        "stt": {"loaded": stt_service.model is not None},
-        "tts": {"available": tts_service.available},
-        "initializing": stt_service.model is None or not tts_service.available
+        "stt": {"loaded": stt_service.model is not None, **load_stages["stt"]},
+        "tts": {"available": tts_service.available, **load_stages["tts"]},
+        "initializing": len(finished) < len(load_stages),
+        "progress": round(100 * len(finished) / len(load_stages))
     }
 
 @app.post("/transcribe", response_model=TranscriptionResponse)